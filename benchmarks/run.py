@@ -0,0 +1,236 @@
+"""Benchmarks for the hot paths of RDFUtilsModelBaseClass
+
+Run from the repository root:
+
+    python -m benchmarks.run --output bench.json
+    python -m benchmarks.run --compare bench.json  # exits with 1 if a benchmark got slower than --threshold
+    python -m benchmarks.run --crossover  # serial vs. parallel construction for growing numbers of entities
+
+Every benchmark records the minimum and median wall time over `--repeat` runs and the peak memory (tracemalloc)
+of one additional run.
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+import typing
+
+from benchmarks.synthetic import build_models, generate_rows, rows_to_graph
+from rdf_fastapi_utils.models import RDFUtilsModelBaseClass
+from rdf_fastapi_utils.parallel import parallel_construction, shutdown_pools
+from rdf_fastapi_utils.plan import get_model_plan
+from rdf_fastapi_utils.rows import intern_rows
+from rdf_fastapi_utils.serializer import jsonable, render_json, serialize_sparql_rows
+
+SCENARIOS = {
+    "wide": dict(anchors=50, fan_out=100, depth=1, rows_per_leaf=2, extra_columns=3),
+    "many_anchors": dict(anchors=2000, fan_out=2, depth=1, rows_per_leaf=2, extra_columns=3),
+    "deep": dict(anchors=10, fan_out=5, depth=3, rows_per_leaf=2, extra_columns=3),
+}
+QUICK_SCENARIOS = {
+    "wide": dict(anchors=10, fan_out=20, depth=1, rows_per_leaf=2, extra_columns=3),
+    "many_anchors": dict(anchors=200, fan_out=2, depth=1, rows_per_leaf=2, extra_columns=3),
+    "deep": dict(anchors=4, fan_out=3, depth=3, rows_per_leaf=2, extra_columns=3),
+}
+
+
+def benchmarks_for(params: dict) -> typing.Dict[str, typing.Callable[[], typing.Any]]:
+    """returns the benchmark functions for a scenario"""
+    rows = generate_rows(**params)
+    error_rows = generate_rows(**params, error_rate=0.05)
+    top = build_models(params["depth"])[0]
+    top_catch = build_models(params["depth"], catch_errors=True)[0]
+    plan = get_model_plan(top)
+    grouped = RDFUtilsModelBaseClass().filter_sparql(rows, anchor=plan.anchor, list_of_keys=plan.variables)
+    interned = intern_rows(rows)
+    graph = rows_to_graph(rows, params["depth"])
+    mapper = top.__new__(top)
+
+    def filter_sparql():
+        return RDFUtilsModelBaseClass().filter_sparql(rows, anchor=plan.anchor, list_of_keys=plan.variables)
+
+    def filter_sparql_interned():
+        return RDFUtilsModelBaseClass().filter_sparql(interned, anchor=plan.anchor, list_of_keys=plan.variables)
+
+    def intern():
+        return intern_rows(rows)
+
+    def map_fields_data():
+        return [mapper.map_fields_data(ent) for ent in grouped]
+
+    def construction():
+        return top.from_sparql_rows(rows)
+
+    def construction_interned():
+        return top.from_sparql_rows(interned)
+
+    def construction_graph():
+        return top.from_graph(graph)
+
+    def construction_trusted():
+        return top.from_sparql_rows(rows, trusted=True)
+
+    def model_json():
+        return render_json(jsonable(top.from_sparql_rows(rows)))
+
+    def direct_json():
+        return render_json(serialize_sparql_rows(top, rows))
+
+    def catch_errors():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return top_catch.from_sparql_rows(error_rows)
+
+    return {
+        "filter_sparql": filter_sparql,
+        "filter_sparql_interned": filter_sparql_interned,
+        "intern": intern,
+        "map_fields_data": map_fields_data,
+        "construction": construction,
+        "construction_interned": construction_interned,
+        "construction_graph": construction_graph,
+        "construction_trusted": construction_trusted,
+        "model_json": model_json,
+        "direct_json": direct_json,
+        "catch_errors": catch_errors,
+    }
+
+
+def measure(func: typing.Callable[[], typing.Any], repeat: int) -> dict:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"min": min(times), "median": statistics.median(times), "peak_memory": peak}
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(scenarios: dict, repeat: int, only: typing.List[str] | None = None) -> dict:
+    results = {}
+    for name, params in scenarios.items():
+        results[name] = {}
+        for bench, func in benchmarks_for(params).items():
+            if only and bench not in only:
+                continue
+            results[name][bench] = measure(func, repeat)
+            print(
+                f"{name:>14} {bench:>16}: {results[name][bench]['median'] * 1000:9.2f} ms "
+                f"(min {results[name][bench]['min'] * 1000:.2f} ms, "
+                f"peak {results[name][bench]['peak_memory'] / 1024:.0f} KiB)",
+                file=sys.stderr,
+            )
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "scenarios": scenarios,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+CROSSOVER_SIZES = (50, 100, 200, 500, 1000, 2000, 5000)
+
+
+def crossover(repeat: int, workers: int | None = None, sizes: typing.Sequence[int] = CROSSOVER_SIZES) -> dict:
+    """times serial, process and thread construction of `from_sparql_rows` for growing numbers of entities
+
+    Returns the min times per size and mode and, per parallel mode, the smallest size from which on it is faster
+    than serial construction (a starting point for `RDF_utils_parallel_threshold`).
+    """
+    top = build_models(1)[0]
+    results = {}
+    for size in sizes:
+        rows = generate_rows(anchors=size, fan_out=5, depth=1, rows_per_leaf=2, extra_columns=3)
+        results[size] = {"serial": measure(lambda: top.from_sparql_rows(rows), repeat)["min"]}
+        for mode in ("process", "thread"):
+            with parallel_construction(mode, threshold=0, workers=workers):
+                top.from_sparql_rows(rows)  # start the pool
+                results[size][mode] = measure(lambda: top.from_sparql_rows(rows), repeat)["min"]
+        print(
+            f"{size:>6} entities: " + ", ".join(f"{mode} {t * 1000:.2f} ms" for mode, t in results[size].items()),
+            file=sys.stderr,
+        )
+    shutdown_pools()
+    threshold = {}
+    for mode in ("process", "thread"):
+        faster = [size for size in sizes if results[size][mode] < results[size]["serial"]]
+        # first size from which on parallel construction stays faster
+        threshold[mode] = next((size for size in faster if all(s in faster for s in sizes if s >= size)), None)
+        print(f"{mode} construction faster from {threshold[mode]} entities on", file=sys.stderr)
+    return {"times": results, "threshold": threshold, "workers": workers or os.cpu_count()}
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> bool:
+    """prints the ratio current/baseline of the min times, returns False if a ratio exceeds threshold"""
+    ok = True
+    for scenario, benches in current["results"].items():
+        for bench, res in benches.items():
+            base = baseline["results"].get(scenario, {}).get(bench)
+            if base is None:
+                continue
+            ratio = res["min"] / base["min"]
+            mem_ratio = res["peak_memory"] / base["peak_memory"] if base["peak_memory"] else 1.0
+            flag = ""
+            if ratio > threshold:
+                flag = "  <-- REGRESSION"
+                ok = False
+            print(f"{scenario:>14} {bench:>16}: time x{ratio:.2f}, memory x{mem_ratio:.2f}{flag}")
+    return ok
+
+
+def main(argv: typing.List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="use small scenarios (smoke test)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", nargs="*", help="names of the benchmarks to run")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=1.2, help="maximum accepted slowdown for --compare")
+    parser.add_argument(
+        "--crossover", action="store_true", help="find the size from which on parallel construction pays off"
+    )
+    parser.add_argument("--workers", type=int, help="number of workers for --crossover (default: number of CPUs)")
+    args = parser.parse_args(argv)
+    if args.crossover:
+        results = crossover(args.repeat, args.workers, CROSSOVER_SIZES[:3] if args.quick else CROSSOVER_SIZES)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(results, f, indent=2)
+        return 0
+    results = run(QUICK_SCENARIOS if args.quick else SCENARIOS, args.repeat, args.only)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if not compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""Generator for synthetic flattened SPARQL results and matching models
+
+Level `i` of the generated data uses the variables `l{i}` (anchor URI) and `l{i}Label`. Every entity has `fan_out`
+children on the next level, every leaf is repeated `rows_per_leaf` times with differing values in the extra columns
+(like the multiple `linkedIds` of a person in the test fixtures). The number of rows is
+`anchors * fan_out ** depth * rows_per_leaf`.
+
+The generated models are module attributes named `Level{level}_depth{depth}[_catch_errors]`, so they can be pickled
+(e.g. for parallel construction in a process pool). The models up to `PREBUILT_DEPTH` are built on import, so a fresh
+process (a spawned pool worker) finds them, deeper models can only be used in threads.
+"""
+import functools
+import random
+import typing
+
+from pydantic import Field, create_model
+from rdflib import RDFS, Graph, Literal, URIRef
+
+from rdf_fastapi_utils.models import FieldConfigurationRDF, RDFUtilsModelBaseClass
+
+PREBUILT_DEPTH = 3
+CHILD = "http://example.org/child"
+
+
+def generate_rows(
+    anchors: int = 50,
+    fan_out: int = 10,
+    depth: int = 1,
+    extra_columns: int = 3,
+    rows_per_leaf: int = 2,
+    error_rate: float = 0.0,
+    seed: int = 0,
+) -> typing.List[dict]:
+    """generates flat SPARQL result rows
+
+    Args:
+        anchors (int, optional): number of top level entities. Defaults to 50.
+        fan_out (int, optional): number of children of every entity on each nested level. Defaults to 10.
+        depth (int, optional): number of nested levels below the top level. Defaults to 1.
+        extra_columns (int, optional): number of columns not used by the models. Defaults to 3.
+        rows_per_leaf (int, optional): number of rows per leaf entity. Defaults to 2.
+        error_rate (float, optional): share of leaf entities without a label (fails validation). Defaults to 0.0.
+        seed (int, optional): seed of the random generator. Defaults to 0.
+
+    Returns:
+        typing.List[dict]: the rows, ordered by the anchors
+    """
+    rnd = random.Random(seed)
+    rows = []
+
+    def walk(level: int, prefix: dict, uri: str) -> None:
+        if level > depth:
+            broken = error_rate > 0 and rnd.random() < error_rate
+            for variant in range(rows_per_leaf):
+                row = dict(prefix)
+                if broken:
+                    del row[f"l{depth}Label"]
+                for col in range(extra_columns):
+                    row[f"extra{col}"] = f"{uri}/extra{col}/{variant}"
+                rows.append(row)
+            return
+        for idx in range(fan_out if level > 0 else anchors):
+            child = f"{uri}/l{level}/{idx}"
+            walk(level + 1, {**prefix, f"l{level}": child, f"l{level}Label": f"Label of {child}"}, child)
+
+    walk(0, {}, "http://example.org/entity")
+    return rows
+
+
+def rows_to_graph(rows: typing.Iterable[dict], depth: int = 1) -> Graph:
+    """returns the triples of rows generated by `generate_rows` (labels and child links, no extra columns)"""
+    graph = Graph()
+    for row in rows:
+        for level in range(depth + 1):
+            node = URIRef(row[f"l{level}"])
+            if f"l{level}Label" in row:
+                graph.add((node, RDFS.label, Literal(row[f"l{level}Label"])))
+            if level > 0:
+                graph.add((URIRef(row[f"l{level - 1}"]), URIRef(CHILD), node))
+    return graph
+
+
+def build_models(depth: int = 1, catch_errors: bool = False) -> typing.List[type]:
+    """builds the model classes matching `generate_rows` (and `rows_to_graph`), the top level model is the first of the
+    list"""
+    return list(_build_models(depth, catch_errors))
+
+
+@functools.lru_cache(maxsize=None)
+def _build_models(depth: int, catch_errors: bool) -> typing.Tuple[type, ...]:
+    base = RDFUtilsModelBaseClass
+    if catch_errors:
+
+        class CatchErrorsBase(RDFUtilsModelBaseClass):
+            class Config:
+                RDF_utils_catch_errors = True
+                RDF_utils_error_field_name = "errors"
+
+        base = CatchErrorsBase
+
+    models = []
+    child = None
+    for level in range(depth, -1, -1):
+        fields = {
+            "id": (str, Field(..., rdfconfig=FieldConfigurationRDF(anchor=True, path=f"l{level}"))),
+            "label": (str, Field(..., rdfconfig=FieldConfigurationRDF(path=f"l{level}Label", predicate=RDFS.label))),
+        }
+        if child is not None:
+            fields["children"] = (typing.List[child], Field(None, rdfconfig=FieldConfigurationRDF(predicate=CHILD)))
+        if catch_errors:
+            fields["errors"] = (typing.List[str], None)
+        child = create_model(f"Level{level}", __base__=base, **fields)
+        key = f"Level{level}_depth{depth}{'_catch_errors' if catch_errors else ''}"
+        child.__module__ = __name__
+        child.__qualname__ = key
+        globals()[key] = child
+        models.insert(0, child)
+    return tuple(models)
+
+
+for _depth in range(1, PREBUILT_DEPTH + 1):
+    for _catch_errors in (False, True):
+        build_models(_depth, _catch_errors)
@@ -0,0 +1,178 @@
+"""Batch hooks: field callbacks receiving the values of all instances built in one construction call
+
+`batch_callback_function(field, values, datas)` and `batch_encode_function(values)` in FieldConfigurationRDF are the
+batch variants of `callback_function` and `encode_function`. They get the (non-None) values of a field of all
+instances of a model built in one construction call (`Model(...)`, `from_sparql_rows`, `from_graph`, including the
+nested models) and return the processed values in the same order, e.g. for a single label lookup per response:
+
+    def lookup_labels(field, values, datas):
+        labels = fetch_labels(values)  # one query for all IRIs
+        return [labels.get(v, v) for v in values]
+
+They run after the per-value hooks (`callback_function`, `encode_function`, which can be used alongside) and the
+batch callback runs before the batch encode function. Until the outermost construction call returns, the fields
+hold `PendingValue` placeholders, the results are validated and written back in bulk. Instances built in the
+scope are only put into their model cache (see `rdf_fastapi_utils.cache`) once the hooks succeeded.
+
+Models using `RDF_utils_catch_errors` or root validators, direct serialization and lazily built instances apply the
+batch hooks per instance (with single item lists).
+"""
+import contextlib
+import contextvars
+import typing
+from typing import Any, ForwardRef
+
+from pydantic import BaseModel, ValidationError
+
+from rdf_fastapi_utils.plan import FieldPlan, get_field_models, get_model_plan
+
+_BATCH: contextvars.ContextVar["BatchCollector | None"] = contextvars.ContextVar("rdf_utils_batch", default=None)
+_TREE_HAS_BATCH_HOOKS: dict[type, bool] = {}
+
+
+class PendingValue:
+    """placeholder of a field value waiting for its batch hooks"""
+
+    __slots__ = ("model", "fplan", "value", "data", "result")
+
+    def __init__(self, model: type, fplan: FieldPlan, value: Any, data: dict) -> None:
+        self.model = model
+        self.fplan = fplan
+        self.value = value
+        self.data = data
+
+    def __repr__(self) -> str:
+        return f"PendingValue({self.value!r})"
+
+
+def apply_batch_hooks(fplan: FieldPlan, values: list, datas: list) -> list:
+    """returns the values processed by the batch hooks of a field"""
+    if fplan.batch_callback_function is not None:
+        values = list(fplan.batch_callback_function(fplan.field, values, datas))
+    if fplan.batch_encode_function is not None:
+        values = list(fplan.batch_encode_function(values))
+    if len(values) != len(datas):
+        raise ValueError(f"batch hooks of {fplan.name} returned {len(values)} values for {len(datas)} inputs")
+    return values
+
+
+class BatchCollector:
+    """collects the pending values and the instances built in a batch scope"""
+
+    def __init__(self) -> None:
+        self.pending: list[PendingValue] = []
+        self.instances: list = []
+        self.cache_entries: list[tuple] = []
+
+    def defer(self, model: type, fplan: FieldPlan, value: Any, data: dict) -> PendingValue:
+        pending = PendingValue(model, fplan, value, data)
+        self.pending.append(pending)
+        return pending
+
+    def cache_after_flush(self, cache: Any, key: Any, instance: Any) -> None:
+        """puts instance into cache once the placeholders are resolved, instances of a failed flush are not cached"""
+        self.cache_entries.append((cache, key, instance))
+
+    def flush(self) -> None:
+        """applies the batch hooks per model and field, replaces the placeholders by the validated results and fills
+        the model caches
+
+        Raises:
+            ValidationError: if a result is not valid for its field
+        """
+        groups: dict[tuple, list[PendingValue]] = {}
+        for pending in self.pending:
+            groups.setdefault((pending.model, pending.fplan.name), []).append(pending)
+        for (model, _), pendings in groups.items():
+            fplan = pendings[0].fplan
+            values = apply_batch_hooks(fplan, [p.value for p in pendings], [p.data for p in pendings])
+            for pending, value in zip(pendings, values):
+                pending.result, errors = fplan.field.validate(value, {}, loc=fplan.field.alias, cls=model)
+                if errors:
+                    raise ValidationError([errors], model)
+        seen: set[int] = set()
+        for instance in self.instances:
+            _resolve(instance, seen)
+        for cache, key, instance in self.cache_entries:
+            cache.set(key, instance)
+
+
+def _resolve(value: Any, seen: set) -> None:
+    if id(value) in seen:
+        return
+    if isinstance(value, BaseModel):
+        seen.add(id(value))
+        values = value.__dict__
+        for key, item in values.items():
+            if type(item) is PendingValue:
+                values[key] = item.result
+            else:
+                _resolve(item, seen)
+    elif isinstance(value, (list, tuple)):
+        seen.add(id(value))
+        for item in value:
+            _resolve(item, seen)
+    elif isinstance(value, dict):
+        seen.add(id(value))
+        for item in value.values():
+            _resolve(item, seen)
+
+
+def current_collector() -> BatchCollector | None:
+    """returns the collector of the current batch scope, None outside of a batch scope"""
+    return _BATCH.get()
+
+
+@contextlib.contextmanager
+def batch_construction() -> typing.Iterator[None]:
+    """collects the values for the batch hooks of all models built in the block, the hooks run when the outermost
+    block ends"""
+    if _BATCH.get() is not None:
+        yield
+        return
+    collector = BatchCollector()
+    token = _BATCH.set(collector)
+    try:
+        yield
+    finally:
+        _BATCH.reset(token)
+    collector.flush()
+
+
+_NULL_SCOPE = contextlib.nullcontext()
+
+
+def batch_scope(model: Any) -> typing.ContextManager:
+    """returns a batch scope if models built from model use batch hooks and no scope is active yet"""
+    if _BATCH.get() is None and tree_has_batch_hooks(model if isinstance(model, type) else type(model)):
+        return batch_construction()
+    return _NULL_SCOPE
+
+
+def _walk(model: type, seen: set) -> typing.Iterator[type]:
+    if model in seen:
+        return
+    seen.add(model)
+    yield model
+    plan = get_model_plan(model)
+    if plan is not None:
+        for fplan in plan.fields:
+            for nested in get_field_models(fplan.field):
+                yield from _walk(nested, seen)
+
+
+def tree_has_batch_hooks(model: type) -> bool:
+    """returns True if model or one of its nested models has fields with batch hooks"""
+    res = _TREE_HAS_BATCH_HOOKS.get(model)
+    if res is not None:
+        return res
+    models = [m for m in _walk(model, set()) if get_model_plan(m) is not None]
+    res = any(get_model_plan(m).batch_fields for m in models)
+    if not any(isinstance(f.type_, ForwardRef) for m in models for f in m.__fields__.values()):
+        _TREE_HAS_BATCH_HOOKS[model] = res
+    return res
+
+
+def clear_batch_hooks() -> None:
+    """drops the cached batch hook lookups, e.g. after forward references have been updated"""
+    _TREE_HAS_BATCH_HOOKS.clear()
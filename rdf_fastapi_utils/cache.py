@@ -0,0 +1,112 @@
+"""Opt-in memoization of validated model instances
+
+A model enables the cache in its Config:
+
+    class Config:
+        RDF_utils_cache_size = 1000  # maximum number of cached instances, 0 disables the cache
+        RDF_utils_cache_ttl = 300  # seconds an instance is reused, None for no expiry
+
+Instances are keyed by the anchor value and a fingerprint of the grouped rows the entity was built from, an entity
+whose rows did not change returns the previously validated instance. Cached instances are shared, they must not be
+mutated.
+"""
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import Any, Hashable
+
+from rdf_fastapi_utils.rows import InternedRows
+
+_CACHES: dict[type, "ModelCache"] = {}
+_MISSING = object()
+
+
+class ModelCache:
+    """Size bounded LRU cache with optional time to live
+
+    Args:
+        maxsize (int): maximum number of entries, the least recently used entry is evicted first
+        ttl (float, optional): seconds after which an entry expires. Defaults to None (no expiry).
+    """
+
+    def __init__(self, maxsize: int, ttl: float | None = None) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: OrderedDict[Hashable, tuple[float | None, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                expires, value = entry
+                if expires is None or expires > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+                self.evictions += 1
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            expires = time.monotonic() + self.ttl if self.ttl is not None else None
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict[str, int]:
+        """returns the hit, miss and eviction counters and the current size"""
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "size": len(self._data)}
+
+
+def get_model_cache(model: type) -> ModelCache | None:
+    """returns the instance cache of a model class, None if the model does not enable caching"""
+    cache = _CACHES.get(model)
+    if cache is not None:
+        return cache
+    config = getattr(model, "__config__", None)
+    maxsize = getattr(config, "RDF_utils_cache_size", 0)
+    if not maxsize:
+        return None
+    cache = _CACHES[model] = ModelCache(maxsize, ttl=getattr(config, "RDF_utils_cache_ttl", None))
+    return cache
+
+
+def clear_model_caches() -> None:
+    """empties the instance caches of all models (the counters are kept)"""
+    for cache in _CACHES.values():
+        cache.clear()
+
+
+def _freeze(value: Any) -> Hashable:
+    if isinstance(value, (list, InternedRows)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, Mapping):
+        return frozenset((k, _freeze(v)) for k, v in value.items())
+    return value
+
+
+def entity_fingerprint(ent: Mapping) -> Hashable:
+    """returns a hashable fingerprint of a grouped entity (the output of filter_sparql for a single anchor value)
+
+    Raises:
+        TypeError: if the entity contains unhashable values
+    """
+    fingerprint = tuple((k, _freeze(v)) for k, v in ent.items())
+    hash(fingerprint)
+    return fingerprint
@@ -0,0 +1,184 @@
+"""Async SPARQL client with connection pooling, usable as FastAPI dependency"""
+import asyncio
+import typing
+import weakref
+from typing import Any, Callable
+
+import httpx
+from rdflib import Graph
+
+from rdf_fastapi_utils.sparql_results import flatten_sparql_json
+
+SPARQL_RESULTS_JSON = "application/sparql-results+json"
+RDF_GRAPH_FORMATS = {
+    "text/turtle": "turtle",
+    "application/n-triples": "nt",
+    "application/rdf+xml": "xml",
+    "application/ld+json": "json-ld",
+}
+RDF_GRAPH_ACCEPT = "text/turtle, application/n-triples;q=0.9, application/rdf+xml;q=0.8, application/ld+json;q=0.7"
+RETRY_STATUS_CODES = (429, 502, 503, 504)
+
+# event loop -> shared clients, the connection pool and the semaphore of a client are bound to the loop they are used in
+_CLIENTS: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+class SPARQLClient:
+    """Async client for a single SPARQL endpoint
+
+    All queries share one HTTP connection pool. The number of queries running at the same time is limited
+    by `max_concurrency`, failing requests (transport errors and the status codes in RETRY_STATUS_CODES) are
+    retried with exponential backoff.
+
+    Args:
+        endpoint (str): URL of the SPARQL endpoint
+        max_connections (int, optional): size of the connection pool. Defaults to 10.
+        max_concurrency (int, optional): maximum number of queries running at the same time. Defaults to
+            max_connections.
+        timeout (float, optional): timeout in seconds for a single request. Defaults to 30.0.
+        retries (int, optional): number of retries of a failing request. Defaults to 2.
+        backoff (float, optional): seconds to wait before the first retry, doubled for every further retry.
+            Defaults to 0.5.
+        **client_kwargs: passed on to httpx.AsyncClient (e.g. auth, headers, transport)
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        max_connections: int = 10,
+        max_concurrency: int | None = None,
+        timeout: float = 30.0,
+        retries: int = 2,
+        backoff: float = 0.5,
+        **client_kwargs: Any,
+    ) -> None:
+        self.endpoint = endpoint
+        self.retries = retries
+        self.backoff = backoff
+        self._semaphore = asyncio.Semaphore(max_concurrency or max_connections)
+        self._client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=timeout,
+            **client_kwargs,
+        )
+
+    async def __aenter__(self) -> "SPARQLClient":
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    async def _post(self, query: str, accept: str) -> httpx.Response:
+        attempt = 0
+        while True:
+            try:
+                async with self._semaphore:
+                    response = await self._client.post(self.endpoint, data={"query": query}, headers={"Accept": accept})
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= self.retries:
+                    response.raise_for_status()
+                    return response
+            except httpx.TransportError:
+                if attempt >= self.retries:
+                    raise
+            await asyncio.sleep(self.backoff * 2**attempt)
+            attempt += 1
+
+    async def query(self, query: str) -> dict:
+        """runs a query and returns the parsed SPARQL JSON result
+
+        Args:
+            query (str): the SPARQL query
+
+        Returns:
+            dict: parsed `application/sparql-results+json` document
+        """
+        return (await self._post(query, SPARQL_RESULTS_JSON)).json()
+
+    async def construct(self, query: str) -> Graph:
+        """runs a CONSTRUCT (or DESCRIBE) query and returns the result as rdflib Graph
+
+        Args:
+            query (str): the SPARQL query
+
+        Returns:
+            Graph: the parsed result
+        """
+        response = await self._post(query, RDF_GRAPH_ACCEPT)
+        content_type = response.headers.get("content-type", "text/turtle").split(";")[0].strip()
+        return Graph().parse(data=response.text, format=RDF_GRAPH_FORMATS.get(content_type, "turtle"))
+
+    async def select(self, query: str, variables: typing.Collection[str] | None = None) -> typing.List[dict]:
+        """runs a query and returns the result as flat `{variable: value}` rows"""
+        return flatten_sparql_json(await self.query(query), variables=variables)
+
+    async def query_models(self, model: type, query: str, many: bool = True) -> Any:
+        """runs a query and builds instances of an RDFUtilsModelBaseClass subclass from the result
+
+        Args:
+            model (type): the model class
+            query (str): the SPARQL query
+            many (bool, optional): return one instance per anchor value (`model.from_sparql_rows`), otherwise
+                only the first entity is built. Defaults to True.
+
+        Returns:
+            typing.List[RDFUtilsModelBaseClass] | RDFUtilsModelBaseClass: the instance(s)
+        """
+        result = await self.query(query)
+        if many:
+            return model.from_sparql_rows(result)
+        return model(_results=result)
+
+    async def construct_models(self, model: type, query: str, rdf_type: str | None = None) -> typing.List[Any]:
+        """runs a CONSTRUCT query and builds instances of an RDFUtilsModelBaseClass subclass from the graph
+
+        Args:
+            model (type): the model class
+            query (str): the SPARQL query
+            rdf_type (str, optional): build the subjects of this rdf:type (see `model.from_graph`). Defaults to None.
+
+        Returns:
+            typing.List[RDFUtilsModelBaseClass]: the instances
+        """
+        return model.from_graph(await self.construct(query), rdf_type=rdf_type)
+
+    async def gather(self, *queries: str) -> typing.List[dict]:
+        """runs independent queries concurrently, returns the results in the order of the queries"""
+        return list(await asyncio.gather(*(self.query(q) for q in queries)))
+
+
+def get_sparql_client(endpoint: str, **kwargs: Any) -> SPARQLClient:
+    """returns the shared client of the running event loop for an endpoint (and client settings), creating it on
+    first use, every event loop gets its own clients
+
+    Raises:
+        RuntimeError: if no event loop is running
+    """
+    clients = _CLIENTS.setdefault(asyncio.get_running_loop(), {})
+    key = (endpoint, repr(sorted(kwargs.items(), key=lambda x: x[0])))
+    client = clients.get(key)
+    if client is None:
+        client = clients[key] = SPARQLClient(endpoint, **kwargs)
+    return client
+
+
+def sparql_client_dependency(endpoint: str, **kwargs: Any) -> Callable[[], SPARQLClient]:
+    """returns a FastAPI dependency providing the shared client of an endpoint
+
+    Example:
+        `client: SPARQLClient = Depends(sparql_client_dependency("https://example.org/sparql"))`
+    """
+
+    async def dependency() -> SPARQLClient:
+        return get_sparql_client(endpoint, **kwargs)
+
+    return dependency
+
+
+async def close_sparql_clients() -> None:
+    """closes the shared clients of the running event loop, e.g. in the shutdown handler of the application"""
+    clients = _CLIENTS.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        await client.aclose()
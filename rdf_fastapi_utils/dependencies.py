@@ -0,0 +1,29 @@
+"""FastAPI dependencies for RDFUtilsModelBaseClass models"""
+import typing
+
+from fastapi import HTTPException, Query
+
+from rdf_fastapi_utils.selection import FieldSelection, parse_field_selection, resolve_field_selection
+
+
+def field_selection_dependency(model: type, parameter: str = "fields") -> typing.Callable[..., FieldSelection | None]:
+    """returns a FastAPI dependency parsing a field selection query parameter (`?fields=id,name,events.label`)
+
+    The dependency returns the resolved selection (None if the parameter is missing) and answers invalid selections
+    with a 400 response.
+
+    Example:
+        `fields: dict | None = Depends(field_selection_dependency(Person))`
+    """
+
+    def dependency(
+        fields: str | None = Query(
+            None, alias=parameter, description="comma separated list of the fields to return, e.g. id,events.label"
+        )
+    ) -> FieldSelection | None:
+        try:
+            return resolve_field_selection(model, parse_field_selection(fields))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    return dependency
@@ -0,0 +1,222 @@
+"""Models built from rdflib Graphs (e.g. the result of a CONSTRUCT query)
+
+Flattened SELECT results of nested models contain every combination of the nested values as a row. A graph holds
+every triple once: it is indexed by subject and predicate in a single pass and the fields are filled by following
+the `predicate` set in their FieldConfigurationRDF, nested models are built from the object nodes:
+
+    class Person(RDFUtilsModelBaseClass):
+        id: str = Field(..., rdfconfig=FieldConfigurationRDF(anchor=True, path="person"))
+        name: str = Field(..., rdfconfig=FieldConfigurationRDF(path="entityLabel", predicate=RDFS.label))
+        events: list[Event] = Field([], rdfconfig=FieldConfigurationRDF(predicate=CRM.P11i))
+
+    persons = Person.from_graph(graph, rdf_type=CRM.E21_Person)
+
+The anchor field gets the IRI of the node, fields without predicate keep their defaults. Literals are converted with
+`Literal.toPython()` where the field accepts the value (otherwise the lexical form is used, like in SPARQL results),
+IRIs and blank nodes to strings. Every node is built only once per model and call.
+`callback_function`, `encode_function` and the batch hooks are applied like for SPARQL results.
+
+Fields holding Unions of models build every object node with the member whose `RDF_utils_rdf_type` (set in the
+Config of the member) is one of the rdf:types of the node, nodes of other types are left out:
+
+    class Birth(RDFUtilsModelBaseClass):
+        ...
+
+        class Config:
+            RDF_utils_rdf_type = CRM.E67_Birth
+
+    events: list[Birth | Death] = Field([], rdfconfig=FieldConfigurationRDF(predicate=CRM.P98i))
+
+A Union with a member without `RDF_utils_rdf_type` can not be built from a graph (`registry.check_model` reports it).
+"""
+import typing
+from typing import Any
+
+from pydantic.fields import SHAPE_SINGLETON
+
+from rdf_fastapi_utils.batch import batch_scope
+from rdf_fastapi_utils.instrumentation import stage
+from rdf_fastapi_utils.plan import get_field_models, get_model_plan
+from rdf_fastapi_utils.sparql_results import literal_accepted
+from rdf_fastapi_utils.trusted import trusted_scope
+
+if typing.TYPE_CHECKING:
+    from rdflib import Graph
+    from rdflib.term import Node
+
+# rdflib is only imported when a graph is built, it would double the import time of the models
+RDF_TYPE = "http://www.w3.org/1999/02/22-rdf-syntax-ns#type"
+
+
+def _sort_key(node: "Node") -> tuple:
+    return type(node).__name__, str(node)
+
+
+class GraphIndex:
+    """subject -> predicate -> objects index of a graph, the objects are sorted for a deterministic output
+
+    Args:
+        graph (Graph): the graph
+    """
+
+    def __init__(self, graph: "Graph") -> None:
+        index: dict["Node", dict[str, list]] = {}
+        objects = set()
+        for s, p, o in graph:
+            index.setdefault(s, {}).setdefault(str(p), []).append(o)
+            objects.add(o)
+        for predicates in index.values():
+            for values in predicates.values():
+                values.sort(key=_sort_key)
+        self.index = index
+        self.roots = sorted((s for s in index if s not in objects), key=_sort_key)
+
+    def objects(self, subject: "Node", predicate: str) -> list:
+        """returns the objects of subject and predicate"""
+        return self.index.get(subject, {}).get(predicate, [])
+
+    def subjects(self, rdf_type: str | None = None) -> typing.List["Node"]:
+        """returns the subjects of a type or, without type, the subjects that are no object of another triple"""
+        from rdflib import URIRef
+
+        if rdf_type is None:
+            return self.roots
+        rdf_type = URIRef(rdf_type)
+        return sorted((s for s in self.index if rdf_type in self.objects(s, RDF_TYPE)), key=_sort_key)
+
+
+def to_python(node: "Node", types: tuple | None = None) -> Any:
+    """converts a node to the value used in the models
+
+    Literals are converted with `Literal.toPython()` if the value is an instance of types (any type by default, see
+    `FieldPlan.literal_types`), otherwise their lexical form is used like in flattened SPARQL results.
+    """
+    from rdflib import Literal
+
+    if isinstance(node, Literal):
+        if types == ():
+            return str(node)
+        value = node.toPython()
+        if isinstance(value, Literal) or (types is not None and not literal_accepted(value, types)):
+            return str(node)
+        return value
+    return str(node)
+
+
+class GraphBuilder:
+    """builds model instances from an indexed graph, every (model, node) pair is built once
+
+    Args:
+        index (GraphIndex): the indexed graph
+    """
+
+    def __init__(self, index: GraphIndex) -> None:
+        self.index = index
+        self.built: dict[tuple, Any] = {}
+        self.building: set = set()
+
+    def map_node(self, model: type, node: "Node") -> dict:
+        """returns the data of the fields of model for a node (the counterpart of `map_fields_data`)"""
+        res = {}
+        for fplan in get_model_plan(model).fields:
+            rdfconfig = fplan.field.field_info.extra.get("rdfconfig")
+            if getattr(rdfconfig, "anchor", False):
+                res[fplan.name] = to_python(node)
+                continue
+            predicate = getattr(rdfconfig, "predicate", None)
+            if predicate is None:
+                continue
+            objects = self.index.objects(node, str(predicate))
+            if not objects:
+                continue
+            models = get_field_models(fplan.field)
+            if len(models) > 1:
+                values = [self.build_member(fplan.name, models, obj) for obj in objects]
+                values = [value for value in values if value is not None]
+            elif models:
+                values = [self.build(models[0], obj) for obj in objects]
+                values = [value for value in values if value is not None]
+            else:
+                values = [to_python(obj, fplan.literal_types) for obj in objects]
+                if fplan.default_dict_key is not None:
+                    values = [{fplan.default_dict_key: value} for value in values]
+            if fplan.field.shape == SHAPE_SINGLETON:
+                if values:
+                    res[fplan.name] = values[0]
+            else:
+                res[fplan.name] = values
+        return res
+
+    def build_member(self, name: str, models: typing.List[type], node: "Node") -> Any:
+        """returns the instance of the Union member matching the rdf:type of node, None if no member matches
+
+        Raises:
+            ValueError: if a member has no `RDF_utils_rdf_type`
+        """
+        from rdflib import URIRef
+
+        types = self.index.objects(node, RDF_TYPE)
+        for model in models:
+            rdf_type = getattr(model.__config__, "RDF_utils_rdf_type", None)
+            if rdf_type is None:
+                raise ValueError(
+                    f"field {name}: Union member {model.__name__} has no RDF_utils_rdf_type, the member of a node can"
+                    " not be chosen"
+                )
+            if URIRef(rdf_type) in types:
+                return self.build(model, node)
+        return None
+
+    def build(self, model: type, node: "Node") -> Any:
+        """returns the instance of model for node, None for a node already being built (a cycle)"""
+        key = (model, node)
+        if key in self.built:
+            return self.built[key]
+        if key in self.building:
+            return None
+        self.building.add(key)
+        try:
+            instance = model.__new__(model)
+            with trusted_scope(instance):
+                with stage(model, "map_fields_data"):
+                    data = self.map_node(model, node)
+                with stage(model, "post_process_data"):
+                    data = instance.post_process_data(data=data)
+                with stage(model, "encode_data"):
+                    data = instance.encode_data(data=data)
+                    data = instance.batch_process_data(data)
+                instance._finalize_init(data)
+        finally:
+            self.building.discard(key)
+        self.built[key] = instance
+        return instance
+
+
+def build_from_graph(
+    model: type,
+    graph: "Graph | GraphIndex",
+    subjects: typing.Iterable["str | Node"] | None = None,
+    rdf_type: str | None = None,
+) -> typing.List[Any]:
+    """builds one instance of model per subject of a graph
+
+    Args:
+        model (type): the model class
+        graph (Graph | GraphIndex): the graph, or a graph indexed before
+        subjects (typing.Iterable[str | Node], optional): the subjects to build, strings are taken as IRIs.
+            Defaults to None (the subjects of rdf_type).
+        rdf_type (str, optional): build the subjects of this type. Defaults to None (without subjects: the
+            subjects that are no object of another triple).
+
+    Returns:
+        typing.List[RDFUtilsModelBaseClass]: the instances, in the order of subjects or sorted by IRI
+    """
+    from rdflib import URIRef
+    from rdflib.term import Node
+
+    index = graph if isinstance(graph, GraphIndex) else GraphIndex(graph)
+    if subjects is None:
+        subjects = index.subjects(rdf_type)
+    builder = GraphBuilder(index)
+    with batch_scope(model):
+        return [builder.build(model, s if isinstance(s, Node) else URIRef(s)) for s in subjects]
@@ -0,0 +1,167 @@
+"""Per-stage timing of model construction
+
+Instrumentation is disabled unless a collector is active in the current context:
+
+    with collect_timings() as collector:
+        persons = Person.from_sparql_rows(rows)
+    print(collector.totals())
+
+The stages recorded by RDFUtilsModelBaseClass are `filter_sparql`, `map_fields_data`, `post_process_data`
+(`callback_function` callbacks), `encode_data` (`encode_function` callbacks) and `validation` (pydantic), direct
+serialization (`rdf_fastapi_utils.serializer`) records `serialization` instead of `validation`. Durations
+are exclusive: the time spent building nested models is attributed to the nested model, not to the stage of the
+parent that triggered it, so the durations of all stages add up to the total construction time.
+
+With `collect_timings(memory=True)` the net size of the memory allocated by every stage (what it allocated and did
+not free again, e.g. the built instances) is recorded as well, using tracemalloc (started for the duration of the
+collection if it is not tracing already). Tracing slows construction down considerably, the durations of such a
+collection are not representative.
+
+The stage nesting is tracked per thread (and asyncio task), a collector can be shared by code running in several
+threads.
+"""
+import contextlib
+import contextvars
+import threading
+import tracemalloc
+import typing
+from time import perf_counter
+from typing import Any, Callable
+
+STAGES = ("filter_sparql", "map_fields_data", "post_process_data", "encode_data", "validation", "serialization")
+
+_COLLECTOR: contextvars.ContextVar["StageCollector | None"] = contextvars.ContextVar(
+    "rdf_utils_stage_collector", default=None
+)
+
+
+# the innermost running stage, contextvars are separate per thread (and task) unlike an attribute of the collector
+_CURRENT: contextvars.ContextVar["_Stage | None"] = contextvars.ContextVar("rdf_utils_current_stage", default=None)
+
+
+class _Stage:
+    __slots__ = ("collector", "model", "name", "start", "children", "memory_start", "memory_children", "token")
+
+    def __init__(self, collector: "StageCollector", model: str, name: str) -> None:
+        self.collector = collector
+        self.model = model
+        self.name = name
+
+    def __enter__(self) -> None:
+        self.children = 0.0
+        self.token = _CURRENT.set(self)
+        if self.collector.memory:
+            self.memory_children = 0
+            self.memory_start = tracemalloc.get_traced_memory()[0]
+        self.start = perf_counter()
+
+    def __exit__(self, *exc: Any) -> None:
+        elapsed = perf_counter() - self.start
+        _CURRENT.reset(self.token)
+        parent = _CURRENT.get()
+        if parent is not None and parent.collector is not self.collector:
+            parent = None
+        if parent is not None:
+            parent.children += elapsed
+        memory = None
+        if self.collector.memory:
+            allocated = tracemalloc.get_traced_memory()[0] - self.memory_start
+            memory = allocated - self.memory_children
+            if parent is not None:
+                parent.memory_children += allocated
+        self.collector.record(self.model, self.name, elapsed - self.children, memory)
+
+
+class StageCollector:
+    """Collects call counts and exclusive durations per model class and stage
+
+    Args:
+        on_stage (Callable, optional): hook called with (model name, stage, seconds) after every stage.
+            Defaults to None.
+        memory (bool, optional): also record the net allocated bytes per model class and stage (tracemalloc must
+            be tracing). Defaults to False.
+    """
+
+    def __init__(self, on_stage: Callable[[str, str, float], None] | None = None, memory: bool = False) -> None:
+        self.on_stage = on_stage
+        self.memory = memory
+        self.stats: dict[tuple[str, str], list] = {}
+        self.memory_stats: dict[tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, model: str, stage: str, duration: float, memory: int | None = None) -> None:
+        with self._lock:
+            entry = self.stats.get((model, stage))
+            if entry is None:
+                entry = self.stats[(model, stage)] = [0, 0.0]
+            entry[0] += 1
+            entry[1] += duration
+            if memory is not None:
+                self.memory_stats[(model, stage)] = self.memory_stats.get((model, stage), 0) + memory
+        if self.on_stage is not None:
+            self.on_stage(model, stage, duration)
+
+    def totals(self) -> dict[str, float]:
+        """returns the summed duration in seconds per stage"""
+        res = {}
+        for (_, stage), (_, duration) in self.stats.items():
+            res[stage] = res.get(stage, 0.0) + duration
+        return res
+
+    def memory_totals(self) -> dict[str, int]:
+        """returns the summed net allocated bytes per stage (empty unless memory is recorded)"""
+        res = {}
+        for (_, stage), allocated in self.memory_stats.items():
+            res[stage] = res.get(stage, 0) + allocated
+        return res
+
+    def model_totals(self) -> dict[str, float]:
+        """returns the summed duration in seconds per model class"""
+        res = {}
+        for (model, _), (_, duration) in self.stats.items():
+            res[model] = res.get(model, 0.0) + duration
+        return res
+
+    def slowest_models(self, n: int = 5) -> typing.List[typing.Tuple[str, float]]:
+        """returns the n model classes with the highest summed duration"""
+        return sorted(self.model_totals().items(), key=lambda x: x[1], reverse=True)[:n]
+
+    def server_timing(self) -> str:
+        """returns the stage totals formatted as value of a `Server-Timing` header"""
+        return ", ".join(f"{stage};dur={duration * 1000:.2f}" for stage, duration in self.totals().items())
+
+
+def stage(model: Any, name: str) -> typing.ContextManager:
+    """returns a context manager timing a stage of model (class or instance), a no-op without active collector"""
+    collector = _COLLECTOR.get()
+    if collector is None:
+        return _NULL_STAGE
+    if not isinstance(model, type):
+        model = type(model)
+    return _Stage(collector, model.__name__, name)
+
+
+_NULL_STAGE = contextlib.nullcontext()
+
+
+@contextlib.contextmanager
+def collect_timings(
+    on_stage: Callable[[str, str, float], None] | None = None, memory: bool = False
+) -> typing.Iterator[StageCollector]:
+    """activates a StageCollector for the current context, with memory the allocations are traced as well"""
+    collector = StageCollector(on_stage=on_stage, memory=memory)
+    started = memory and not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    token = _COLLECTOR.set(collector)
+    try:
+        yield collector
+    finally:
+        _COLLECTOR.reset(token)
+        if started:
+            tracemalloc.stop()
+
+
+def get_collector() -> StageCollector | None:
+    """returns the collector active in the current context"""
+    return _COLLECTOR.get()
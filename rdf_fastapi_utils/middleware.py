@@ -0,0 +1,56 @@
+"""ASGI middleware reporting the model construction stages of a request"""
+import logging
+from time import perf_counter
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from rdf_fastapi_utils.instrumentation import collect_timings
+
+logger = logging.getLogger("rdf_fastapi_utils")
+
+
+class ServerTimingMiddleware:
+    """Adds a `Server-Timing` header with the summed duration of every construction stage to the responses
+
+    Args:
+        app (ASGIApp): the application
+        log_slowest (int, optional): log the given number of slowest model classes of every request (INFO level of
+            the `rdf_fastapi_utils` logger). Defaults to 0 (no logging).
+        min_duration (float, optional): only log requests whose construction stages took at least this many
+            seconds. Defaults to 0.0.
+
+    Example:
+        `app.add_middleware(ServerTimingMiddleware, log_slowest=3)`
+    """
+
+    def __init__(self, app: ASGIApp, log_slowest: int = 0, min_duration: float = 0.0) -> None:
+        self.app = app
+        self.log_slowest = log_slowest
+        self.min_duration = min_duration
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = perf_counter()
+        with collect_timings() as collector:
+
+            async def send_with_timing(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    timings = collector.server_timing()
+                    total = f"total;dur={(perf_counter() - start) * 1000:.2f}"
+                    headers = MutableHeaders(scope=message)
+                    headers.append("Server-Timing", f"{timings}, {total}" if timings else total)
+                await send(message)
+
+            await self.app(scope, receive, send_with_timing)
+        if self.log_slowest:
+            slowest = collector.slowest_models(self.log_slowest)
+            if slowest and sum(collector.totals().values()) >= self.min_duration:
+                logger.info(
+                    "slowest models for %s %s: %s",
+                    scope.get("method"),
+                    scope.get("path"),
+                    ", ".join(f"{model} {duration * 1000:.2f}ms" for model, duration in slowest),
+                )
@@ -1,41 +1,271 @@
-from copy import deepcopy
-import datetime
+import contextlib
+import functools
 from typing import Any, Callable, List, Tuple
 import typing
-from pydantic import BaseModel, Field, HttpUrl, ValidationError, constr
-from pydantic.fields import ModelField
+from collections.abc import Mapping
+from pydantic import BaseModel, Field, HttpUrl, ValidationError, constr, validate_model
+from pydantic.error_wrappers import ErrorWrapper
+from pydantic.errors import MissingError
+from pydantic.fields import SHAPE_LIST, SHAPE_SINGLETON, ModelField
+from pydantic.utils import ROOT_KEY
+
+from rdf_fastapi_utils.batch import (
+    BatchCollector,
+    apply_batch_hooks,
+    batch_scope,
+    clear_batch_hooks,
+    current_collector,
+)
+from rdf_fastapi_utils.cache import entity_fingerprint, get_model_cache
+from rdf_fastapi_utils.graph import GraphIndex, build_from_graph
+from rdf_fastapi_utils.instrumentation import stage
+from rdf_fastapi_utils.ordering import reorder_by_first_seen, sort_fields
+from rdf_fastapi_utils.parallel import build_parallel, get_parallel_settings
+from rdf_fastapi_utils.plan import (
+    BRANCH_CLASS_CALLBACK,
+    BRANCH_VALUE,
+    clear_model_plans,
+    get_model_literal_types,
+    get_model_plan,
+)
+from rdf_fastapi_utils.query import warn_unused_variables
+from rdf_fastapi_utils.rows import InternedRows, SchemaRow, group_interned, intern_rows, row_layout
+from rdf_fastapi_utils.selection import parse_field_selection, resolve_field_selection, select_fields
+from rdf_fastapi_utils.serializer import clear_encoders, is_direct_serialization, serialize_entity
+from rdf_fastapi_utils.sparql_results import flatten_sparql_json, is_sparql_json
+from rdf_fastapi_utils.trusted import (
+    FALLBACK,
+    clear_coercers,
+    construct_trusted,
+    construct_trusted_entity,
+    get_coercers,
+    get_entity_coercers,
+    is_trusted,
+    trusted_construction,
+    trusted_scope,
+)
+
+if typing.TYPE_CHECKING:
+    from rdflib import Graph
+
+
+def _prune_list(values: list) -> list:
+    res = []
+    for c in values:
+        if isinstance(c, dict):
+            x = removeNullNoneEmpty(c)
+            if x:
+                res.append(x)
+        elif c is not None and c != "":
+            res.append(c)
+    return res
 
 
 def removeNullNoneEmpty(ob):
+    """removes None values, empty strings and (resulting) empty dicts and lists from a nested dict in a single pass"""
     l = {}
-    check = False
     for k, v in ob.items():
         if isinstance(v, dict):
             x = removeNullNoneEmpty(v)
-            if len(x.keys()) > 0:
+            if x:
                 l[k] = x
-            if x != v:
-                check = True
         elif isinstance(v, list):
-            p = []
-            for c in v:
-                if isinstance(c, dict):
-                    x = removeNullNoneEmpty(c)
-                    if len(x.keys()) > 0:
-                        p.append(x)
-                elif c is not None and c != "":
-                    p.append(c)
-            if len(p) > 0:
+            p = _prune_list(v)
+            if p:
                 l[k] = p
-            if p != v:
-                check = True
         elif v is not None and v != "":
             l[k] = v
-    if check:
-        l = removeNullNoneEmpty(l)
     return l
 
 
+_PRUNED = object()
+
+
+def _prune_value(value: Any) -> Any:
+    """applies removeNullNoneEmpty to a single field value, returns _PRUNED if nothing is left"""
+    if isinstance(value, dict):
+        value = removeNullNoneEmpty(value)
+    elif isinstance(value, list):
+        value = _prune_list(value)
+    elif value is None or value == "":
+        return _PRUNED
+    return value if value or not isinstance(value, (dict, list)) else _PRUNED
+
+
+def _removable_prefix(model: type, loc: tuple) -> int:
+    """returns the length of the longest prefix of an error location pointing to an optional field or a list element
+
+    0 means the error can not be tolerated (it is located in a required field of the model itself).
+    """
+    cut = 0
+    idx = 0
+    while idx < len(loc):
+        fields = {f.alias: f for f in model.__fields__.values()}
+        field = fields.get(loc[idx])
+        if field is None:
+            break
+        idx += 1
+        if not field.required:
+            cut = idx
+        if field.shape == SHAPE_LIST and idx < len(loc) and isinstance(loc[idx], int):
+            idx += 1
+            cut = idx
+        elif field.shape != SHAPE_SINGLETON:
+            break
+        if not hasattr(field.type_, "__fields__"):
+            break
+        model = field.type_
+    return cut
+
+
+def _cut_subtree(data: dict, loc: tuple, owned: set) -> Any:
+    """sets the value at loc to None, copying the containers on the path that are not owned yet
+
+    Returns the removed value, _PRUNED if the path does not exist in data.
+    """
+    container = data
+    for key in loc[:-1]:
+        try:
+            child = container[key]
+        except (KeyError, IndexError, TypeError):
+            return _PRUNED
+        if id(child) not in owned:
+            if isinstance(child, list):
+                child = list(child)
+            elif isinstance(child, Mapping):
+                child = dict(child)
+            else:
+                return _PRUNED
+            owned.add(id(child))
+            container[key] = child
+        container = child
+    try:
+        removed = container[loc[-1]]
+    except (KeyError, IndexError, TypeError):
+        return _PRUNED
+    container[loc[-1]] = None
+    return removed
+
+
+def _previous_errors(value: Any, error_key: str) -> list:
+    """returns the errors recorded in a (mapped or validated) entity that gets removed"""
+    if isinstance(value, Mapping):
+        errors = value.get(error_key)
+    else:
+        errors = getattr(value, error_key, None)
+    return errors if isinstance(errors, list) else []
+
+
+def _add_unique(values: list, seen: set, value: Any) -> None:
+    """appends value to values if not yet present, using seen for hashable values"""
+    try:
+        if value in seen:
+            return
+        seen.add(value)
+    except TypeError:
+        if value in values:
+            return
+    values.append(value)
+
+
+def _validate_selected(model: type, data: dict, selection: dict) -> typing.Tuple[dict, set, ValidationError | None]:
+    """returns (values, fields_set, error) like pydantic's `validate_model` validating only the selected fields
+
+    Root validators run as usual, post root validators see the defaults of the unselected fields. The returned values
+    only hold the selected fields (sparse instances read the other fields as their default). Selected fields are
+    coerced without validation in trusted mode.
+    """
+    for validator in model.__pre_root_validators__:
+        try:
+            data = validator(model, data)
+        except (ValueError, TypeError, AssertionError) as exc:
+            return {}, set(), ValidationError([ErrorWrapper(exc, loc=ROOT_KEY)], model)
+    coercers = get_coercers(model) if is_trusted() else None
+    values = {}
+    fields_set = set()
+    errors = []
+    for idx, field in enumerate(model.__fields__.values()):
+        if field.name not in selection:
+            values[field.name] = field.get_default()
+        elif field.alias in data:
+            value = data[field.alias]
+            if coercers is not None and coercers[idx][3] is not None:
+                value = coercers[idx][3](value)
+            if coercers is None or coercers[idx][3] is None or value is FALLBACK:
+                value, error = field.validate(data[field.alias], values, loc=field.alias, cls=model)
+                if error:
+                    errors.append(error)
+                    continue
+            values[field.name] = value
+            fields_set.add(field.name)
+        elif field.required:
+            errors.append(ErrorWrapper(MissingError(), loc=field.alias))
+        else:
+            values[field.name] = field.get_default()
+    for skip_on_failure, validator in model.__post_root_validators__:
+        if skip_on_failure and errors:
+            continue
+        try:
+            values = validator(model, values)
+        except (ValueError, TypeError, AssertionError) as exc:
+            errors.append(ErrorWrapper(exc, loc=ROOT_KEY))
+    values = {name: value for name, value in values.items() if name in selection}
+    return values, fields_set, ValidationError(errors, model) if errors else None
+
+
+def _cached_entities(model: type, value: Any) -> Any:
+    """replaces grouped entities by (cached) instances of model, entities failing validation are left unchanged
+    for the validation of the parent model"""
+    if isinstance(value, list):
+        return [_cached_entities(model, ent) for ent in value]
+    if not isinstance(value, Mapping):
+        return value
+    try:
+        return model.from_entity(value)
+    except ValidationError:
+        return value
+
+
+def _trusted_entities(model: type, value: Any) -> Any:
+    """builds grouped entities of model right away in trusted mode, so the parent assigns the instances instead of
+    coercing dicts level by level, entities that need full validation are left unchanged for the parent model"""
+    if isinstance(value, list):
+        return [_trusted_entities(model, ent) for ent in value]
+    if not isinstance(value, Mapping):
+        return value
+    try:
+        return model._construct_trusted(value)
+    except ValidationError:
+        return value
+
+
+def _build_entity(model: type, ent: dict) -> Any:
+    """builds an entity returned by a serialization class callback, a JSON compatible dict in direct serialization"""
+    if is_direct_serialization():
+        return serialize_entity(model, ent)
+    if hasattr(model, "from_entity"):
+        return model.from_entity(ent)
+    return model(**ent)
+
+
+def _build_entities(model: type, ents: typing.Sequence, owner: Any) -> list:
+    """builds entities (see `_build_entity`), in parallel if the Config of owner or the context asks for it"""
+    res = build_parallel(_build_entity, model, ents, get_parallel_settings(owner))
+    if res is None:
+        res = [_build_entity(model, ent) for ent in ents]
+    return res
+
+
+class SortConfigurationRDF(BaseModel):
+    """Configuration for sorting the values of a list field, see `rdf_fastapi_utils.ordering`"""
+
+    key: constr(regex=r"^[a-zA-Z0-9._]+$") | None = Field(
+        None, description="Dotted path of the field (or dict key) of the list items to sort on, None for the items"
+    )
+    descending: bool = Field(False, description="Whether to sort in descending order")
+    nulls_last: bool = Field(True, description="Whether to put items without a value for the key at the end")
+
+
 class FieldConfigurationRDF(BaseModel):
     """Configuration for how to use RDF data in the field"""
 
@@ -64,6 +294,23 @@ class FieldConfigurationRDF(BaseModel):
         False,
         description="Wether to bypass the automated data mapping, e.g. to do it in a dedicated callback function.",
     )
+    predicate: str | None = Field(
+        None,
+        description="IRI of the predicate to follow when the model is built from an rdflib Graph (`from_graph`).",
+    )
+    batch_callback_function: Callable | None = Field(
+        None,
+        description="Batch variant of `callback_function`, gets the field, the values of all instances built in one\
+            construction call and their data and returns the processed values in the same order.",
+    )
+    batch_encode_function: Callable | None = Field(
+        None,
+        description="Batch variant of `encode_function`, gets the values of all instances built in one construction\
+            call and returns the encoded values in the same order.",
+    )
+    sort: SortConfigurationRDF | None = Field(
+        None, description="Sorts the values of the (list) field, by default the order of the RDF results is kept."
+    )
 
 
 class RDFUtilsModelBaseClass(BaseModel):
@@ -72,8 +319,20 @@ class RDFUtilsModelBaseClass(BaseModel):
     class Config:
         RDF_utils_catch_errors = False
         RDF_utils_error_field_name = "errors"
+        RDF_utils_trusted = False
+        RDF_utils_intern_rows = False
+        RDF_utils_parallel = None
+        RDF_utils_rdf_type = None
+        RDF_utils_warn_unused_variables = False
         # RDF_utils_move_errors_to_top = False FIXME: add again when #3 is resolved
 
+    def __getattr__(self, name: str) -> Any:
+        # fields left out by a field selection are not stored in the instance, they read as their default
+        field = type(self).__fields__.get(name)
+        if field is None:
+            raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+        return field.get_default()
+
     @staticmethod
     def harm_filter_sparql(data: list) -> list | None:
         for ent in data:  # FIXME: this is a hack to fix the problem with the filter_sparql function
@@ -91,6 +350,13 @@ class RDFUtilsModelBaseClass(BaseModel):
     ) -> typing.List[dict] | None:
         """filters sparql result for key value pairs
 
+        When an anchor is given the rows are grouped by the anchor value in a single pass, the groups are
+        returned in the order their anchor value first shows up in the data. The `_additional_values` of a group
+        are the distinct input rows without the consumed keys, as read-only `rows.SchemaRow` mappings: a tuple of
+        values and the columns shared by all rows with the same columns, nested levels narrow them without dicts.
+        Interned rows (`rows.InternedRows`) are grouped and deduplicated on their value ids (on their values if
+        they hold unhashable values or equal values of different types, like 1 and True).
+
         Args:
             data (list): array of results from sparql endpoint (python object converted from json return)
             filter (typing.List[tuple]): list of tuples containing key / value pair to filter on
@@ -100,19 +366,13 @@ class RDFUtilsModelBaseClass(BaseModel):
         Returns:
             typing.List[dict] | None: list of dictionaries containing keys and values
         """
-        if isinstance(data, list):
+        if isinstance(data, (list, InternedRows)):
             if len(data) == 0:
                 return []
-            if not isinstance(data[0], dict):
+            if not isinstance(data[0], Mapping):
                 return data
-        if isinstance(data, dict):
+        if isinstance(data, Mapping):
             data = [data]
-        if additional_values is None:
-            additional_values = []
-            for ent in data:
-                for key in ent:
-                    if key not in additional_values:
-                        additional_values.append(key)
         if filters is not None:
             while len(filters) > 0 and len(data) > 0:
                 f1 = filters.pop(0)
@@ -120,41 +380,60 @@ class RDFUtilsModelBaseClass(BaseModel):
             data = data_res
         if len(data) == 0:
             return None
-        # if list_of_keys is not None:
-        #     data = [{k: v for k, v in d.items() if k in list_of_keys or k in additional_values} for d in data]
         if list_of_keys is None:
-            list_of_keys = []
-            for ent in data:
-                for key in ent:
-                    if key not in list_of_keys:
-                        list_of_keys.append(key)
+            list_of_keys = dict.fromkeys(key for ent in data for key in ent)
+        if anchor is not None and isinstance(data, InternedRows) and not (data.has_unhashable or data.has_equal_values):
+            return self.harm_filter_sparql(group_interned(data, anchor, list_of_keys))
         if anchor is not None:
-            lst_unique_vals = set([x[anchor] for x in data if anchor in x])
+            keys = frozenset(list_of_keys) | {anchor}
+            groups = {}  # anchor value -> (values per key, additional values, seen additional values)
+            layouts = {}  # columns of the input rows -> RowLayout
+            schemas = {}  # remaining columns -> RowSchema shared by the additional values
+            for row in data:
+                if type(row) is SchemaRow:
+                    values, columns = row.values, row.schema
+                else:
+                    values = row
+                    columns = tuple(row)
+                layout = layouts.get(columns)
+                if layout is None:
+                    layout = layouts[columns] = row_layout(row, anchor, keys, schemas)
+                if layout.anchor is None:
+                    continue
+                group = groups.get(values[layout.anchor])
+                if group is None:
+                    group = groups[values[layout.anchor]] = ({}, [], set())
+                res_vals, add_vals, add_vals_seen = group
+                for k, acc in layout.keys:
+                    v = values[acc]
+                    vals = res_vals.get(k)
+                    if vals is None:
+                        # a list as first value is extended, any other value is kept as scalar until a
+                        # second distinct value shows up
+                        vals = res_vals[k] = (isinstance(v, list), [], set())
+                        for v1 in v if vals[0] else (v,):
+                            _add_unique(vals[1], vals[2], v1)
+                    else:
+                        try:
+                            if v in vals[2]:
+                                continue  # repeated value, the common case for the keys of a group
+                        except TypeError:
+                            pass
+                        _add_unique(vals[1], vals[2], v)
+                if layout.schema is not None:
+                    add_row = SchemaRow(layout.schema, layout.rest(values))
+                    try:
+                        row_key = (layout.schema, add_row.values)
+                        if row_key in add_vals_seen:
+                            continue
+                        add_vals_seen.add(row_key)
+                    except TypeError:
+                        if add_row in add_vals:
+                            continue
+                    add_vals.append(add_row)
             res_fin_anchor = []
-            for item in lst_unique_vals:
-                add_vals = []
-                res1 = {}
-                for i2 in list(filter(lambda d: d[anchor] == item, [x for x in data if anchor in x])):
-                    add_vals_dict = deepcopy(i2)
-                    for k, v in i2.items():
-                        if k in list_of_keys or k == anchor:
-                            if k not in res1:
-                                res1[k] = v
-                            else:
-                                if (
-                                    isinstance(res1[k], str)
-                                    or isinstance(res1[k], int)
-                                    or isinstance(res1[k], float)
-                                    or isinstance(res1[k], datetime.datetime)
-                                ):
-                                    if v != res1[k]:
-                                        res1[k] = [res1[k], v]
-                                elif v not in res1[k]:
-                                    res1[k].append(v)
-                            del add_vals_dict[k]
-                    if add_vals_dict:
-                        if add_vals_dict not in add_vals:
-                            add_vals.append(add_vals_dict)
+            for res_vals, add_vals, _ in groups.values():
+                res1 = {k: vals if is_list or len(vals) > 1 else vals[0] for k, (is_list, vals, _) in res_vals.items()}
                 if len(add_vals) > 0:
                     if not "_additional_values" in res1:
                         res1["_additional_values"] = add_vals
@@ -163,10 +442,11 @@ class RDFUtilsModelBaseClass(BaseModel):
                 res_fin_anchor.append(res1)
             return self.harm_filter_sparql(res_fin_anchor)
         else:
+            keys = set(list_of_keys)
             res_fin = []
             for i1 in data:
                 for k, v in i1.items():
-                    if k in list_of_keys:
+                    if k in keys:
                         if isinstance(v, list):
                             for count, it in enumerate(v):
                                 if len(res_fin) - 1 < count:
@@ -202,14 +482,10 @@ class RDFUtilsModelBaseClass(BaseModel):
 
     def get_anchor_element_from_model(self, model: BaseModel) -> typing.Tuple[str, ModelField] | None:
         """takes a model class and returns a tuple of the anchor element and the field class"""
-        if hasattr(model, "__fields__"):
-            for f_name, f_class in model.__fields__.items():
-                f_conf = f_class.field_info.extra.get("rdfconfig", object())
-                if getattr(f_conf, "anchor", False):
-                    if getattr(f_conf, "path", False):
-                        f_name = getattr(f_conf, "path")
-                    return f_name, f_class
-        return None
+        plan = get_model_plan(model)
+        if plan is None or plan.anchor is None:
+            return None
+        return plan.anchor, plan.anchor_field
 
     def get_rdf_variables_from_field(self, field: ModelField) -> typing.List[str]:
         res = []
@@ -222,19 +498,16 @@ class RDFUtilsModelBaseClass(BaseModel):
         return res
 
     def get_rdf_variables_from_model(self, model: BaseModel) -> typing.List[str]:
-        if not hasattr(model, "__fields__"):
+        plan = get_model_plan(model)
+        if plan is None:
             return []
-        res = []
-        for f_name, f_class in model.__fields__.items():
-            f_conf = f_class.field_info.extra.get("rdfconfig", object())
-            if hasattr(f_conf, "path"):
-                res.append(f_conf.path)
-            else:
-                res.append(f_name)
-        return res
+        return list(plan.variables)
 
     def map_fields_data(self, data: dict) -> dict:
-        """Unses the field information to map the RDF values to the correct fields
+        """Unses the compiled mapping plan of the model to map the RDF values to the correct fields
+
+        If data contains a field selection (`_fields`, see `rdf_fastapi_utils.selection`) only the selected fields
+        are mapped and the nested selections are passed on to the grouped entities of nested models.
 
         Args:
             data (dict): input RDF data
@@ -243,134 +516,350 @@ class RDFUtilsModelBaseClass(BaseModel):
             dict: resulting data using the correct maps
         """
         res = {}
-        for field in self.__fields__.values():
-            path = getattr(field.field_info.extra.get("rdfconfig"), "path", None)
-            if path is None:
-                path = field.name
+        selection = data.get("_fields")
+        for fplan in get_model_plan(self).fields:
+            if selection is not None and fplan.name not in selection:
+                continue
+            path = fplan.path
             if path not in data:
-                # res[field.name] = data
-                anchor = self.get_anchor_element_from_model(model=field.type_)
-                if "_additional_values" in data:
-                    if anchor is None and path in data["_additional_values"]:
-                        res[field.name] = data["_additional_values"][path]
-                res[field.name] = self.filter_sparql(
+                res[fplan.name] = self.filter_sparql(
                     data=data["_additional_values"] if "_additional_values" in data else data,
-                    # data=data,
-                    anchor=anchor[0] if anchor is not None else None,
-                    list_of_keys=self.get_rdf_variables_from_model(model=field.type_),
+                    anchor=fplan.anchor,
+                    list_of_keys=fplan.variables,
                 )
-                continue
-            if (
-                hasattr(field.type_, "__fields__")
-                or hasattr(field.type_, "__args__")
-                and not getattr(field.field_info.extra.get("rdfconfig"), "bypass_data_mapping", False)
-            ):  # FIXME: this test doesnt catch all the options
-                scallback_attr = getattr(field.field_info.extra.get("rdfconfig"), "serialization_class_callback", None)
-                default_dict_key = getattr(field.field_info.extra.get("rdfconfig"), "default_dict_key", None)
-                if scallback_attr is not None:
-                    res[field.name] = []
-                    if not isinstance(data[path], list):
-                        data[path] = [data[path]]
-                    # for ent in data[path]:
-                    cb1 = scallback_attr(field, data[path])
-                    for cb in cb1:
-                        anchor = self.get_anchor_element_from_model(model=cb[0])
-                        rdf_data = self.filter_sparql(
-                            data=cb[1],
-                            anchor=anchor[0],
-                            list_of_keys=self.get_rdf_variables_from_model(model=cb[0]),
-                        )
-                        res[field.name].extend([cb[0](**ent) for ent in rdf_data])
-                    if field.outer_type_.__origin__ != list:
-                        res[field.name] = res[field.name][0]
-                elif (
-                    (isinstance(data[path], list) or isinstance(data[path], str))
-                    and default_dict_key is not None
-                    and isinstance(field.sub_fields, list)
-                ):
-                    if isinstance(data[path], str):
-                        d1 = [data[path]]
-                    else:
-                        d1 = data[path]
-                    res[field.name] = [{default_dict_key: ent} for ent in d1]
-                elif (isinstance(data[path], list) or isinstance(data[path], str)) and default_dict_key is not None:
-                    if isinstance(data[path], list):
-                        d1 = data[path][0]
-                    else:
-                        d1 = data[path]
-                    res[field.name] = {default_dict_key: d1}
-                elif isinstance(data[path], list):
-                    anchor = self.get_anchor_element_from_model(model=field.type_)
-                    res[field.name] = self.filter_sparql(
-                        # data=data["_additional_values"] if "_additional_values" in data else data[path],
-                        data=data[path],
-                        anchor=anchor[0] if anchor is not None else None,
-                        list_of_keys=self.get_rdf_variables_from_model(model=field.type_),
+            elif fplan.branch == BRANCH_VALUE:
+                res[fplan.name] = data[path]
+            elif fplan.branch == BRANCH_CLASS_CALLBACK:
+                value = data[path]
+                res[fplan.name] = []
+                if not isinstance(value, (list, InternedRows)):
+                    value = [value]
+                for cb in fplan.serialization_class_callback(fplan.field, value):
+                    cb_plan = get_model_plan(cb[0])
+                    rdf_data = self.filter_sparql(
+                        data=cb[1],
+                        anchor=cb_plan.anchor,
+                        list_of_keys=cb_plan.variables,
                     )
-                elif field.sub_fields is None:
-                    anchor = self.get_anchor_element_from_model(model=field.type_)
-                    res[field.name] = self.filter_sparql(
-                        # data=data["_additional_values"] if "_additional_values" in data else data,
-                        data=data,
-                        anchor=anchor[0] if anchor is not None else None,
-                        list_of_keys=self.get_rdf_variables_from_model(model=field.type_),
-                    )[0]
+                    if selection is not None:
+                        select_fields(rdf_data, selection[fplan.name])
+                    res[fplan.name].extend(_build_entities(cb[0], rdf_data, self))
+                if not fplan.is_list:
+                    res[fplan.name] = res[fplan.name][0]
+            elif (isinstance(data[path], list) or isinstance(data[path], str)) and fplan.default_dict_key is not None:
+                value = data[path]
+                if fplan.has_sub_fields:
+                    d1 = [value] if isinstance(value, str) else value
+                    res[fplan.name] = [{fplan.default_dict_key: ent} for ent in d1]
                 else:
-                    anchor = self.get_anchor_element_from_model(model=field.type_)
-                    res[field.name] = self.filter_sparql(
-                        # data=data["_additional_values"] if "_additional_values" in data else data,
-                        data=data,
-                        anchor=anchor[0] if anchor is not None else None,
-                        list_of_keys=self.get_rdf_variables_from_model(model=field.type_),
-                    )
+                    d1 = value[0] if isinstance(value, list) else value
+                    res[fplan.name] = {fplan.default_dict_key: d1}
+            elif isinstance(data[path], list):
+                res[fplan.name] = self.filter_sparql(
+                    data=data[path],
+                    anchor=fplan.anchor,
+                    list_of_keys=fplan.variables,
+                )
+            elif fplan.field.sub_fields is None:
+                res[fplan.name] = self.filter_sparql(
+                    data=data,
+                    anchor=fplan.anchor,
+                    list_of_keys=fplan.variables,
+                )[0]
             else:
-                default_value = getattr(field.field_info.extra.get("rdfconfig"), "default_value", None)
-                res[field.name] = data.get(path, default_value)
+                res[fplan.name] = self.filter_sparql(
+                    data=data,
+                    anchor=fplan.anchor,
+                    list_of_keys=fplan.variables,
+                )
+            if selection is not None and fplan.branch != BRANCH_VALUE:
+                select_fields(res[fplan.name], selection[fplan.name])
+            if res[fplan.name] is None or fplan.nested_model is None or is_direct_serialization():
+                continue
+            if fplan.cached_model is not None:
+                res[fplan.name] = _cached_entities(fplan.cached_model, res[fplan.name])
+            elif is_trusted() and not hasattr(fplan.nested_model.__config__, "sort_key"):
+                res[fplan.name] = _trusted_entities(fplan.nested_model, res[fplan.name])
         return res
 
     def post_process_data(self, data: dict) -> dict:
 
-        for field in self.__fields__.values():
-            cb = getattr(field.field_info.extra.get("rdfconfig"), "callback_function", None)
-            if cb is not None and field.name in data:
-                if data[field.name] is not None:
-                    data[field.name] = cb(field, data[field.name], data)
+        for fplan in get_model_plan(self).callback_fields:
+            if data.get(fplan.name) is not None:
+                data[fplan.name] = fplan.callback_function(fplan.field, data[fplan.name], data)
         return data
 
     def encode_data(self, data: dict) -> dict:
 
-        for field in self.__fields__.values():
-            cb = getattr(field.field_info.extra.get("rdfconfig"), "encode_function", None)
-            if cb is not None and field.name in data:
-                if data[field.name] is not None:
-                    data[field.name] = cb(data[field.name])
+        for fplan in get_model_plan(self).encode_fields:
+            if data.get(fplan.name) is not None:
+                data[fplan.name] = fplan.encode_function(data[fplan.name])
+        return data
+
+    def batch_process_data(self, data: dict) -> dict:
+        """applies the batch hooks to the values of this instance, unless they are deferred to the end of the
+        outermost construction call (see `rdf_fastapi_utils.batch`)"""
+        batch_fields = get_model_plan(self).batch_fields
+        if not batch_fields or self._defers_batch():
+            return data
+        for fplan in batch_fields:
+            if data.get(fplan.name) is not None:
+                data[fplan.name] = apply_batch_hooks(fplan, [data[fplan.name]], [data])[0]
         return data
 
+    def _defers_batch(self) -> bool:
+        plan = get_model_plan(self)
+        return (
+            bool(plan.batch_fields)
+            and current_collector() is not None
+            and not plan.has_root_validators
+            and not self.__config__.RDF_utils_catch_errors
+            and not is_direct_serialization()
+        )
+
+    @classmethod
+    def update_forward_refs(cls, **localns: Any) -> None:
+        super().update_forward_refs(**localns)
+        clear_model_plans()
+        clear_coercers()
+        clear_encoders()
+        clear_batch_hooks()
+
+    @classmethod
+    def from_entity(cls, ent: dict) -> "RDFUtilsModelBaseClass":
+        """builds an instance from a single grouped entity (an item of the output of `filter_sparql`)
+
+        If the model enables the instance cache in its Config (see `rdf_fastapi_utils.cache`) an entity built from
+        the same rows before returns the cached instance. In trusted mode the instance is built without going through
+        `__init__` (see `_construct_trusted`).
+        """
+        cache = get_model_cache(cls)
+        if cache is None:
+            return cls._new_from_entity(ent)
+        try:
+            key = (ent.get(get_model_plan(cls).anchor), entity_fingerprint(ent))
+            hash(key)
+        except TypeError:
+            return cls._new_from_entity(ent)
+        instance = cache.get(key)
+        if instance is None:
+            instance = cls._new_from_entity(ent)
+            collector = current_collector()
+            if collector is None:
+                cache.set(key, instance)
+            else:
+                # the instance may hold placeholders for batch hooks that still can fail
+                collector.cache_after_flush(cache, key, instance)
+        return instance
+
+    @classmethod
+    def _new_from_entity(cls, ent: dict) -> "RDFUtilsModelBaseClass":
+        with trusted_scope(cls):
+            if not is_trusted() or hasattr(cls.__config__, "sort_key"):
+                return cls(**ent)
+            with batch_scope(cls):
+                return cls._construct_trusted(ent)
+
+    @classmethod
+    def _construct_trusted(cls, ent: Mapping) -> "RDFUtilsModelBaseClass":
+        """builds an instance from a grouped entity in trusted mode, without the scopes `__init__` sets up (the
+        caller already runs in them)
+
+        Raises:
+            ValidationError: if the mapped data fails validation
+        """
+        instance = cls.__new__(cls)
+        coercers = get_entity_coercers(cls)
+        if coercers is not None and "_fields" not in ent:
+            with stage(cls, "validation"):
+                res = construct_trusted_entity(cls, coercers, ent)
+            if res is not None:
+                object.__setattr__(instance, "__dict__", res[0])
+                object.__setattr__(instance, "__fields_set__", res[1])
+                instance._init_private_attributes()
+                return instance
+        with stage(cls, "map_fields_data"):
+            data = instance.map_fields_data(data=ent)
+        with stage(cls, "post_process_data"):
+            data = instance.post_process_data(data=data)
+        with stage(cls, "encode_data"):
+            data = instance.encode_data(data=data)
+            data = instance.batch_process_data(data)
+        instance._finalize_init(data, ent.get("_fields"))
+        return instance
+
+    @classmethod
+    def _from_entity_as(cls, ent: dict, trusted: bool | None, fields: dict | None = None) -> "RDFUtilsModelBaseClass":
+        if fields is not None:
+            ent["_fields"] = fields
+        if trusted is None:
+            return cls.from_entity(ent)
+        with trusted_construction(trusted):
+            return cls.from_entity(ent)
+
+    @classmethod
+    def _flatten_sparql_json(cls, data: dict) -> list | InternedRows:
+        """returns the rows of a SPARQL JSON result, interned if `RDF_utils_intern_rows` is set in the Config
+
+        Typed literals are only decoded for the value fields of the model tree that accept the decoded value (e.g. an
+        xsd:dateTime for a datetime field), all other values are kept with their lexical value like in flattened
+        rows (e.g. for string fields, callbacks and class callbacks reading a discriminator column).
+        """
+        literal_types = get_model_literal_types(cls)
+        if getattr(cls.__config__, "RDF_utils_intern_rows", False):
+            return intern_rows(data, decode=literal_types)
+        return flatten_sparql_json(data, decode=literal_types)
+
+    @classmethod
+    def from_sparql_rows(
+        cls,
+        rows: list | dict,
+        lazy: bool = False,
+        trusted: bool | None = None,
+        fields: str | dict | None = None,
+    ) -> typing.List["RDFUtilsModelBaseClass"] | typing.Iterator["RDFUtilsModelBaseClass"]:
+        """builds one instance per anchor value from a SPARQL result, the rows are grouped only once
+
+        Emits a `query.UnusedVariablesWarning` if the result (the head of SPARQL JSON, the first row of flattened
+        rows) contains variables no field of the model tree consumes.
+
+        Args:
+            rows (list | dict): array of results from sparql endpoint (python object converted from json return),
+                interned rows (`rows.InternedRows`) or a SPARQL JSON result (`application/sparql-results+json`)
+            lazy (bool, optional): return a generator that builds the instances on iteration, otherwise large
+                results are built in parallel if the Config asks for it (see `rdf_fastapi_utils.parallel`).
+                Defaults to False.
+            trusted (bool, optional): enable or disable trusted construction (see `rdf_fastapi_utils.trusted`) for
+                this call. Defaults to None (use the Config of the models).
+            fields (str | dict, optional): field selection like `id,name,events.label` (see
+                `rdf_fastapi_utils.selection`), unselected fields are not built. Defaults to None (all fields).
+
+        Returns:
+            typing.List[RDFUtilsModelBaseClass] | typing.Iterator[RDFUtilsModelBaseClass]: the instances in the
+                order their anchor value first shows up in the rows
+        """
+        plan = get_model_plan(cls)
+        if plan.anchor is None:
+            raise ValueError(f"{cls.__name__} has no anchor field, can't group the rows")
+        if is_sparql_json(rows):
+            warn_unused_variables(cls, rows["head"].get("vars", ()))
+            rows = cls._flatten_sparql_json(rows)
+        elif isinstance(rows, InternedRows):
+            warn_unused_variables(cls, rows.columns)
+        elif rows and isinstance(rows[0], Mapping):
+            warn_unused_variables(cls, rows[0].keys())
+        with stage(cls, "filter_sparql"):
+            grouped = cls.__new__(cls).filter_sparql(rows, anchor=plan.anchor, list_of_keys=plan.variables) or []
+        if isinstance(fields, str):
+            fields = resolve_field_selection(cls, parse_field_selection(fields))
+        if lazy:
+            return (cls._from_entity_as(ent, trusted, fields) for ent in grouped)
+        select_fields(grouped, fields)
+        with batch_scope(cls), trusted_construction(trusted) if trusted is not None else contextlib.nullcontext():
+            return _build_entities(cls, grouped, cls)
+
+    @classmethod
+    def from_graph(
+        cls,
+        graph: "Graph | GraphIndex",
+        subjects: typing.Iterable[str] | None = None,
+        rdf_type: str | None = None,
+    ) -> typing.List["RDFUtilsModelBaseClass"]:
+        """builds one instance per subject of an rdflib Graph (e.g. a CONSTRUCT result) by following the
+        `predicate` of the fields, see `rdf_fastapi_utils.graph`
+
+        Args:
+            graph (Graph | GraphIndex): the graph, or a `graph.GraphIndex` to reuse the index of a graph
+            subjects (typing.Iterable[str], optional): IRIs of the subjects to build. Defaults to None.
+            rdf_type (str, optional): build all subjects of this rdf:type. Defaults to None (without subjects: the
+                subjects that are no object of another triple).
+
+        Returns:
+            typing.List[RDFUtilsModelBaseClass]: the instances, in the order of subjects or sorted by IRI
+        """
+        return build_from_graph(cls, graph, subjects=subjects, rdf_type=rdf_type)
+
+    @classmethod
+    def stream_sparql_rows(
+        cls, rows: typing.Iterable[dict], trusted: bool | None = None, fields: str | dict | None = None
+    ) -> typing.Iterator["RDFUtilsModelBaseClass"]:
+        """builds instances from a stream of rows ordered by the anchor variable (e.g. `ORDER BY ?person`)
+
+        An instance is yielded as soon as the anchor value changes, so only the rows of a single entity are held
+        in memory. Rows without the anchor variable are skipped. If the rows are not ordered by the anchor, an
+        entity whose rows are not adjacent is yielded more than once.
+
+        Args:
+            rows (typing.Iterable[dict]): flat rows, e.g. from `sparql_results.flatten_sparql_bindings`
+            trusted (bool, optional): enable or disable trusted construction for this call. Defaults to None.
+            fields (str | dict, optional): field selection, see `from_sparql_rows`. Defaults to None.
+
+        Yields:
+            RDFUtilsModelBaseClass: one instance per anchor value
+        """
+        plan = get_model_plan(cls)
+        if plan.anchor is None:
+            raise ValueError(f"{cls.__name__} has no anchor field, can't group the rows")
+        if isinstance(fields, str):
+            fields = resolve_field_selection(cls, parse_field_selection(fields))
+        mapper = cls.__new__(cls)
+        buffer = []
+        for row in rows:
+            if plan.anchor not in row:
+                continue
+            if buffer and row[plan.anchor] != buffer[0][plan.anchor]:
+                with stage(cls, "filter_sparql"):
+                    grouped = mapper.filter_sparql(buffer, anchor=plan.anchor, list_of_keys=plan.variables)
+                for ent in grouped:
+                    yield cls._from_entity_as(ent, trusted, fields)
+                buffer = []
+            buffer.append(row)
+        if buffer:
+            with stage(cls, "filter_sparql"):
+                grouped = mapper.filter_sparql(buffer, anchor=plan.anchor, list_of_keys=plan.variables)
+            for ent in grouped:
+                yield cls._from_entity_as(ent, trusted, fields)
+
     def __init__(__pydantic_self__, **data: Any) -> None:
+        selection = data.get("_fields")
+        if isinstance(selection, str):
+            selection = data["_fields"] = resolve_field_selection(
+                __pydantic_self__.__class__, parse_field_selection(selection)
+            )
+        with batch_scope(__pydantic_self__), trusted_scope(__pydantic_self__):
+            data = __pydantic_self__._prepare_data(data)
+            __pydantic_self__._finalize_init(data, selection)
+
+    def _prepare_data(__pydantic_self__, data: dict) -> dict:
+        """groups `_results` and maps, post-processes and encodes the data of the fields"""
+        selection = data.get("_fields")
         if "_results" in data:
             data = data["_results"]
-            anchor = __pydantic_self__.get_anchor_element_from_model(model=__pydantic_self__)
-            data = __pydantic_self__.filter_sparql(
-                data,
-                anchor=anchor[0],
-                list_of_keys=__pydantic_self__.get_rdf_variables_from_model(model=__pydantic_self__),
-            )[0]
-        sort_key = getattr(__pydantic_self__.Config, "sort_key", None)
+            plan = get_model_plan(__pydantic_self__)
+            if is_sparql_json(data):
+                data = __pydantic_self__._flatten_sparql_json(data)
+            with stage(__pydantic_self__, "filter_sparql"):
+                data = __pydantic_self__.filter_sparql(
+                    data,
+                    anchor=plan.anchor,
+                    list_of_keys=plan.variables,
+                )[0]
+            if selection is not None:
+                data["_fields"] = selection
+        sort_key = getattr(__pydantic_self__.__config__, "sort_key", None)
         if sort_key is not None:
-            original_order = []
-            for item in data[sort_key["object list"]]:
-                if item[sort_key["original key"]] not in original_order:
-                    original_order.append(item[sort_key["original key"]])
-        data = __pydantic_self__.map_fields_data(data=data)
-        data = __pydantic_self__.post_process_data(data=data)
-        data = __pydantic_self__.encode_data(data=data)
-        if sort_key is not None:
-            new_data = []
-            for order_item in original_order:
-                for item in data[sort_key["object list"]]:
-                    if item[sort_key["original key"]] == order_item:
-                        new_data.append(item)
-            data[sort_key["object list"]] = new_data
+            original_order = [item[sort_key["original key"]] for item in data[sort_key["object list"]]]
+        with stage(__pydantic_self__, "map_fields_data"):
+            data = __pydantic_self__.map_fields_data(data=data)
+        with stage(__pydantic_self__, "post_process_data"):
+            data = __pydantic_self__.post_process_data(data=data)
+        with stage(__pydantic_self__, "encode_data"):
+            data = __pydantic_self__.encode_data(data=data)
+            data = __pydantic_self__.batch_process_data(data)
+        if sort_key is not None and sort_key["object list"] in data:
+            data[sort_key["object list"]] = reorder_by_first_seen(
+                data[sort_key["object list"]], original_order, sort_key["original key"]
+            )
 
         # if __pydantic_self__.__class__.__name__ == "Entity":
         #     if "gender" in data:
@@ -378,42 +867,166 @@ class RDFUtilsModelBaseClass(BaseModel):
         #             data["gender"] = data["gender"][0]
         # if "label" in data:
         #     data["label"] = data["label"][0]
-        if __pydantic_self__.Config.RDF_utils_catch_errors:
+        return data
+
+    def _finalize_init(__pydantic_self__, data: dict, selection: dict | None = None) -> None:
+        """validates the mapped data, sets the fields of the instance and sorts the fields with a sort configuration
+
+        In trusted mode (see `rdf_fastapi_utils.trusted`) the fields are assigned with cheap coercion, data that
+        fails it goes through the regular validation. With a field selection only the selected fields are validated.
+        """
+        with stage(__pydantic_self__, "validation"):
+            __pydantic_self__._init_fields(data, selection)
+            plan = get_model_plan(__pydantic_self__)
+            if plan.sort_fields:
+                sort_fields(plan, __pydantic_self__.__dict__)
+
+    def _init_fields(__pydantic_self__, data: dict, selection: dict | None = None) -> None:
+        """validates the mapped data and sets the fields of the instance"""
+        collector = current_collector()
+        if collector is not None:
+            collector.instances.append(__pydantic_self__)
+            if __pydantic_self__._defers_batch():
+                __pydantic_self__._init_deferred(data, collector, selection)
+                return
+        if is_trusted() and selection is None:
             try:
-                super().__init__(**data)
-            except ValidationError as e:
-                print("Error in model", __pydantic_self__.__class__.__name__, e)
-                data["_error"] = e
-                data_copy = deepcopy(data)
-                for err in e.errors():
-                    c_back = list(err["loc"])
-                    while len(c_back) > 0:
-                        d1 = data_copy
-                        for val in c_back[:-1]:
-                            if val in d1 or (isinstance(d1, list) and val < len(d1)):
-                                d1 = d1[val]
-                            else:
-                                break
-                        try:
-                            error_key = __pydantic_self__.Config.RDF_utils_error_field_name
-                            prev_error = None
-                            if isinstance(d1[c_back[-1]], dict) and error_key in d1[c_back[-1]]:
-                                prev_error = d1[c_back[-1]][error_key]
-                            d1[c_back[-1]] = None
-                            if data_copy[error_key] is None:
-                                data_copy[error_key] = []
-                            if str(e).replace("\n ", "; ").replace("\n", "; ") not in data_copy[error_key]:
-                                data_copy[error_key].append(str(e).replace("\n ", "; ").replace("\n", "; "))
-                            if prev_error is not None:
-                                for err2 in prev_error:
-                                    if err2 not in data_copy[error_key]:
-                                        data_copy[error_key].append(err2)
-                            break
-                        except (KeyError, IndexError):
-                            if len(c_back) == 1:
-                                break
-                            del c_back[-1]
-                data_copy = removeNullNoneEmpty(data_copy)
-                super().__init__(**data_copy)
+                res = construct_trusted(__pydantic_self__.__class__, data)
+            except ValidationError:
+                res = None
+            if res is not None:
+                object.__setattr__(__pydantic_self__, "__dict__", res[0])
+                object.__setattr__(__pydantic_self__, "__fields_set__", res[1])
+                __pydantic_self__._init_private_attributes()
+                return
+        if __pydantic_self__.__config__.RDF_utils_catch_errors:
+            __pydantic_self__._init_catching_errors(data, selection)
+        elif selection is not None:
+            __pydantic_self__._init_sparse(data, selection)
         else:
             super().__init__(**data)
+
+    def _init_deferred(__pydantic_self__, data: dict, collector: BatchCollector, selection: dict | None = None) -> None:
+        """validates the data without the values waiting for batch hooks, these fields hold placeholders until the
+        batch scope is flushed"""
+        cls = __pydantic_self__.__class__
+        pending = {}
+        for fplan in get_model_plan(cls).batch_fields:
+            if data.get(fplan.name) is not None:
+                pending[fplan.name] = collector.defer(cls, fplan, data[fplan.name], data)
+        unbatched = {k: v for k, v in data.items() if k not in pending}
+        if selection is None:
+            values, fields_set, errors = validate_model(cls, unbatched)
+        else:
+            values, fields_set, errors = _validate_selected(cls, unbatched, selection)
+        if errors is not None:
+            aliases = {cls.__fields__[name].alias for name in pending}
+            raw_errors = [
+                e
+                for e in errors.raw_errors
+                if not (isinstance(e, ErrorWrapper) and isinstance(e.exc, MissingError) and e.loc_tuple()[0] in aliases)
+            ]
+            if raw_errors:
+                raise ValidationError(raw_errors, cls)
+        ordered = {
+            name: pending[name] if name in pending else values[name]
+            for name in cls.__fields__
+            if name in pending or name in values
+        }
+        ordered.update((k, v) for k, v in values.items() if k not in ordered)
+        object.__setattr__(__pydantic_self__, "__dict__", ordered)
+        object.__setattr__(__pydantic_self__, "__fields_set__", fields_set | set(pending))
+        __pydantic_self__._init_private_attributes()
+
+    def _init_sparse(__pydantic_self__, data: dict, selection: dict) -> None:
+        """validates only the selected fields, the other fields are not stored and read as their default"""
+        values, fields_set, error = _validate_selected(__pydantic_self__.__class__, data, selection)
+        if error is not None:
+            raise error
+        object.__setattr__(__pydantic_self__, "__dict__", values)
+        object.__setattr__(__pydantic_self__, "__fields_set__", fields_set)
+        __pydantic_self__._init_private_attributes()
+
+    def _init_catching_errors(__pydantic_self__, data: dict, selection: dict | None = None) -> None:
+        """validates data, removing the optional subtrees and list elements that fail validation
+
+        Elements of lists of nested models are validated one by one and failing elements are dropped. Any other
+        error nulls out the innermost optional field containing it, only the affected fields are validated again.
+        The errors are formatted once and stored in the `RDF_utils_error_field_name` field (if the model has it)
+        together with the errors recorded in the removed entities. With a selection only the selected fields are
+        validated (see `_validate_selected`).
+        """
+        cls = __pydantic_self__.__class__
+        plan = get_model_plan(cls)
+        validate = validate_model if selection is None else functools.partial(_validate_selected, selection=selection)
+        error_key = cls.__config__.RDF_utils_error_field_name
+        data = dict(data)
+        owned = {id(data)}
+        raw_errors = []
+        previous = []
+        for field in plan.model_list_fields:
+            items = data.get(field.alias)
+            if not isinstance(items, list) or (selection is not None and field.name not in selection):
+                continue
+            item_field = field.sub_fields[0]
+            validated = []
+            for idx, item in enumerate(items):
+                value, errors = item_field.validate(item, {}, loc=(field.alias, idx), cls=cls)
+                if errors:
+                    raw_errors.append(errors)
+                    previous.extend(_previous_errors(item, error_key))
+                else:
+                    validated.append(value)
+            data[field.alias] = validated
+            owned.add(id(validated))
+        values, fields_set, error = validate(cls, data)
+        if error is not None:
+            raw_errors.extend(error.raw_errors)
+            affected = {}
+            for err in error.errors():
+                loc = err["loc"]
+                cut = _removable_prefix(cls, loc)
+                if cut == 0:
+                    raise ValidationError(raw_errors, cls)
+                previous.extend(_previous_errors(_cut_subtree(data, loc[:cut], owned), error_key))
+                affected[loc[0]] = None
+            by_alias = {f.alias: f for f in cls.__fields__.values()}
+            for alias in affected:
+                value = _prune_value(data.get(alias))
+                if value is _PRUNED:
+                    if by_alias[alias].required:
+                        raise ValidationError(raw_errors, cls)
+                    del data[alias]
+                else:
+                    data[alias] = value
+            if plan.has_root_validators:
+                values, fields_set, error = validate(cls, data)
+                if error is not None:
+                    raise error
+            else:
+                for alias in affected:
+                    field = by_alias[alias]
+                    if alias not in data:
+                        values[field.name] = field.get_default()
+                        fields_set.discard(field.name)
+                        continue
+                    value, errors = field.validate(data[alias], values, loc=alias, cls=cls)
+                    if errors:
+                        raise ValidationError([errors], cls)
+                    values[field.name] = value
+                values = {**{name: values[name] for name in cls.__fields__ if name in values}, **values}
+        if raw_errors:
+            e = ValidationError(raw_errors, cls)
+            print("Error in model", cls.__name__, e)
+            if error_key in cls.__fields__:
+                messages = list(values.get(error_key) or [])
+                seen = set(messages)
+                for message in (str(e).replace("\n ", "; ").replace("\n", "; "), *previous):
+                    if message not in seen:
+                        seen.add(message)
+                        messages.append(message)
+                values[error_key] = messages
+                fields_set.add(error_key)
+        object.__setattr__(__pydantic_self__, "__dict__", values)
+        object.__setattr__(__pydantic_self__, "__fields_set__", fields_set)
+        __pydantic_self__._init_private_attributes()
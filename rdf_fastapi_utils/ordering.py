@@ -0,0 +1,101 @@
+"""Ordering of list fields
+
+The grouping in `filter_sparql` keeps the order in which values first show up in the SPARQL results. Fields that
+need a stable order independent of the query set a `SortConfigurationRDF` in their FieldConfigurationRDF:
+
+    class Person(RDFUtilsModelBaseClass):
+        events: list[Event] = Field(
+            [], rdfconfig=FieldConfigurationRDF(sort=SortConfigurationRDF(key="start", descending=True))
+        )
+
+The values are sorted once per instance with a single keyed (stable) sort after validation. `key` is a dotted path
+of field names (or dict keys) in the list items, without key the items themselves are compared. Items without a
+value for the key are put at the end (`nulls_last=False`: at the start), in their original order. Values waiting for
+batch hooks (see `rdf_fastapi_utils.batch`) are compared on their value before the hooks. Keys of different types
+(e.g. numbers and strings of a variable without datatype) are sorted by type first, numbers before the other types
+ordered by type name, keys that can't be compared at all keep their original order.
+"""
+import numbers
+import typing
+from collections.abc import Mapping
+from typing import Any
+
+from rdf_fastapi_utils.batch import PendingValue
+
+
+def _key_getter(key: str | None) -> typing.Callable[[Any], Any]:
+    parts = key.split(".") if key else ()
+
+    def get(item: Any) -> Any:
+        for part in parts:
+            if item is None:
+                return None
+            if isinstance(item, Mapping):
+                item = item.get(part)
+            else:
+                item = getattr(item, part, None)
+        if type(item) is PendingValue:
+            return item.value
+        return item
+
+    return get
+
+
+def _type_rank(value: Any) -> tuple:
+    # numbers compare with each other, the other types are grouped by type
+    if isinstance(value, numbers.Real):
+        return (0, "")
+    return (1, type(value).__qualname__)
+
+
+def sort_values(values: list, key: str | None = None, descending: bool = False, nulls_last: bool = True) -> list:
+    """returns values sorted on key, see the module docstring"""
+    get = _key_getter(key)
+    keyed = []
+    nulls = []
+    for value in values:
+        k = get(value)
+        if k is None:
+            nulls.append(value)
+        else:
+            keyed.append((k, value))
+    try:
+        keyed = sorted(keyed, key=lambda item: item[0], reverse=descending)
+    except TypeError:
+        try:
+            keyed = sorted(keyed, key=lambda item: (_type_rank(item[0]), item[0]), reverse=descending)
+        except TypeError:
+            pass
+    res = [value for _, value in keyed]
+    return res + nulls if nulls_last else nulls + res
+
+
+def sort_fields(plan: Any, values: dict) -> None:
+    """sorts the list values of the fields of a model plan that have a sort configuration, in place"""
+    for fplan in plan.sort_fields:
+        value = values.get(fplan.name)
+        if isinstance(value, list) and len(value) > 1:
+            sort = fplan.sort
+            values[fplan.name] = sort_values(value, sort.key, sort.descending, sort.nulls_last)
+
+
+def reorder_by_first_seen(items: list, original: typing.Iterable, key: str) -> list:
+    """returns the items ordered by the first position of their key value in original, items with a key value not in
+    original are dropped (the reordering of `Config.sort_key`)
+
+    Key values are compared for equality, unhashable key values (e.g. lists) are reordered with a quadratic scan.
+    """
+    original = list(original)
+    try:
+        buckets: dict[Any, list] = {value: [] for value in original}
+        for item in items:
+            bucket = buckets.get(item[key])
+            if bucket is not None:
+                bucket.append(item)
+    except TypeError:
+        order = []
+        for value in original:
+            if value not in order:
+                order.append(value)
+        return [item for value in order for item in items if item[key] == value]
+    return [item for bucket in buckets.values() for item in bucket]
@@ -0,0 +1,220 @@
+"""Parallel construction of the entities of large results
+
+Building the entities returned by a `serialization_class_callback` (e.g. the results of a paginated response) and
+the instances of `from_sparql_rows` runs on a single core. In parallel mode the grouped entities are split into
+chunks that are built in a process pool (or a thread pool on free-threaded Python) and reassembled in order.
+Results with fewer entities than the threshold are built serially.
+
+Parallel mode is enabled in the Config of the model that builds the entities (the wrapper model or the model passed
+to `from_sparql_rows`):
+
+    class Config:
+        RDF_utils_parallel = "auto"  # "process", "thread" or "auto" (threads on free-threaded Python)
+        RDF_utils_parallel_threshold = 500  # minimum number of entities built in parallel
+        RDF_utils_parallel_workers = None  # defaults to os.cpu_count()
+
+or per call:
+
+    with parallel_construction("process", threshold=200):
+        page = Page(**data)
+
+Process pools start their workers with the forkserver (spawn where it is not available) start method and pickle the
+model classes by reference, the models have to be importable (defined at module level). Models that can't be pickled
+and broken pools fall back to serial construction with a `ParallelFallbackWarning`. Entities are built without
+nested parallelism, the trusted and direct serialization modes of the caller are passed to the workers,
+instrumentation stages of the workers are not collected and batch hooks (see `rdf_fastapi_utils.batch`) run per
+chunk.
+"""
+import atexit
+import concurrent.futures
+import contextlib
+import contextvars
+import math
+import os
+import pickle
+import sys
+import threading
+import typing
+import warnings
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from rdf_fastapi_utils.batch import batch_scope
+from rdf_fastapi_utils.serializer import _DIRECT
+from rdf_fastapi_utils.trusted import _TRUSTED
+
+MODES = ("auto", "process", "thread")
+
+
+@dataclass(frozen=True)
+class ParallelSettings:
+    """settings of parallel construction, mode None builds serially"""
+
+    mode: str | None = "auto"
+    threshold: int = 500
+    workers: int | None = None
+    chunks_per_worker: int = 4
+
+
+class ParallelFallbackWarning(UserWarning):
+    """entities that should be built in parallel are built serially"""
+
+
+_SERIAL = ParallelSettings(mode=None)
+_PARALLEL: contextvars.ContextVar[ParallelSettings | None] = contextvars.ContextVar("rdf_utils_parallel", default=None)
+_POOLS: dict[tuple, concurrent.futures.Executor] = {}
+_POOLS_LOCK = threading.Lock()
+_PICKLABLE: dict[type, bool] = {}
+
+
+@contextlib.contextmanager
+def parallel_construction(
+    mode: str | None = "auto", threshold: int = 500, workers: int | None = None
+) -> typing.Iterator[None]:
+    """enables (or with mode None disables) parallel construction for all models built in the current context"""
+    if mode is not None and mode not in MODES:
+        raise ValueError(f"unknown parallel mode {mode}, use one of {', '.join(MODES)}")
+    token = _PARALLEL.set(ParallelSettings(mode=mode, threshold=threshold, workers=workers))
+    try:
+        yield
+    finally:
+        _PARALLEL.reset(token)
+
+
+def get_parallel_settings(model: Any) -> ParallelSettings:
+    """returns the settings of the current context, or the settings in the Config of model"""
+    settings = _PARALLEL.get()
+    if settings is not None:
+        return settings
+    config = model.__config__
+    mode = getattr(config, "RDF_utils_parallel", None)
+    if not mode:
+        return _SERIAL
+    return ParallelSettings(
+        mode="auto" if mode is True else mode,
+        threshold=getattr(config, "RDF_utils_parallel_threshold", 500),
+        workers=getattr(config, "RDF_utils_parallel_workers", None),
+    )
+
+
+def is_free_threaded() -> bool:
+    """returns True on a free-threaded Python build running without the GIL"""
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+    return is_gil_enabled is not None and not is_gil_enabled()
+
+
+def get_start_method() -> str:
+    """returns the start method of process pools, forkserver or (where it is not available) spawn"""
+    # multiprocessing is imported with the first process pool, not with the models
+    import multiprocessing
+
+    # forking a process with running threads (e.g. of an ASGI server) can deadlock the children
+    return "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+def _get_pool(mode: str, workers: int) -> concurrent.futures.Executor:
+    with _POOLS_LOCK:
+        pool = _POOLS.get((mode, workers))
+        if pool is None:
+            if mode == "thread":
+                pool = concurrent.futures.ThreadPoolExecutor(workers, thread_name_prefix="rdf_utils")
+            else:
+                import multiprocessing
+
+                pool = concurrent.futures.ProcessPoolExecutor(
+                    workers, mp_context=multiprocessing.get_context(get_start_method())
+                )
+            _POOLS[(mode, workers)] = pool
+        return pool
+
+
+def _drop_pool(mode: str, workers: int) -> None:
+    with _POOLS_LOCK:
+        pool = _POOLS.pop((mode, workers), None)
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_pools() -> None:
+    """shuts the worker pools down, they are started again on demand"""
+    with _POOLS_LOCK:
+        pools = list(_POOLS.values())
+        _POOLS.clear()
+    for pool in pools:
+        pool.shutdown()
+
+
+atexit.register(shutdown_pools)
+
+
+def _is_picklable(model: type) -> bool:
+    if model not in _PICKLABLE:
+        try:
+            _PICKLABLE[model] = pickle.loads(pickle.dumps(model)) is model
+        except (pickle.PicklingError, AttributeError, TypeError):
+            _PICKLABLE[model] = False
+    return _PICKLABLE[model]
+
+
+def _build_chunk(
+    build: Callable[[type, Any], Any], model: type, ents: list, trusted: bool | None, direct: bool
+) -> list:
+    # runs in the workers: no nested parallelism, modes of the caller
+    parallel_token = _PARALLEL.set(_SERIAL)
+    trusted_token = _TRUSTED.set(trusted)
+    direct_token = _DIRECT.set(direct)
+    try:
+        with batch_scope(model):
+            return [build(model, ent) for ent in ents]
+    finally:
+        _DIRECT.reset(direct_token)
+        _TRUSTED.reset(trusted_token)
+        _PARALLEL.reset(parallel_token)
+
+
+def build_parallel(
+    build: Callable[[type, Any], Any], model: type, ents: typing.Sequence, settings: ParallelSettings
+) -> list | None:
+    """builds `build(model, ent)` for all entities in parallel, returns None if they are to be built serially
+
+    Args:
+        build (Callable): module level function building a single entity
+        model (type): the model class of the entities
+        ents (typing.Sequence): the grouped entities
+        settings (ParallelSettings): the parallel settings
+
+    Returns:
+        list | None: the built entities in the order of ents
+    """
+    if settings.mode is None or len(ents) < max(settings.threshold, 2):
+        return None
+    mode = settings.mode
+    if mode == "auto":
+        mode = "thread" if is_free_threaded() else "process"
+    workers = settings.workers or os.cpu_count() or 1
+    if mode == "process" and not _is_picklable(model):
+        warnings.warn(
+            f"{model.__name__} can't be pickled for a process pool (define it at module level), building serially",
+            ParallelFallbackWarning,
+            stacklevel=3,
+        )
+        return None
+    size = max(1, math.ceil(len(ents) / (workers * settings.chunks_per_worker)))
+    chunks = [list(ents[start : start + size]) for start in range(0, len(ents), size)]
+    trusted = _TRUSTED.get()
+    direct = _DIRECT.get()
+    pool = _get_pool(mode, workers)
+    try:
+        futures = [pool.submit(_build_chunk, build, model, chunk, trusted, direct) for chunk in chunks]
+        res = []
+        for future in futures:
+            res.extend(future.result())
+        return res
+    except (concurrent.futures.BrokenExecutor, pickle.PicklingError) as e:
+        _drop_pool(mode, workers)
+        warnings.warn(
+            f"parallel construction of {model.__name__} failed ({e!r}), building serially",
+            ParallelFallbackWarning,
+            stacklevel=3,
+        )
+        return None
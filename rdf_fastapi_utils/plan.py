@@ -0,0 +1,311 @@
+"""Compiled mapping plans for RDFUtilsModelBaseClass subclasses.
+
+A plan holds everything `map_fields_data`, `post_process_data` and `encode_data` need to know about a
+model's fields (paths, anchors, variable lists, callbacks, ...). It is built once per model class and
+reused for every instance.
+"""
+import types
+import typing
+from dataclasses import dataclass
+from typing import Any, Callable, ForwardRef
+
+from pydantic.fields import SHAPE_LIST, SHAPE_SINGLETON, ModelField
+
+BRANCH_VALUE = "value"
+BRANCH_CLASS_CALLBACK = "class_callback"
+BRANCH_NESTED = "nested"
+
+_PLANS: dict[type, "ModelPlan"] = {}
+_PROJECTIONS: dict[type, typing.Tuple[tuple, frozenset]] = {}
+_LITERAL_TYPES: dict[type, dict[str, tuple]] = {}
+_VALUE_HOOKS = ("callback_function", "encode_function", "batch_callback_function", "batch_encode_function")
+
+
+@dataclass(frozen=True)
+class FieldPlan:
+    """Precomputed mapping information for a single model field"""
+
+    name: str
+    field: ModelField
+    path: str
+    branch: str
+    anchor: str | None
+    variables: list[str]
+    default_value: Any = None
+    default_dict_key: str | None = None
+    callback_function: Callable | None = None
+    encode_function: Callable | None = None
+    serialization_class_callback: Callable | None = None
+    batch_callback_function: Callable | None = None
+    batch_encode_function: Callable | None = None
+    sort: Any = None
+    is_list: bool = False
+    has_sub_fields: bool = False
+    cached_model: type | None = None
+    literal_types: tuple = ()
+    nested_model: type | None = None
+
+
+@dataclass(frozen=True)
+class ModelPlan:
+    """Precomputed mapping information for a model class"""
+
+    model: type
+    fields: tuple[FieldPlan, ...]
+    anchor: str | None
+    anchor_field: ModelField | None
+    variables: list[str]
+    callback_fields: tuple[FieldPlan, ...]
+    encode_fields: tuple[FieldPlan, ...]
+    model_list_fields: tuple[ModelField, ...] = ()
+    has_root_validators: bool = False
+    batch_fields: tuple[FieldPlan, ...] = ()
+    sort_fields: tuple[FieldPlan, ...] = ()
+
+
+def find_anchor(model: Any) -> typing.Tuple[str, ModelField] | None:
+    """returns a tuple of the anchor element (RDF variable) and the field class of a model, None if there is no
+    anchor"""
+    if hasattr(model, "__fields__"):
+        for f_name, f_class in model.__fields__.items():
+            f_conf = f_class.field_info.extra.get("rdfconfig", object())
+            if getattr(f_conf, "anchor", False):
+                if getattr(f_conf, "path", False):
+                    f_name = getattr(f_conf, "path")
+                return f_name, f_class
+    return None
+
+
+def find_rdf_variables(model: Any) -> typing.List[str]:
+    """returns the RDF variables used by the fields of a model (not recursive)"""
+    if not hasattr(model, "__fields__"):
+        return []
+    res = []
+    for f_name, f_class in model.__fields__.items():
+        f_conf = f_class.field_info.extra.get("rdfconfig", object())
+        if hasattr(f_conf, "path"):
+            res.append(f_conf.path)
+        else:
+            res.append(f_name)
+    return res
+
+
+def _literal_types(field: ModelField, branch: str) -> tuple:
+    """returns the types a decoded typed literal may have to be passed to a field, () to pass the lexical form
+
+    Only plain value fields take decoded literals, fields with hooks or `default_dict_key` get the lexical form like
+    from flattened rows.
+    """
+    rdfconfig = field.field_info.extra.get("rdfconfig")
+    if (
+        branch != BRANCH_VALUE
+        or getattr(rdfconfig, "default_dict_key", None) is not None
+        or any(getattr(rdfconfig, name, None) is not None for name in _VALUE_HOOKS)
+    ):
+        return ()
+    if typing.get_origin(field.type_) in (typing.Union, types.UnionType):
+        members = typing.get_args(field.type_)
+    else:
+        members = (field.type_,)
+    return tuple(
+        object if member is Any else member
+        for member in members
+        if member is Any or (isinstance(member, type) and member is not type(None))
+    )
+
+
+def _compile_field(field: ModelField) -> FieldPlan:
+    rdfconfig = field.field_info.extra.get("rdfconfig")
+    path = getattr(rdfconfig, "path", None)
+    if path is None:
+        path = field.name
+    scallback = getattr(rdfconfig, "serialization_class_callback", None)
+    if hasattr(field.type_, "__fields__") or (
+        hasattr(field.type_, "__args__") and not getattr(rdfconfig, "bypass_data_mapping", False)
+    ):  # FIXME: this test doesnt catch all the options
+        branch = BRANCH_CLASS_CALLBACK if scallback is not None else BRANCH_NESTED
+    else:
+        branch = BRANCH_VALUE
+    anchor = find_anchor(field.type_)
+    cached_model = None
+    if (
+        branch == BRANCH_NESTED
+        and hasattr(field.type_, "from_entity")
+        and getattr(getattr(field.type_, "__config__", None), "RDF_utils_cache_size", 0)
+    ):
+        cached_model = field.type_
+    return FieldPlan(
+        name=field.name,
+        field=field,
+        path=path,
+        branch=branch,
+        anchor=anchor[0] if anchor is not None else None,
+        variables=find_rdf_variables(field.type_),
+        default_value=getattr(rdfconfig, "default_value", None),
+        default_dict_key=getattr(rdfconfig, "default_dict_key", None),
+        callback_function=getattr(rdfconfig, "callback_function", None),
+        encode_function=getattr(rdfconfig, "encode_function", None),
+        serialization_class_callback=scallback,
+        batch_callback_function=getattr(rdfconfig, "batch_callback_function", None),
+        batch_encode_function=getattr(rdfconfig, "batch_encode_function", None),
+        sort=getattr(rdfconfig, "sort", None),
+        is_list=getattr(field.outer_type_, "__origin__", None) == list,
+        has_sub_fields=isinstance(field.sub_fields, list),
+        cached_model=cached_model,
+        literal_types=_literal_types(field, branch),
+        nested_model=field.type_ if branch == BRANCH_NESTED and hasattr(field.type_, "from_entity") else None,
+    )
+
+
+def compile_model_plan(model: type) -> ModelPlan:
+    """builds the mapping plan of a model class without using the cache"""
+    fields = tuple(_compile_field(field) for field in model.__fields__.values())
+    anchor = find_anchor(model)
+    return ModelPlan(
+        model=model,
+        fields=fields,
+        anchor=anchor[0] if anchor is not None else None,
+        anchor_field=anchor[1] if anchor is not None else None,
+        variables=find_rdf_variables(model),
+        callback_fields=tuple(f for f in fields if f.callback_function is not None),
+        encode_fields=tuple(f for f in fields if f.encode_function is not None),
+        model_list_fields=tuple(f.field for f in fields if f.field.shape == SHAPE_LIST and get_field_models(f.field)),
+        has_root_validators=bool(
+            getattr(model, "__pre_root_validators__", None) or getattr(model, "__post_root_validators__", None)
+        ),
+        batch_fields=tuple(
+            f for f in fields if f.batch_callback_function is not None or f.batch_encode_function is not None
+        ),
+        sort_fields=tuple(f for f in fields if f.sort is not None),
+    )
+
+
+def get_model_plan(model: Any) -> ModelPlan | None:
+    """returns the (cached) mapping plan of a model class or instance, None for non-model types
+
+    Plans are only cached once all forward references of the model are resolved.
+    """
+    if not isinstance(model, type):
+        model = type(model)
+    plan = _PLANS.get(model)
+    if plan is not None:
+        return plan
+    if not hasattr(model, "__fields__"):
+        return None
+    plan = compile_model_plan(model)
+    if not any(isinstance(field.type_, ForwardRef) for field in model.__fields__.values()):
+        _PLANS[model] = plan
+    return plan
+
+
+def get_field_models(field: ModelField) -> typing.List[type]:
+    """returns the model classes a field can hold, including the members of Union types"""
+    if typing.get_origin(field.type_) in (typing.Union, types.UnionType):
+        # the members are resolved in the sub fields, `type_` keeps the forward references
+        union = field.sub_fields[0] if field.shape != SHAPE_SINGLETON and field.sub_fields else field
+        candidates = [sub.type_ for sub in union.sub_fields or ()] or typing.get_args(field.type_)
+    else:
+        candidates = (field.type_,)
+    return [model for model in candidates if isinstance(model, type) and hasattr(model, "__fields__")]
+
+
+def iter_tree_fields(model: type, seen: set | None = None) -> typing.Iterator[typing.Tuple[type, FieldPlan]]:
+    """yields (model, field plan) for the fields of a model and all the models nested in it, depth first
+
+    Nested models are the models of nested fields and the models a `serialization_class_callback` can return (the
+    members of the field type), every model is visited once.
+    """
+    if seen is None:
+        seen = set()
+    if model in seen:
+        return
+    seen.add(model)
+    plan = get_model_plan(model)
+    if plan is None:
+        return
+    for fplan in plan.fields:
+        yield model, fplan
+        if fplan.branch != BRANCH_VALUE and fplan.default_dict_key is None:
+            for nested in get_field_models(fplan.field):
+                yield from iter_tree_fields(nested, seen)
+
+
+def _projection(model: Any) -> typing.Tuple[tuple, frozenset]:
+    if not isinstance(model, type):
+        model = type(model)
+    res = _PROJECTIONS.get(model)
+    if res is not None:
+        return res
+    variables = {}
+    models = set()
+    for current, fplan in iter_tree_fields(model):
+        models.add(current)
+        rdfconfig = fplan.field.field_info.extra.get("rdfconfig")
+        if (
+            fplan.branch == BRANCH_VALUE
+            or fplan.default_dict_key is not None
+            or (fplan.branch != BRANCH_CLASS_CALLBACK and getattr(rdfconfig, "path", None) is not None)
+        ):
+            variables[fplan.path] = None
+    res = (tuple(variables), frozenset(variables))
+    if all(current in _PLANS for current in models):
+        _PROJECTIONS[model] = res
+    return res
+
+
+def get_model_projection(model: Any) -> tuple:
+    """returns the RDF variables consumed by a model and all the models nested in it, in field order (depth first)
+
+    These are the variables of value fields, of fields using `default_dict_key` and of fields with an explicitly
+    configured `path`. Paths of fields filled by a serialization class callback are keys of the input data, not
+    variables, and are left out.
+    """
+    return _projection(model)[0]
+
+
+def get_model_tree_variables(model: Any) -> frozenset:
+    """returns the RDF variables used by a model and all the models nested in it (`get_model_projection` as set)"""
+    return _projection(model)[1]
+
+
+def _merge_literal_types(a: tuple, b: tuple) -> tuple:
+    if a == (object,):
+        return b
+    if b == (object,):
+        return a
+    return tuple(t for t in a if t in b)
+
+
+def get_model_literal_types(model: Any) -> dict[str, tuple]:
+    """returns the variables of a model tree whose typed literals are decoded, with the types the decoded values
+    must have (see `sparql_results.flatten_sparql_bindings`)
+
+    Variables read by several fields only take values all of them accept. Variables of string fields, of fields
+    with hooks and of non-value fields keep their lexical form and are left out.
+    """
+    if not isinstance(model, type):
+        model = type(model)
+    res = _LITERAL_TYPES.get(model)
+    if res is not None:
+        return res
+    res = {}
+    models = set()
+    for current, fplan in iter_tree_fields(model):
+        models.add(current)
+        if fplan.branch != BRANCH_VALUE and fplan.default_dict_key is None:
+            continue
+        if fplan.path in res:
+            res[fplan.path] = _merge_literal_types(res[fplan.path], fplan.literal_types)
+        else:
+            res[fplan.path] = fplan.literal_types
+    res = {var: types_ for var, types_ in res.items() if not all(issubclass(t, str) for t in types_)}
+    if all(current in _PLANS for current in models):
+        _LITERAL_TYPES[model] = res
+    return res
+
+
+def clear_model_plans() -> None:
+    """drops all cached plans, e.g. after forward references have been updated"""
+    _PLANS.clear()
+    _PROJECTIONS.clear()
+    _LITERAL_TYPES.clear()
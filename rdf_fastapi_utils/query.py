@@ -0,0 +1,106 @@
+"""SPARQL projections derived from the field configuration of models
+
+    variables = get_projection(Person)  # ["person", "entityLabel", "event", "eventLabel"]
+    query = build_select_query(Person, "?person a crm:E21_Person ...", prefixes={"crm": CRM})
+
+The projection is `plan.get_model_projection`: the variables of value fields, of fields using `default_dict_key`
+and of fields with an explicitly configured `path`, recursing into nested models and the models a
+`serialization_class_callback` can return (the members of the field type). Paths of fields filled by a serialization
+class callback are keys of the input data, not variables, and are left out.
+"""
+import typing
+import warnings
+
+from rdf_fastapi_utils.plan import get_model_plan, get_model_projection, get_model_tree_variables, iter_tree_fields
+
+_WARNED: set[type] = set()
+
+
+class UnusedVariablesWarning(UserWarning):
+    """a SPARQL result contains variables no field of the model tree consumes"""
+
+
+def get_projection(model: type) -> typing.List[str]:
+    """returns the variables consumed by a model and all nested models, in field order (depth first)"""
+    return list(get_model_projection(model))
+
+
+def get_anchor_variables(model: type) -> typing.List[str]:
+    """returns the anchor variables of a model and all nested models, outermost first"""
+    res = {}
+    for nested, _ in iter_tree_fields(model):
+        anchor = get_model_plan(nested).anchor
+        if anchor is not None:
+            res[anchor] = None
+    return list(res)
+
+
+def build_select_query(
+    model: type,
+    where: str,
+    prefixes: typing.Dict[str, str] | None = None,
+    distinct: bool = True,
+    order_by_anchors: bool = True,
+    limit: int | None = None,
+    offset: int | None = None,
+) -> str:
+    """returns a SELECT query projecting exactly the variables consumed by the model tree
+
+    Args:
+        model (type): the model class
+        where (str): the graph pattern (the content of the WHERE clause)
+        prefixes (typing.Dict[str, str], optional): prefix declarations, prefix -> namespace. Defaults to None.
+        distinct (bool, optional): use SELECT DISTINCT. Defaults to True.
+        order_by_anchors (bool, optional): order the rows by the anchors (outermost first), needed for
+            `stream_sparql_rows`. Defaults to True.
+        limit (int, optional): LIMIT of the query. Defaults to None.
+        offset (int, optional): OFFSET of the query. Defaults to None.
+
+    Returns:
+        str: the query
+    """
+    lines = [f"PREFIX {prefix}: <{namespace}>" for prefix, namespace in (prefixes or {}).items()]
+    variables = " ".join(f"?{var}" for var in get_projection(model))
+    lines.append(f"SELECT {'DISTINCT ' if distinct else ''}{variables}")
+    lines.append("WHERE {")
+    lines.extend(f"  {line}" if line.strip() else line for line in where.strip("\n").splitlines())
+    lines.append("}")
+    anchors = get_anchor_variables(model)
+    if order_by_anchors and anchors:
+        lines.append("ORDER BY " + " ".join(f"?{var}" for var in anchors))
+    if limit is not None:
+        lines.append(f"LIMIT {limit}")
+    if offset is not None:
+        lines.append(f"OFFSET {offset}")
+    return "\n".join(lines)
+
+
+def find_unused_variables(model: type, variables: typing.Iterable[str]) -> typing.List[str]:
+    """returns the variables of a result no field of the model tree consumes"""
+    consumed = get_model_tree_variables(model)
+    return [var for var in variables if var not in consumed]
+
+
+def warn_unused_variables(model: type, variables: typing.Iterable[str]) -> None:
+    """emits an UnusedVariablesWarning if a result contains variables the model tree does not consume, once per
+    model and only for models setting `RDF_utils_warn_unused_variables` in their Config
+
+    Columns only read by callbacks (e.g. a `serialization_class_callback` choosing the class by a column) are
+    reported as well, the warning is meant for checking queries during development.
+    """
+    if model in _WARNED or not getattr(model.__config__, "RDF_utils_warn_unused_variables", False):
+        return
+    unused = find_unused_variables(model, variables)
+    if unused:
+        _WARNED.add(model)
+        warnings.warn(
+            f"{model.__name__} does not use the variables {', '.join(unused)} of the result, "
+            "remove them from the query (see rdf_fastapi_utils.query.get_projection)",
+            UnusedVariablesWarning,
+            stacklevel=3,
+        )
+
+
+def clear_unused_variables_warnings() -> None:
+    """forgets the models warned about, their next result with unused variables warns again"""
+    _WARNED.clear()
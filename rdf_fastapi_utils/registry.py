@@ -0,0 +1,218 @@
+"""Startup of services with many models: finding, resolving, checking and precompiling all models at once
+
+By default the mapping plans, trusted coercers and direct serialization encoders of a model are built when the
+first instance is constructed, so the first requests of a new worker pay for them. `warm_up` does this at startup
+for every subclass of RDFUtilsModelBaseClass (or the given models):
+
+    from rdf_fastapi_utils.registry import warm_up
+
+    @app.on_event("startup")
+    def startup():
+        timings = warm_up()
+
+It resolves the forward references of all models in bulk (the names of all registered models are available, so
+models can refer to models of other modules), checks the RDF configuration of every model and raises an
+`RDFConfigurationError` listing all problems, compiles everything and returns the seconds spent per model. A forward
+reference to a name shared by several models raises as well, pass the intended model as keyword argument.
+"""
+import re
+import typing
+from time import perf_counter
+from typing import Any, ForwardRef
+
+from pydantic.fields import SHAPE_LIST, SHAPE_SINGLETON, ModelField
+
+from rdf_fastapi_utils.batch import clear_batch_hooks, tree_has_batch_hooks
+from rdf_fastapi_utils.models import FieldConfigurationRDF, RDFUtilsModelBaseClass
+from rdf_fastapi_utils.plan import (
+    BRANCH_NESTED,
+    clear_model_plans,
+    get_field_models,
+    get_model_plan,
+    get_model_tree_variables,
+)
+from rdf_fastapi_utils.serializer import clear_encoders, get_encoders
+from rdf_fastapi_utils.trusted import clear_coercers, get_coercers
+
+_NAME = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+
+class RDFConfigurationError(ValueError):
+    """raised for models with an invalid RDF configuration
+
+    Args:
+        problems (dict): the problems (list of str) per model
+    """
+
+    def __init__(self, problems: dict[type, list[str]]) -> None:
+        self.problems = problems
+        lines = [f"{model_name(model)}: {problem}" for model, items in problems.items() for problem in items]
+        super().__init__("invalid RDF configuration:\n" + "\n".join(lines))
+
+
+def model_name(model: type) -> str:
+    """returns the qualified name of a model class"""
+    return f"{model.__module__}.{model.__qualname__}"
+
+
+def iter_models(base: type = RDFUtilsModelBaseClass) -> typing.List[type]:
+    """returns all (direct and indirect) subclasses of base, in definition order"""
+    res = {}
+    todo = list(reversed(base.__subclasses__()))
+    while todo:
+        model = todo.pop()
+        if model not in res:
+            res[model] = None
+            todo.extend(reversed(model.__subclasses__()))
+    return list(res)
+
+
+def _field_forward_refs(field: ModelField) -> typing.Iterator[ForwardRef]:
+    if isinstance(field.type_, ForwardRef):
+        yield field.type_
+    elif field.sub_fields:
+        # Unions keep the forward references in `type_`, the members are resolved in the sub fields
+        for sub in field.sub_fields:
+            yield from _field_forward_refs(sub)
+    else:
+        yield from (arg for arg in typing.get_args(field.type_) if isinstance(arg, ForwardRef))
+
+
+def _forward_refs(model: type) -> typing.List[ForwardRef]:
+    return [ref for field in model.__fields__.values() for ref in _field_forward_refs(field)]
+
+
+def resolve_forward_refs(models: typing.Iterable[type] | None = None, **localns: Any) -> None:
+    """resolves the forward references of models (all registered models by default) in one pass
+
+    The names of the models and localns are available to all models. References that can not be resolved are left
+    in place (`check_model` reports them).
+
+    Raises:
+        RDFConfigurationError: if a reference names several models (pass the intended one in localns)
+    """
+    models = iter_models() if models is None else list(models)
+    namespace = {}
+    ambiguous = {}
+    for model in models:
+        other = namespace.setdefault(model.__name__, model)
+        if other is not model:
+            ambiguous.setdefault(model.__name__, [other]).append(model)
+    problems = {}
+    for model in models:
+        for ref in _forward_refs(model):
+            for name in set(_NAME.findall(ref.__forward_arg__)):
+                if name in ambiguous and name not in localns:
+                    problems.setdefault(model, []).append(
+                        f"forward reference {ref.__forward_arg__}: {name} is the name of several models"
+                        f" ({', '.join(model_name(other) for other in ambiguous[name])})"
+                    )
+    if problems:
+        raise RDFConfigurationError(problems)
+    namespace.update(localns)
+    for model in models:
+        if _forward_refs(model):
+            try:
+                # pydantic's method, the override of RDFUtilsModelBaseClass would clear the caches for every model
+                super(RDFUtilsModelBaseClass, model).update_forward_refs(**namespace)
+            except NameError:
+                pass
+    clear_model_plans()
+    clear_coercers()
+    clear_encoders()
+    clear_batch_hooks()
+
+
+def check_model(model: type) -> typing.List[str]:
+    """returns the problems of the RDF configuration of a model, an empty list for a valid model"""
+    problems = [f"unresolved forward reference {ref.__forward_arg__}" for ref in _forward_refs(model)]
+    if problems:
+        return problems
+    anchors = []
+    for field in model.__fields__.values():
+        rdfconfig = field.field_info.extra.get("rdfconfig")
+        if rdfconfig is None:
+            continue
+        if not isinstance(rdfconfig, FieldConfigurationRDF):
+            problems.append(f"rdfconfig of field {field.name} is not a FieldConfigurationRDF")
+            continue
+        if rdfconfig.anchor:
+            anchors.append(field.name)
+    if len(anchors) > 1:
+        problems.append(f"several anchor fields: {', '.join(anchors)}")
+    for fplan in get_model_plan(model).fields:
+        models = get_field_models(fplan.field)
+        if fplan.branch == BRANCH_NESTED and models:
+            for nested in models:
+                nested_plan = get_model_plan(nested)
+                if fplan.field.shape == SHAPE_LIST and nested_plan.anchor is None:
+                    problems.append(f"field {fplan.name}: nested model {nested.__name__} has no anchor field")
+                if (
+                    len(models) > 1
+                    and getattr(fplan.field.field_info.extra.get("rdfconfig"), "predicate", None) is not None
+                    and getattr(nested.__config__, "RDF_utils_rdf_type", None) is None
+                ):
+                    problems.append(
+                        f"field {fplan.name}: Union member {nested.__name__} has no RDF_utils_rdf_type, the field"
+                        " can not be built from a graph"
+                    )
+                if fplan.path != fplan.name and fplan.path in nested_plan.variables:
+                    problems.append(
+                        f"field {fplan.name}: path {fplan.path} is a variable of the nested model {nested.__name__},"
+                        " nested models are grouped from the remaining variables (remove the path)"
+                    )
+        if fplan.sort is not None:
+            if fplan.field.shape == SHAPE_SINGLETON:
+                problems.append(f"field {fplan.name}: sort needs a list field")
+            elif fplan.sort.key is not None and models and fplan.branch == BRANCH_NESTED:
+                name = fplan.sort.key.split(".")[0]
+                if not any(name in nested.__fields__ for nested in models):
+                    problems.append(f"field {fplan.name}: sort key {fplan.sort.key} is no field of the nested model")
+    return problems
+
+
+def check_models(models: typing.Iterable[type] | None = None) -> None:
+    """checks the RDF configuration of models (all registered models by default)
+
+    Raises:
+        RDFConfigurationError: listing the problems of all invalid models
+    """
+    problems = {}
+    for model in iter_models() if models is None else models:
+        res = check_model(model)
+        if res:
+            problems[model] = res
+    if problems:
+        raise RDFConfigurationError(problems)
+
+
+def warm_up(models: typing.Iterable[type] | None = None, check: bool = True, **localns: Any) -> dict[str, float]:
+    """resolves, checks and precompiles models, see the module docstring
+
+    Args:
+        models (typing.Iterable[type], optional): the models. Defaults to None (all registered models).
+        check (bool, optional): whether to check the RDF configuration of the models. Defaults to True.
+        **localns: additional names for the forward references
+
+    Raises:
+        RDFConfigurationError: if check is set and a model has an invalid RDF configuration, or if a forward
+            reference names several models
+
+    Returns:
+        dict[str, float]: the seconds spent per model (qualified name)
+    """
+    models = iter_models() if models is None else list(models)
+    resolve_forward_refs(models, **localns)
+    if check:
+        check_models(models)
+        clear_model_plans()
+    timings = {}
+    for model in models:
+        start = perf_counter()
+        get_model_plan(model)
+        get_model_tree_variables(model)
+        get_coercers(model)
+        get_encoders(model)
+        tree_has_batch_hooks(model)
+        timings[model_name(model)] = perf_counter() - start
+    return timings
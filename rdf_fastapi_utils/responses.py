@@ -0,0 +1,90 @@
+"""FastAPI response helpers for RDFUtilsModelBaseClass models"""
+import typing
+
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel
+
+from rdf_fastapi_utils.serializer import render_json, serialize_entity, serialize_sparql_rows
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+JSON_MEDIA_TYPE = "application/json"
+
+
+def iter_ndjson(models: typing.Iterable[BaseModel]) -> typing.Iterator[bytes]:
+    """encodes every model as a single line of JSON"""
+    for model in models:
+        yield model.json(by_alias=True).encode("utf-8") + b"\n"
+
+
+def iter_json_array(models: typing.Iterable[BaseModel]) -> typing.Iterator[bytes]:
+    """encodes the models as the items of a JSON array, one chunk per model"""
+    yield b"["
+    sep = b""
+    for model in models:
+        yield sep + model.json(by_alias=True).encode("utf-8")
+        sep = b","
+    yield b"]"
+
+
+def streaming_model_response(
+    models: typing.Iterable[BaseModel], format: typing.Literal["ndjson", "json"] = "ndjson", **kwargs: typing.Any
+) -> StreamingResponse:
+    """returns a StreamingResponse sending the models while they are built
+
+    Args:
+        models (typing.Iterable[BaseModel]): the models, e.g. from `RDFUtilsModelBaseClass.stream_sparql_rows`
+        format (str, optional): `ndjson` for newline delimited JSON, `json` for a JSON array. Defaults to "ndjson".
+        **kwargs: passed on to StreamingResponse (e.g. status_code, headers)
+
+    Returns:
+        StreamingResponse: the response
+    """
+    if format == "ndjson":
+        return StreamingResponse(iter_ndjson(models), media_type=NDJSON_MEDIA_TYPE, **kwargs)
+    if format == "json":
+        return StreamingResponse(iter_json_array(models), media_type=JSON_MEDIA_TYPE, **kwargs)
+    raise ValueError(f"unknown format {format}, use 'ndjson' or 'json'")
+
+
+class RDFJSONResponse(Response):
+    """JSON response rendered with `serializer.render_json` (orjson if installed)
+
+    Use it as `response_class` of endpoints returning models or pass it the output of the direct serializer.
+    """
+
+    media_type = JSON_MEDIA_TYPE
+
+    def render(self, content: typing.Any) -> bytes:
+        return render_json(content)
+
+
+def direct_model_response(
+    model: type,
+    data: list | dict,
+    many: bool = True,
+    check: bool = False,
+    fields: str | dict | None = None,
+    **kwargs: typing.Any,
+) -> RDFJSONResponse:
+    """returns a response with the JSON of the models built from a SPARQL result, without building the instances
+
+    Args:
+        model (type): the model class
+        data (list | dict): flattened rows or a SPARQL JSON result
+        many (bool, optional): one object per anchor value (like `from_sparql_rows`) if True, a single object built
+            from the whole result (like `model(_results=data)`) if False. Defaults to True.
+        check (bool, optional): raise `serializer.SerializationMismatchError` if the output differs from the model
+            based output. Defaults to False.
+        fields (str | dict, optional): field selection (see `rdf_fastapi_utils.selection`). Defaults to None.
+        **kwargs: passed on to RDFJSONResponse (e.g. status_code, headers)
+
+    Returns:
+        RDFJSONResponse: the response
+    """
+    if many:
+        content = serialize_sparql_rows(model, data, check=check, fields=fields)
+    elif fields is not None:
+        content = serialize_entity(model, {"_results": data, "_fields": fields}, check=check)
+    else:
+        content = serialize_entity(model, {"_results": data}, check=check)
+    return RDFJSONResponse(content, **kwargs)
@@ -0,0 +1,321 @@
+"""Row storage for SPARQL results: interned rows and the shared schema rows of `_additional_values`"""
+from collections.abc import Iterable, Iterator, Mapping, Sequence
+from operator import itemgetter
+from typing import Any, Callable
+
+from rdf_fastapi_utils.sparql_results import flatten_sparql_bindings, is_sparql_json
+
+MISSING_ID = -1
+
+
+class InternedRows(Sequence):
+    """Compact storage of SPARQL result rows: every row is a tuple of integer ids into a shared table of values
+
+    All distinct values (compared by type and value, so 1, 1.0 and True keep their type) are stored once, `columns`
+    gives the variable of every tuple position, unbound variables have the id `MISSING_ID`. Items are read-only
+    `InternedRow` mappings, so interned rows can be passed wherever flattened rows are accepted. `filter_sparql` groups
+    and deduplicates them on the ids and returns the `_additional_values` of the groups as InternedRows sharing the
+    tables (with the consumed columns hidden), values are only looked up when the grouped entities are built. Like the
+    grouping of plain rows it treats equal values of different types (1, 1.0 and True) as one value: tables holding such
+    values are grouped on the values instead of the ids.
+
+    Args:
+        columns (tuple): the variables
+        values (list): the value table, indexed by id
+        rows (list): tuples of ids with one item per column
+        hidden (frozenset, optional): columns hidden from the rows. Defaults to frozenset().
+        index (dict, optional): position of every column, computed if not given. Defaults to None.
+        has_unhashable (bool, optional): the table holds unhashable values (e.g. lists) that could not be
+            deduplicated. Defaults to False.
+        has_equal_values (bool, optional): the table holds equal values of different types (e.g. 1 and True).
+            Defaults to False.
+    """
+
+    __slots__ = ("columns", "index", "values", "rows", "hidden", "has_unhashable", "has_equal_values")
+
+    def __init__(
+        self,
+        columns: tuple,
+        values: list,
+        rows: list,
+        hidden: frozenset = frozenset(),
+        index: dict | None = None,
+        has_unhashable: bool = False,
+        has_equal_values: bool = False,
+    ) -> None:
+        self.columns = columns
+        self.index = index if index is not None else {col: pos for pos, col in enumerate(columns)}
+        self.values = values
+        self.rows = rows
+        self.hidden = hidden
+        self.has_unhashable = has_unhashable
+        self.has_equal_values = has_equal_values
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __getitem__(self, idx: int | slice) -> "InternedRow | InternedRows":
+        if isinstance(idx, slice):
+            return self.derive(self.rows[idx], self.hidden)
+        return InternedRow(self, self.rows[idx])
+
+    def __repr__(self) -> str:
+        return f"InternedRows({len(self.rows)} rows, {len(self.columns)} columns, {len(self.values)} values)"
+
+    def derive(self, rows: list, hidden: frozenset) -> "InternedRows":
+        """returns InternedRows sharing the tables of self with other rows and hidden columns"""
+        return InternedRows(
+            self.columns, self.values, rows, hidden, self.index, self.has_unhashable, self.has_equal_values
+        )
+
+    def decode(self) -> list[dict]:
+        """returns the rows as plain dicts"""
+        return [dict(row) for row in self]
+
+
+class InternedRow(Mapping):
+    """Read-only mapping view on a single row of InternedRows"""
+
+    __slots__ = ("table", "ids")
+
+    def __init__(self, table: InternedRows, ids: tuple) -> None:
+        self.table = table
+        self.ids = ids
+
+    def __getitem__(self, key: str) -> Any:
+        pos = self.table.index.get(key)
+        if pos is None or self.ids[pos] == MISSING_ID or key in self.table.hidden:
+            raise KeyError(key)
+        return self.table.values[self.ids[pos]]
+
+    def __contains__(self, key: object) -> bool:
+        pos = self.table.index.get(key)
+        return pos is not None and self.ids[pos] != MISSING_ID and key not in self.table.hidden
+
+    def __iter__(self) -> Iterator[str]:
+        hidden = self.table.hidden
+        return (col for col, vid in zip(self.table.columns, self.ids) if vid != MISSING_ID and col not in hidden)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+    def __reduce__(self):
+        return dict, (dict(self),)
+
+
+class RowSchema:
+    """The columns of SchemaRows, shared by all rows with the same columns
+
+    Args:
+        columns (tuple): the columns, in the order of the values of the rows
+    """
+
+    __slots__ = ("columns", "index")
+
+    def __init__(self, columns: tuple) -> None:
+        self.columns = columns
+        self.index = {col: pos for pos, col in enumerate(columns)}
+
+    def __repr__(self) -> str:
+        return f"RowSchema{self.columns!r}"
+
+
+class SchemaRow(Mapping):
+    """Read-only mapping of a row stored as a tuple of values and a shared RowSchema
+
+    `filter_sparql` keeps the columns of the input rows that are not consumed at a nesting level as SchemaRows in the
+    `_additional_values` of the groups, the next level narrows them to a schema with fewer columns without building
+    dicts.
+    """
+
+    __slots__ = ("schema", "values")
+
+    def __init__(self, schema: RowSchema, values: tuple) -> None:
+        self.schema = schema
+        self.values = values
+
+    def __getitem__(self, key: str) -> Any:
+        return self.values[self.schema.index[key]]
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.schema.index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.schema.columns)
+
+    def __len__(self) -> int:
+        return len(self.schema.columns)
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+    def __reduce__(self):
+        return dict, (dict(self),)
+
+
+class RowLayout:
+    """How `filter_sparql` splits the rows with the same columns: the keys of the grouped entity and the remaining
+    columns, read by position from SchemaRows and by name from other rows
+
+    Args:
+        anchor (Any): accessor of the anchor column, None if the rows have no anchor value
+        keys (list): (column, accessor) of the consumed columns
+        schema (RowSchema | None): the schema of the remaining columns, None if all columns are consumed
+        rest (Callable | None): returns the values of the remaining columns of a row
+    """
+
+    __slots__ = ("anchor", "keys", "schema", "rest")
+
+    def __init__(self, anchor: Any, keys: list, schema: RowSchema | None, rest: Callable | None) -> None:
+        self.anchor = anchor
+        self.keys = keys
+        self.schema = schema
+        self.rest = rest
+
+
+def _single_getter(accessor: Any) -> Callable:
+    return lambda values: (values[accessor],)
+
+
+def row_layout(row: Mapping, anchor: str, keys: frozenset, schemas: dict) -> RowLayout:
+    """returns the layout of the rows with the columns of row
+
+    Args:
+        row (Mapping): a row (dict, SchemaRow or any other mapping)
+        anchor (str): the anchor column
+        keys (frozenset): the consumed columns (including the anchor)
+        schemas (dict): the schemas of the remaining columns created so far (by column set), rows with the same
+            remaining columns share a schema and are deduplicated against each other
+    """
+    if type(row) is SchemaRow:
+        columns, accessors = row.schema.columns, range(len(row.schema.columns))
+    else:
+        columns = accessors = tuple(row)
+    pairs = list(zip(columns, accessors))
+    rest = [(col, acc) for col, acc in pairs if col not in keys]
+    schema = getter = None
+    if rest:
+        by_col = dict(rest)
+        schema = schemas.get(frozenset(by_col))
+        if schema is None:
+            schema = schemas[frozenset(by_col)] = RowSchema(tuple(by_col))
+        rest_accs = [by_col[col] for col in schema.columns]
+        getter = itemgetter(*rest_accs) if len(rest_accs) > 1 else _single_getter(rest_accs[0])
+    return RowLayout(
+        dict(pairs).get(anchor),
+        [(col, acc) for col, acc in pairs if col in keys],
+        schema,
+        getter,
+    )
+
+
+def intern_rows(
+    rows: Iterable[Mapping] | dict,
+    variables: Iterable[str] | None = None,
+    decode: Iterable[str] | Mapping[str, tuple] | None = None,
+) -> InternedRows:
+    """interns flattened SPARQL rows or a SPARQL JSON result (decoded on the fly without building flat rows first)
+
+    Args:
+        rows (Iterable[Mapping] | dict): flattened rows, e.g. from `sparql_results.flatten_sparql_bindings`, or a
+            SPARQL JSON result
+        variables (Iterable[str], optional): only keep these variables. Defaults to None (all).
+        decode (Iterable[str] | Mapping[str, tuple], optional): only decode the typed literals of these variables of a
+            SPARQL JSON result (see `sparql_results.flatten_sparql_bindings`). Defaults to None (all).
+
+    Returns:
+        InternedRows: the interned rows
+    """
+    keep = frozenset(variables) if variables is not None else None
+    if is_sparql_json(rows):
+        if decode is not None and not isinstance(decode, Mapping):
+            decode = frozenset(decode)
+        rows = flatten_sparql_bindings(rows["results"]["bindings"], variables=keep, decode=decode)
+    index: dict[str, int] = {}
+    values: list = []
+    value_ids: dict = {}
+    equal_ids: dict = {}  # value -> id of the first equal value of any type
+    has_unhashable = False
+    has_equal_values = False
+    res = []
+    for row in rows:
+        ids = [MISSING_ID] * len(index)
+        for key, value in row.items():
+            if keep is not None and key not in keep:
+                continue
+            pos = index.get(key)
+            if pos is None:
+                pos = index[key] = len(index)
+                ids.append(MISSING_ID)
+            try:
+                vid = value_ids.get((type(value), value))
+                if vid is None:
+                    vid = value_ids[(type(value), value)] = len(values)
+                    values.append(value)
+                    if not has_equal_values:
+                        has_equal_values = equal_ids.setdefault(value, vid) != vid
+            except TypeError:
+                has_unhashable = True
+                vid = len(values)
+                values.append(value)
+            ids[pos] = vid
+        res.append(ids)
+    width = len(index)
+    rows_ = [tuple(ids) + (MISSING_ID,) * (width - len(ids)) for ids in res]
+    return InternedRows(
+        tuple(index), values, rows_, index=index, has_unhashable=has_unhashable, has_equal_values=has_equal_values
+    )
+
+
+def group_interned(rows: InternedRows, anchor: str, keys: Iterable[str]) -> list[dict]:
+    """groups interned rows by the anchor on the value ids (the anchor branch of `filter_sparql`)
+
+    Returns one dict per anchor value (first-seen order) with the decoded values of keys, a single value for keys
+    with one distinct value and a list otherwise. The other columns of the rows are kept (deduplicated on their ids)
+    as `_additional_values`.
+    """
+    keys = frozenset(keys) | {anchor}
+    hidden = rows.hidden
+    apos = rows.index.get(anchor)
+    if apos is None or anchor in hidden:
+        return []
+    key_pos = [(col, pos) for pos, col in enumerate(rows.columns) if col in keys and col not in hidden]
+    rest_pos = [pos for pos, col in enumerate(rows.columns) if col not in keys and col not in hidden]
+    groups: dict[int, tuple] = {}
+    for ids in rows.rows:
+        aid = ids[apos]
+        if aid == MISSING_ID:
+            continue
+        group = groups.get(aid)
+        if group is None:
+            group = groups[aid] = ({}, [], set())
+        res_vals, add_rows, add_seen = group
+        for col, pos in key_pos:
+            vid = ids[pos]
+            if vid == MISSING_ID:
+                continue
+            entry = res_vals.get(col)
+            if entry is None:
+                res_vals[col] = ([vid], {vid})
+            elif vid not in entry[1]:
+                entry[1].add(vid)
+                entry[0].append(vid)
+        rest = tuple(ids[pos] for pos in rest_pos)
+        if rest not in add_seen and any(vid != MISSING_ID for vid in rest):
+            add_seen.add(rest)
+            add_rows.append(ids)
+    values = rows.values
+    add_hidden = hidden | keys
+    res = []
+    for res_vals, add_rows, _ in groups.values():
+        ent = {
+            col: values[vids[0]] if len(vids) == 1 else [values[vid] for vid in vids]
+            for col, (vids, _) in res_vals.items()
+        }
+        if add_rows:
+            ent["_additional_values"] = rows.derive(add_rows, add_hidden)
+        res.append(ent)
+    return res
@@ -0,0 +1,87 @@
+"""Field selection for sparse models
+
+A selection like `id,name,events.label` is parsed into a nested dict, `None` selects a whole subtree:
+
+    {"id": None, "name": None, "events": {"label": None}}
+
+It is passed to the construction as `_fields` (`Person(_results=rows, _fields=selection)`,
+`Person.from_sparql_rows(rows, fields=selection)`). Fields that are not selected are not grouped, mapped or
+validated and are left out of the instance (`.dict()` and `.json()` only contain the selected fields, reading an
+unselected field returns its default). Root validators, `RDF_utils_catch_errors`, batch hooks and trusted
+construction apply to sparse instances like to full ones.
+"""
+import typing
+
+from rdf_fastapi_utils.plan import get_field_models
+
+FieldSelection = typing.Dict[str, "FieldSelection | None"]
+
+
+def parse_field_selection(fields: str | typing.Iterable[str] | None) -> FieldSelection | None:
+    """parses a comma separated list of dotted field paths, returns None (everything) for an empty selection"""
+    if fields is None:
+        return None
+    if isinstance(fields, str):
+        fields = fields.split(",")
+    res: dict = {}
+    for path in fields:
+        path = path.strip()
+        if not path:
+            continue
+        node = res
+        parts = path.split(".")
+        for part in parts[:-1]:
+            if part in node and node[part] is None:
+                break
+            node = node.setdefault(part, {})
+        else:
+            node[parts[-1]] = None
+    return res or None
+
+
+def _find_field(models: typing.List[type], key: str) -> typing.Any:
+    for model in models:
+        fields = model.__fields__
+        field = fields.get(key) or next((f for f in fields.values() if f.alias == key), None)
+        if field is not None:
+            return field
+    return None
+
+
+def _resolve(models: typing.List[type], selection: FieldSelection) -> FieldSelection:
+    res = {}
+    for key, sub in selection.items():
+        field = _find_field(models, key)
+        if field is None:
+            raise ValueError(f"unknown field {key} of {', '.join(m.__name__ for m in models)}")
+        if sub is not None:
+            nested = get_field_models(field)
+            if not nested:
+                raise ValueError(f"field {key} of {', '.join(m.__name__ for m in models)} has no subfields")
+            sub = _resolve(nested, sub)
+        res[field.name] = sub
+    return res
+
+
+def resolve_field_selection(model: type, selection: FieldSelection | None) -> FieldSelection | None:
+    """checks a selection against a model (and the members of Union types) and replaces aliases by field names
+
+    Raises:
+        ValueError: for unknown fields and nested selections of fields that don't hold models
+    """
+    if selection is None:
+        return None
+    return _resolve([model], selection)
+
+
+def select_fields(value: typing.Any, selection: FieldSelection | None) -> typing.Any:
+    """attaches a selection to grouped entities (dicts or lists of dicts) that are built into nested models"""
+    if selection is None:
+        return value
+    if isinstance(value, list):
+        for ent in value:
+            if isinstance(ent, dict):
+                ent["_fields"] = selection
+    elif isinstance(value, dict):
+        value["_fields"] = selection
+    return value
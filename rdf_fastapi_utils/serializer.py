@@ -0,0 +1,295 @@
+"""Direct serialization of SPARQL results to JSON without building model instances
+
+The serializer runs the compiled mapping of a model (paths, anchors, `default_dict_key`, callbacks,
+`encode_function`, serialization class callbacks) and converts the mapped values straight to JSON compatible
+objects in the shape `model.dict(by_alias=True)` followed by FastAPI's `jsonable_encoder` would produce:
+
+    content = serialize_sparql_rows(Person, rows)
+    body = render_json(content)
+
+Values are coerced like in trusted construction (see `rdf_fastapi_utils.trusted`), values the coercion can't handle
+and fields with validators are validated by pydantic. Models using `RDF_utils_catch_errors`, root validators,
+non-default `extra` settings or `json_encoders` are built as instances and serialized from them. Like in
+`jsonable_encoder` only the `json_encoders` of the outermost model apply. `callback_function` callbacks of fields
+holding models built by a `serialization_class_callback` receive JSON compatible dicts instead of instances.
+
+With `check=True` the output is compared byte for byte with the response FastAPI renders for the instances
+(`jsonable_encoder` and `JSONResponse`, for tests and staging).
+"""
+import contextlib
+import contextvars
+import json
+import typing
+from collections.abc import Mapping
+from enum import Enum
+from types import GeneratorType
+from typing import Any, Callable, ForwardRef
+
+from pydantic import BaseModel, ValidationError
+from pydantic.error_wrappers import ErrorWrapper
+from pydantic.errors import MissingError
+from pydantic.fields import SHAPE_LIST, SHAPE_SINGLETON, ModelField
+from pydantic.json import ENCODERS_BY_TYPE
+
+from rdf_fastapi_utils.instrumentation import stage
+from rdf_fastapi_utils.ordering import sort_fields
+from rdf_fastapi_utils.plan import get_field_models, get_model_plan
+from rdf_fastapi_utils.selection import parse_field_selection, resolve_field_selection
+from rdf_fastapi_utils.sparql_results import is_sparql_json
+from rdf_fastapi_utils.trusted import FALLBACK, compile_coercer, get_coercers
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+_DIRECT: contextvars.ContextVar[bool] = contextvars.ContextVar("rdf_utils_direct_serialization", default=False)
+_ENCODERS: dict[type, tuple | None] = {}
+
+
+class EncodedEntity(dict):
+    """JSON compatible dict of a serialized entity"""
+
+
+class SerializationMismatchError(ValueError):
+    """raised in check mode when the direct output differs from the model based output"""
+
+
+def is_direct_serialization() -> bool:
+    """returns True while the mapping of a model runs for direct serialization"""
+    return _DIRECT.get()
+
+
+@contextlib.contextmanager
+def _direct() -> typing.Iterator[None]:
+    token = _DIRECT.set(True)
+    try:
+        yield
+    finally:
+        _DIRECT.reset(token)
+
+
+def jsonable(value: Any, custom_encoders: dict | None = None) -> Any:
+    """converts a value to JSON compatible objects like FastAPI's `jsonable_encoder` (by alias)
+
+    The `json_encoders` of a model apply to all values of the model (and custom_encoders to all values), nested
+    models are converted to dicts by the outermost model and their `json_encoders` are not used.
+    """
+    if custom_encoders:
+        encoder = custom_encoders.get(type(value))
+        if encoder is None:
+            encoder = next((enc for type_, enc in custom_encoders.items() if isinstance(value, type_)), None)
+        if encoder is not None:
+            return encoder(value)
+    if value is None or type(value) in (str, int, float, bool, EncodedEntity):
+        return value
+    if isinstance(value, BaseModel):
+        encoders = value.__config__.json_encoders
+        if custom_encoders:
+            encoders = {**encoders, **custom_encoders}
+        return jsonable(_model_dict(value), encoders)
+    if isinstance(value, Enum):
+        return jsonable(value.value)
+    if isinstance(value, (str, int, float)):
+        return value
+    if isinstance(value, Mapping):
+        return {jsonable(k, custom_encoders): jsonable(v, custom_encoders) for k, v in value.items()}
+    if isinstance(value, (list, set, frozenset, GeneratorType, tuple)):
+        return [jsonable(v, custom_encoders) for v in value]
+    for base in type(value).__mro__[:-1]:
+        encoder = ENCODERS_BY_TYPE.get(base)
+        if encoder is not None:
+            return jsonable(encoder(value))
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _model_dict(instance: BaseModel) -> Any:
+    res = instance.dict(by_alias=True)
+    return res["__root__"] if "__root__" in res else res
+
+
+def render_json(content: Any) -> bytes:
+    """renders JSON compatible content like FastAPI's JSONResponse
+
+    orjson is used if it is installed, the output then only differs from JSONResponse in the formatting of some
+    floats (e.g. `1e16` instead of `1e+16`). Content orjson can't render (integers above 64 bit, keys that are no
+    strings) is rendered with the json module.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(content)
+        except orjson.JSONEncodeError:
+            pass
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def _compile_encoder(field: ModelField, model: type) -> Callable[[Any], Any]:
+    def validate(value: Any) -> Any:
+        value, errors = field.validate(value, {}, loc=field.alias, cls=model)
+        if errors:
+            raise ValidationError([errors], model)
+        return jsonable(value)
+
+    if field.class_validators or field.pre_validators or field.post_validators:
+        return validate
+    allow_none = field.allow_none
+    if field.shape == SHAPE_LIST and field.sub_fields:
+        item = _compile_encoder(field.sub_fields[0], model)
+
+        def encode_list(value: Any) -> Any:
+            if value is None and allow_none:
+                return None
+            if type(value) is not list:
+                return validate(value)
+            return [item(v) for v in value]
+
+        return encode_list
+    if field.shape != SHAPE_SINGLETON:
+        return validate
+    models = get_field_models(field)
+    if models:
+        nested = models[0] if len(models) == 1 and field.type_ is models[0] else None
+
+        def encode_model(value: Any) -> Any:
+            if value is None and allow_none:
+                return None
+            if type(value) is EncodedEntity:
+                return value
+            if isinstance(value, tuple(models)):
+                return jsonable(_model_dict(value))
+            if nested is not None and isinstance(value, Mapping):
+                return _serialize_entity(nested, value, nested=True)
+            return validate(value)
+
+        return encode_model
+    coerce = compile_coercer(field)
+    if coerce is None:
+        return validate
+
+    def encode(value: Any) -> Any:
+        res = coerce(value)
+        if res is FALLBACK:
+            return validate(value)
+        return jsonable(res)
+
+    return encode
+
+
+def get_encoders(model: type) -> tuple | None:
+    """returns (alias, field, encoder) for every field of model, None if the model is serialized from instances"""
+    if model in _ENCODERS:
+        return _ENCODERS[model]
+    encoders = None
+    if (
+        get_coercers(model) is not None
+        and not getattr(model.__config__, "RDF_utils_catch_errors", False)
+        and not model.__config__.json_encoders
+    ):
+        encoders = tuple((field.alias, field, _compile_encoder(field, model)) for field in model.__fields__.values())
+    if not any(isinstance(field.type_, ForwardRef) for field in model.__fields__.values()):
+        _ENCODERS[model] = encoders
+    return encoders
+
+
+def clear_encoders() -> None:
+    """drops the compiled encoders, e.g. after forward references have been updated"""
+    _ENCODERS.clear()
+
+
+def serialize_entity(model: type, data: Mapping, check: bool = False) -> EncodedEntity:
+    """returns the JSON compatible dict of `model(**data)`, e.g. for a grouped entity or `{"_results": rows}`
+
+    Raises:
+        SerializationMismatchError: in check mode, if the output differs from the model based output
+    """
+    if check:
+        res = _serialize_entity(model, data)
+        check_equivalence(res, model(**data))
+        return res
+    return _serialize_entity(model, data)
+
+
+def _serialize_entity(model: type, data: Mapping, nested: bool = False) -> EncodedEntity:
+    # nested entities are encoded without the json_encoders of their model, like the dicts of nested models
+    # in the output of the outermost model
+    encoders = get_encoders(model)
+    if encoders is None:
+        instance = model.from_entity(data) if hasattr(model, "from_entity") else model(**data)
+        return EncodedEntity(jsonable(_model_dict(instance) if nested else instance))
+    data = dict(data)
+    selection = data.get("_fields")
+    if isinstance(selection, str):
+        selection = data["_fields"] = resolve_field_selection(model, parse_field_selection(selection))
+    mapper = model.__new__(model)
+    with _direct():
+        mapped = mapper._prepare_data(data)
+    with stage(model, "serialization"):
+        res = EncodedEntity()
+        for alias, field, encode in encoders:
+            if selection is not None and field.name not in selection:
+                continue
+            if alias in mapped:
+                res[alias] = encode(mapped[alias])
+            elif field.required:
+                raise ValidationError([ErrorWrapper(MissingError(), loc=alias)], model)
+            else:
+                res[alias] = jsonable(field.get_default())
+        plan = get_model_plan(model)
+        if plan.sort_fields:
+            sort_fields(plan, res)
+    return res
+
+
+def serialize_sparql_rows(
+    model: type, rows: list | dict, check: bool = False, fields: str | dict | None = None
+) -> typing.List[EncodedEntity]:
+    """maps a SPARQL result to one JSON compatible dict per anchor value (like `from_sparql_rows`)
+
+    Args:
+        model (type): the model class
+        rows (list | dict): flattened rows or a SPARQL JSON result
+        check (bool, optional): compare the output with the model based output. Defaults to False.
+        fields (str | dict, optional): field selection (see `rdf_fastapi_utils.selection`). Defaults to None.
+
+    Raises:
+        SerializationMismatchError: in check mode, if the outputs differ
+    """
+    plan = get_model_plan(model)
+    if plan.anchor is None:
+        raise ValueError(f"{model.__name__} has no anchor field, can't group the rows")
+    if is_sparql_json(rows):
+        rows = model._flatten_sparql_json(rows)
+    with stage(model, "filter_sparql"):
+        grouped = model.__new__(model).filter_sparql(rows, anchor=plan.anchor, list_of_keys=plan.variables) or []
+    if isinstance(fields, str):
+        fields = resolve_field_selection(model, parse_field_selection(fields))
+    if fields is not None:
+        for ent in grouped:
+            ent["_fields"] = fields
+    res = [_serialize_entity(model, ent) for ent in grouped]
+    if check:
+        check_equivalence(res, model.from_sparql_rows(rows, fields=fields))
+    return res
+
+
+def check_equivalence(content: Any, expected: Any) -> None:
+    """compares the direct output with the response FastAPI renders for the model instances (`jsonable_encoder`
+    rendered by `JSONResponse`)
+
+    Raises:
+        SerializationMismatchError: if the rendered bytes differ
+    """
+    # check mode only, FastAPI is not imported with the serializer
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+
+    direct = JSONResponse(content).body
+    model_based = JSONResponse(jsonable_encoder(expected)).body
+    if direct != model_based:
+        pos = next(
+            (i for i, (a, b) in enumerate(zip(direct, model_based)) if a != b), min(len(direct), len(model_based))
+        )
+        raise SerializationMismatchError(
+            f"direct serialization differs at byte {pos}: {direct[max(pos - 40, 0):pos + 40]!r} != "
+            f"{model_based[max(pos - 40, 0):pos + 40]!r}"
+        )
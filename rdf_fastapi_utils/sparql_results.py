@@ -0,0 +1,174 @@
+"""Support for the standard SPARQL JSON results format (`application/sparql-results+json`)"""
+import functools
+import typing
+from collections.abc import Mapping
+from decimal import Decimal
+from typing import Any, Callable
+
+from pydantic.datetime_parse import parse_date, parse_datetime, parse_time
+
+XSD = "http://www.w3.org/2001/XMLSchema#"
+
+
+def _parse_boolean(value: str) -> bool | str:
+    # unknown lexical forms are kept for the validation to reject them
+    return _BOOLEANS.get(value.strip(), value)
+
+
+_BOOLEANS = {"true": True, "1": True, "false": False, "0": False}
+
+
+LITERAL_CONVERTERS: dict[str, Callable[[str], Any]] = {
+    **{
+        f"{XSD}{name}": int
+        for name in (
+            "integer",
+            "int",
+            "long",
+            "short",
+            "byte",
+            "nonNegativeInteger",
+            "positiveInteger",
+            "nonPositiveInteger",
+            "negativeInteger",
+            "unsignedLong",
+            "unsignedInt",
+            "unsignedShort",
+            "unsignedByte",
+        )
+    },
+    f"{XSD}decimal": Decimal,
+    f"{XSD}double": float,
+    f"{XSD}float": float,
+    f"{XSD}boolean": _parse_boolean,
+    f"{XSD}dateTime": parse_datetime,
+    f"{XSD}dateTimeStamp": parse_datetime,
+    f"{XSD}date": parse_date,
+    f"{XSD}time": parse_time,
+}
+
+
+def register_literal_converter(datatype: str, converter: Callable[[str], Any] | None) -> None:
+    """registers (or with converter None removes) the converter used for literals of the given datatype IRI"""
+    if converter is None:
+        LITERAL_CONVERTERS.pop(datatype, None)
+    else:
+        LITERAL_CONVERTERS[datatype] = converter
+    get_literal_converter.cache_clear()
+
+
+@functools.lru_cache(maxsize=None)
+def get_literal_converter(datatype: str | None) -> Callable[[str], Any] | None:
+    """returns the converter for a datatype IRI, None if literals of that datatype are kept as strings"""
+    if datatype is None:
+        return None
+    return LITERAL_CONVERTERS.get(datatype)
+
+
+def convert_term(term: dict) -> Any:
+    """converts a single RDF term of the SPARQL JSON results format to a python value
+
+    Typed literals with a registered converter are converted, all other terms (IRIs, blank nodes, plain and
+    language tagged literals) return their lexical value. Values the converter fails on are returned unchanged.
+    """
+    value = term["value"]
+    converter = get_literal_converter(term.get("datatype"))
+    if converter is None:
+        return value
+    try:
+        return converter(value)
+    except (ValueError, TypeError, ArithmeticError):
+        return value
+
+
+def literal_accepted(value: Any, types: tuple) -> bool:
+    """checks whether a decoded literal is an instance of one of types, booleans only match bool (or object)"""
+    return type(value) in types or (type(value) is not bool and isinstance(value, types))
+
+
+def is_sparql_json(data: Any) -> bool:
+    """checks whether data looks like a parsed `application/sparql-results+json` document"""
+    return (
+        isinstance(data, dict)
+        and isinstance(data.get("results"), dict)
+        and isinstance(data["results"].get("bindings"), list)
+    )
+
+
+def flatten_sparql_bindings(
+    bindings: typing.Iterable[dict],
+    variables: typing.Collection[str] | None = None,
+    decoded: dict | None = None,
+    max_decoded: int | None = None,
+    decode: typing.Collection[str] | Mapping[str, tuple] | None = None,
+) -> typing.Iterator[dict]:
+    """lazily converts SPARQL JSON bindings to flat `{variable: value}` rows
+
+    Works on any iterable of bindings, e.g. an incremental JSON parser reading `results.bindings` of a response body.
+
+    Args:
+        bindings (typing.Iterable[dict]): the bindings of a SPARQL JSON result
+        variables (typing.Collection[str], optional): variables to keep, all other variables are skipped
+            without decoding them. Defaults to None (keep all variables).
+        decoded (dict, optional): cache of decoded literals, pass the same dict to share it between calls.
+            Defaults to None.
+        max_decoded (int, optional): clear the cache of decoded literals when it grows beyond this size, keeps
+            memory bounded when streaming. Defaults to None (no limit).
+        decode (typing.Collection[str] | Mapping[str, tuple], optional): variables whose typed literals are decoded,
+            all other variables keep their lexical value. A mapping gives the types the decoded values must have
+            (e.g. `plan.get_model_literal_types`), other values keep their lexical value too. Defaults to None
+            (decode all variables).
+
+    Yields:
+        dict: flat row
+    """
+    if decoded is None:
+        decoded = {}
+    literal_types = decode if isinstance(decode, Mapping) else None
+    for binding in bindings:
+        row = {}
+        for var, term in binding.items():
+            if variables is not None and var not in variables:
+                continue
+            datatype = term.get("datatype")
+            if datatype is None or (decode is not None and var not in decode):
+                row[var] = term["value"]
+                continue
+            key = (datatype, term["value"])
+            if key not in decoded:
+                if max_decoded is not None and len(decoded) >= max_decoded:
+                    decoded.clear()
+                decoded[key] = convert_term(term)
+            value = decoded[key]
+            if literal_types is not None and not literal_accepted(value, literal_types[var]):
+                value = term["value"]
+            row[var] = value
+        yield row
+
+
+def flatten_sparql_json(
+    data: dict,
+    variables: typing.Collection[str] | None = None,
+    decoded: dict | None = None,
+    decode: typing.Collection[str] | Mapping[str, tuple] | None = None,
+) -> typing.List[dict]:
+    """converts a SPARQL JSON result to the flat `{variable: value}` rows used by RDFUtilsModelBaseClass
+
+    Every distinct (datatype, value) pair is decoded only once per call, rows repeating the same literal share
+    the decoded value.
+
+    Args:
+        data (dict): parsed `application/sparql-results+json` document
+        variables (typing.Collection[str], optional): variables to keep, all other variables are skipped
+            without decoding them. Defaults to None (keep all variables).
+        decoded (dict, optional): cache of decoded literals, pass the same dict to share it between calls.
+            Defaults to None.
+        decode (typing.Collection[str] | Mapping[str, tuple], optional): variables whose typed literals are decoded
+            (with the types the decoded values must have), see `flatten_sparql_bindings`. Defaults to None (decode
+            all variables).
+
+    Returns:
+        typing.List[dict]: list of flat rows
+    """
+    bindings = data["results"]["bindings"]
+    return list(flatten_sparql_bindings(bindings, variables=variables, decoded=decoded, decode=decode))
@@ -1,8 +1,46 @@
+from copy import deepcopy
+import datetime
 from typing import Union
 import unittest
 import json
+import os
 from pydantic import Field, ValidationError
 from rdf_fastapi_utils.models import FieldConfigurationRDF, RDFUtilsModelBaseClass
+from rdf_fastapi_utils.rows import SchemaRow
+
+
+def legacy_filter_sparql_anchor(data, list_of_keys, anchor):
+    """anchor grouping of filter_sparql as implemented up to version 0.1.3, used as reference"""
+    lst_unique_vals = set([x[anchor] for x in data if anchor in x])
+    res_fin_anchor = []
+    for item in lst_unique_vals:
+        add_vals = []
+        res1 = {}
+        for i2 in list(filter(lambda d: d[anchor] == item, [x for x in data if anchor in x])):
+            add_vals_dict = deepcopy(i2)
+            for k, v in i2.items():
+                if k in list_of_keys or k == anchor:
+                    if k not in res1:
+                        res1[k] = v
+                    else:
+                        if (
+                            isinstance(res1[k], str)
+                            or isinstance(res1[k], int)
+                            or isinstance(res1[k], float)
+                            or isinstance(res1[k], datetime.datetime)
+                        ):
+                            if v != res1[k]:
+                                res1[k] = [res1[k], v]
+                        elif v not in res1[k]:
+                            res1[k].append(v)
+                    del add_vals_dict[k]
+            if add_vals_dict:
+                if add_vals_dict not in add_vals:
+                    add_vals.append(add_vals_dict)
+        if len(add_vals) > 0:
+            res1["_additional_values"] = add_vals
+        res_fin_anchor.append(res1)
+    return res_fin_anchor
 
 
 def results_callback(field, data):
@@ -67,19 +105,33 @@ class TCEventFullWithError(RDFUtilsModelBaseClass):
         RDF_utils_move_errors_to_top = True
 
 
+class TCPersonWithErrorField(RDFUtilsModelBaseClass):
+    id: str = Field(..., rdfconfig=FieldConfigurationRDF(anchor=True, path="person"))
+    name: str = Field(..., rdfconfig=FieldConfigurationRDF(path="entityLabel"))
+    events: list["TCEventFullWithError"] = None
+    error: list[str] = None
+
+    class Config:
+        RDF_utils_catch_errors = True
+        RDF_utils_error_field_name = "error"
+
+
+DATA_DIR = os.path.dirname(__file__)
+
 TCPaginatedResponse.update_forward_refs()
 TCPlaceFull.update_forward_refs()
 TCPersonFull.update_forward_refs()
 TCEventFull.update_forward_refs()
 TCPersonFullWithError.update_forward_refs()
 TCPaginatedResponseWithError.update_forward_refs()
+TCPersonWithErrorField.update_forward_refs()
 
 
 class TestInTaViaBaseClass(unittest.TestCase):
     def setUp(self) -> None:
-        with open("rdf-fastapi-utils/rdf_fastapi_utils/tests/test_data.json") as f:
+        with open(os.path.join(DATA_DIR, "test_data.json")) as f:
             self.test_data = json.load(f)
-        with open("rdf-fastapi-utils/rdf_fastapi_utils/tests/test_data_events.json") as f:
+        with open(os.path.join(DATA_DIR, "test_data_events.json")) as f:
             self.test_data_events = json.load(f)
         return super().setUp()
 
@@ -108,10 +160,65 @@ class TestInTaViaBaseClass(unittest.TestCase):
         )
         self.assertEqual(len(res2), 14)
 
+    def test_filter_sparql_matches_legacy_implementation(self):
+        cases = [
+            (self.test_data["results"], ["person", "entityLabel"], "person"),
+            (self.test_data_events["results"], ["person", "entityLabel"], "person"),
+            (self.test_data_events["results"], ["event", "eventLabel", "start"], "event"),
+            (self.test_data_events["results"], ["evPlace", "evPlaceLabel"], "evPlace"),
+        ]
+        for data, list_of_keys, anchor in cases:
+            res = RDFUtilsModelBaseClass().filter_sparql(data, anchor=anchor, list_of_keys=list_of_keys)
+            legacy = legacy_filter_sparql_anchor(data, list_of_keys, anchor)
+            self.assertEqual(len(res), len(legacy))
+            legacy = {ent[anchor]: ent for ent in legacy}
+            for ent in res:
+                self.assertEqual(ent, legacy[ent[anchor]])
+
+    def test_filter_sparql_keeps_anchor_order(self):
+        data = self.test_data["results"]
+        res = RDFUtilsModelBaseClass().filter_sparql(data, anchor="person", list_of_keys=["person", "entityLabel"])
+        self.assertEqual([ent["person"] for ent in res], list(dict.fromkeys(x["person"] for x in data)))
+
+    def test_filter_sparql_additional_values(self):
+        data = self.test_data_events["results"]
+        res = RDFUtilsModelBaseClass().filter_sparql(data, anchor="person", list_of_keys=["person", "entityLabel"])
+        add_vals = res[0]["_additional_values"]
+        self.assertTrue(all(isinstance(row, SchemaRow) for row in add_vals))
+        self.assertEqual(len({id(row.schema) for row in add_vals}), len({frozenset(row) for row in add_vals}))
+        self.assertNotIn("entityLabel", add_vals[0])
+        self.assertEqual(add_vals[0]["event"], data[0]["event"])
+        self.assertEqual(dict(add_vals[0]), {k: v for k, v in data[0].items() if k not in ("person", "entityLabel")})
+        res2 = RDFUtilsModelBaseClass().filter_sparql(add_vals, anchor="event", list_of_keys=["event", "eventLabel"])
+        for ent in res2:
+            for row in ent["_additional_values"]:
+                self.assertNotIn("entityLabel", row)
+                self.assertNotIn("eventLabel", row)
+        # rows with the same columns in another order share the schema and are deduplicated
+        rows = [
+            {"person": "p1", "a": "1", "b": "2"},
+            {"b": "2", "person": "p1", "a": "1"},
+            {"person": "p1", "a": ["x"]},
+        ]
+        add_vals = RDFUtilsModelBaseClass().filter_sparql(rows, anchor="person", list_of_keys=["person"])[0][
+            "_additional_values"
+        ]
+        self.assertEqual(add_vals, [{"a": "1", "b": "2"}, {"a": ["x"]}])
+
     def test_model_field(self):
         res = TCPaginatedResponse(**self.test_data_events)
         self.assertEqual(len(res.results[0].events), 14)
 
+    def test_from_sparql_rows(self):
+        res = TCEventFull.from_sparql_rows(self.test_data_events["results"])
+        self.assertEqual(len(res), 14)
+        self.assertEqual(res[0].id, self.test_data_events["results"][0]["event"])
+        persons = TCPersonFull.from_sparql_rows(self.test_data_events["results"], lazy=True)
+        self.assertFalse(isinstance(persons, list))
+        persons = list(persons)
+        self.assertEqual(len(persons), 1)
+        self.assertEqual(len(persons[0].events), 14)
+
     def test_validation_errors(self):
         """test if validation errors are raised correctly when a required field is missing"""
         testdata = self.test_data_events.copy()
@@ -124,3 +231,18 @@ class TestInTaViaBaseClass(unittest.TestCase):
             TCPaginatedResponse(**testdata)
         x = TCPaginatedResponseWithError(**testdata)
         print("test")
+
+    def test_validation_errors_drop_failing_elements_only(self):
+        testdata = deepcopy(self.test_data_events)
+        event = testdata["results"][0]["event"]
+        for row in testdata["results"]:
+            if row["event"] == event:
+                del row["eventLabel"]
+        person = TCPersonWithErrorField.from_sparql_rows(testdata["results"])[0]
+        self.assertEqual(len(person.events), 13)
+        self.assertNotIn(event, [ev.id for ev in person.events])
+        self.assertEqual(len(person.error), 1)
+        self.assertIn("events -> ", person.error[0])
+        self.assertNotIn("\n", person.error[0])
+        self.assertEqual(person.dict()["name"], person.name)
+        self.assertEqual(list(person.dict().keys()), ["id", "name", "events", "error"])
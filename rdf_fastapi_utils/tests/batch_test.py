@@ -0,0 +1,146 @@
+import json
+import os
+import unittest
+from typing import Union
+
+from pydantic import BaseModel, Field, ValidationError
+
+from rdf_fastapi_utils.batch import PendingValue, batch_construction
+from rdf_fastapi_utils.cache import clear_model_caches, get_model_cache
+from rdf_fastapi_utils.models import FieldConfigurationRDF, RDFUtilsModelBaseClass
+from rdf_fastapi_utils.tests.baseclass_test import DATA_DIR
+
+CALLS = []
+
+
+def lookup_labels(field, values, datas):
+    CALLS.append((field.name, len(values)))
+    return [f"label of {value}" for value in values]
+
+
+def add_suffix(values):
+    CALLS.append(("suffix", len(values)))
+    return [f"{value}!" for value in values]
+
+
+def lower(field, value, data):
+    return value.lower()
+
+
+def persons_callback(field, data):
+    return [(TCBatchPerson, data)]
+
+
+class TCBatchEvent(RDFUtilsModelBaseClass):
+    id: str = Field(..., rdfconfig=FieldConfigurationRDF(anchor=True, path="event"))
+    label: str = Field(..., rdfconfig=FieldConfigurationRDF(path="event", batch_callback_function=lookup_labels))
+
+
+class TCBatchPerson(RDFUtilsModelBaseClass):
+    id: str = Field(..., rdfconfig=FieldConfigurationRDF(anchor=True, path="person"))
+    name: str = Field(
+        ...,
+        rdfconfig=FieldConfigurationRDF(path="entityLabel", callback_function=lower, batch_encode_function=add_suffix),
+    )
+    events: list[TCBatchEvent] = None
+
+
+class TCBatchPage(RDFUtilsModelBaseClass):
+    count: int = Field(..., rdfconfig=FieldConfigurationRDF(path="count"))
+    results: list[Union[TCBatchPerson]] = Field(
+        ..., rdfconfig=FieldConfigurationRDF(path="results", serialization_class_callback=persons_callback)
+    )
+
+
+def find_pending(value) -> bool:
+    if isinstance(value, BaseModel):
+        return any(isinstance(v, PendingValue) or find_pending(v) for v in value.__dict__.values())
+    if isinstance(value, list):
+        return any(find_pending(v) for v in value)
+    return False
+
+
+class TestBatchHooks(unittest.TestCase):
+    def setUp(self) -> None:
+        with open(os.path.join(DATA_DIR, "test_data_events.json")) as f:
+            self.test_data_events = json.load(f)
+        self.rows = self.test_data_events["results"]
+        CALLS.clear()
+        return super().setUp()
+
+    def test_hooks_run_once_per_construction(self):
+        persons = TCBatchPerson.from_sparql_rows(self.rows)
+        self.assertEqual(sorted(CALLS), [("label", 14), ("suffix", 1)])
+        self.assertFalse(find_pending(persons))
+        self.assertEqual(persons[0].name, "tesla, nikola!")
+        self.assertEqual(persons[0].events[0].label, f"label of {persons[0].events[0].id}")
+        self.assertEqual(list(persons[0].dict()), ["id", "name", "events"])
+
+    def test_wrapper_model(self):
+        page = TCBatchPage(**self.test_data_events)
+        self.assertEqual(sorted(CALLS), [("label", 14), ("suffix", 1)])
+        self.assertFalse(find_pending(page))
+        self.assertEqual(page.results[0].name, "tesla, nikola!")
+
+    def test_explicit_scope(self):
+        with batch_construction():
+            first = TCBatchPerson(_results=self.rows)
+            second = TCBatchEvent.from_sparql_rows(self.rows)
+            self.assertIsInstance(first.__dict__["name"], PendingValue)
+        self.assertEqual(sorted(CALLS), [("label", 28), ("suffix", 1)])
+        self.assertEqual(first.name, "tesla, nikola!")
+        self.assertFalse(find_pending(second))
+
+    def test_per_instance_fallback(self):
+        persons = list(TCBatchEvent.from_sparql_rows(self.rows, lazy=True))
+        self.assertEqual(CALLS, [("label", 1)] * 14)
+        self.assertFalse(find_pending(persons))
+        CALLS.clear()
+        TCBatchPerson.from_sparql_rows(self.rows, fields="id,name")
+        self.assertEqual(CALLS, [("suffix", 1)])
+
+    def test_invalid_batch_results(self):
+        def invalid(field, values, datas):
+            return [None] * len(values)
+
+        def too_few(field, values, datas):
+            return values[1:]
+
+        class TCInvalidBatchEvent(RDFUtilsModelBaseClass):
+            id: str = Field(..., rdfconfig=FieldConfigurationRDF(anchor=True, path="event"))
+            label: str = Field(..., rdfconfig=FieldConfigurationRDF(path="eventLabel", batch_callback_function=invalid))
+
+        with self.assertRaises(ValidationError):
+            TCInvalidBatchEvent.from_sparql_rows(self.rows)
+
+        class TCShortBatchEvent(TCInvalidBatchEvent):
+            label: str = Field(..., rdfconfig=FieldConfigurationRDF(path="eventLabel", batch_callback_function=too_few))
+
+        with self.assertRaises(ValueError):
+            TCShortBatchEvent.from_sparql_rows(self.rows)
+
+    def test_failed_flush_is_not_cached(self):
+        results = {}
+
+        def labels(field, values, datas):
+            return [results.get(value, value) for value in values]
+
+        class TCCachedBatchEvent(RDFUtilsModelBaseClass):
+            id: str = Field(..., rdfconfig=FieldConfigurationRDF(anchor=True, path="event"))
+            label: str = Field(..., rdfconfig=FieldConfigurationRDF(path="eventLabel", batch_callback_function=labels))
+
+            class Config:
+                RDF_utils_cache_size = 100
+
+        self.addCleanup(clear_model_caches)
+        rows = [{"event": "e1", "eventLabel": "x"}]
+        results["x"] = None
+        with self.assertRaises(ValidationError):
+            TCCachedBatchEvent.from_sparql_rows(rows)
+        self.assertEqual(len(get_model_cache(TCCachedBatchEvent)), 0)
+        del results["x"]
+        event = TCCachedBatchEvent.from_sparql_rows(rows)[0]
+        self.assertEqual(event.dict(), {"id": "e1", "label": "x"})
+        self.assertEqual(len(get_model_cache(TCCachedBatchEvent)), 1)
+        self.assertIs(TCCachedBatchEvent.from_sparql_rows(rows)[0], event)
+        self.assertFalse(find_pending(event))
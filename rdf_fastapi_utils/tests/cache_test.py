@@ -0,0 +1,77 @@
+import json
+import os
+import time
+import unittest
+
+from pydantic import Field
+
+from rdf_fastapi_utils.cache import ModelCache, get_model_cache
+from rdf_fastapi_utils.models import FieldConfigurationRDF, RDFUtilsModelBaseClass
+
+DATA_DIR = os.path.dirname(__file__)
+
+
+class TCPersonCached(RDFUtilsModelBaseClass):
+    id: str = Field(..., rdfconfig=FieldConfigurationRDF(anchor=True, path="person"))
+    name: str = Field(..., rdfconfig=FieldConfigurationRDF(path="entityLabel"))
+    events: list["TCEventCached"] = None
+
+
+class TCEventCached(RDFUtilsModelBaseClass):
+    id: str = Field(..., rdfconfig=FieldConfigurationRDF(anchor=True, path="event"))
+    label: str = Field(..., rdfconfig=FieldConfigurationRDF(path="eventLabel"))
+
+    class Config:
+        RDF_utils_cache_size = 100
+
+
+TCPersonCached.update_forward_refs()
+
+
+class TestModelCache(unittest.TestCase):
+    def setUp(self) -> None:
+        with open(os.path.join(DATA_DIR, "test_data_events.json")) as f:
+            self.rows = json.load(f)["results"]
+        get_model_cache(TCEventCached).clear()
+        return super().setUp()
+
+    def test_lru_and_ttl(self):
+        cache = ModelCache(2, ttl=0.05)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.set("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.stats(), {"hits": 1, "misses": 1, "evictions": 1, "size": 2})
+        time.sleep(0.06)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["evictions"], 2)
+
+    def test_cached_instances_are_reused(self):
+        before = get_model_cache(TCEventCached).stats()
+        first = TCEventCached.from_sparql_rows(self.rows)
+        second = TCEventCached.from_sparql_rows(self.rows)
+        self.assertTrue(all(a is b for a, b in zip(first, second)))
+        stats = get_model_cache(TCEventCached).stats()
+        self.assertEqual(stats["hits"] - before["hits"], 14)
+        self.assertEqual(stats["misses"] - before["misses"], 14)
+        self.assertEqual(stats["size"], 14)
+
+    def test_changed_rows_are_not_reused(self):
+        first = TCEventCached.from_sparql_rows(self.rows)
+        rows = [dict(row) for row in self.rows]
+        for row in rows:
+            if row["event"] == first[0].id:
+                row["eventLabel"] = "changed"
+        second = TCEventCached.from_sparql_rows(rows)
+        self.assertIsNot(first[0], second[0])
+        self.assertEqual(second[0].label, "changed")
+        self.assertIs(first[1], second[1])
+
+    def test_nested_instances_are_cached(self):
+        hits = get_model_cache(TCEventCached).hits
+        person = TCPersonCached.from_sparql_rows(self.rows)[0]
+        person2 = TCPersonCached.from_sparql_rows(self.rows)[0]
+        self.assertEqual(person, person2)
+        self.assertEqual(get_model_cache(TCEventCached).hits - hits, 14)
+        self.assertIsNone(get_model_cache(TCPersonCached))
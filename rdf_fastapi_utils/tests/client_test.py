@@ -0,0 +1,144 @@
+import asyncio
+import json
+import os
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import httpx
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from rdf_fastapi_utils.client import SPARQLClient, close_sparql_clients, get_sparql_client, sparql_client_dependency
+from rdf_fastapi_utils.tests.baseclass_test import TCEventFull, TCPersonFull
+from rdf_fastapi_utils.tests.graph_test import EX, TCGraphPerson, rows_to_graph
+from rdf_fastapi_utils.tests.sparql_results_test import TCPersonEventKinds, to_sparql_json
+
+DATA_DIR = os.path.dirname(__file__)
+
+
+class StubSPARQLHandler(BaseHTTPRequestHandler):
+    """answers every query with the test data, fails with 503 as long as `failures` is > 0"""
+
+    result = None
+    graph = None
+    failures = 0
+    queries = []
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"])).decode()
+        StubSPARQLHandler.queries.append(parse_qs(body)["query"][0])
+        if StubSPARQLHandler.failures > 0:
+            StubSPARQLHandler.failures -= 1
+            self.send_response(503)
+            self.end_headers()
+            return
+        if self.headers["Accept"].startswith("text/turtle"):
+            payload, content_type = StubSPARQLHandler.graph.serialize(format="nt").encode(), "application/n-triples"
+        else:
+            payload, content_type = json.dumps(StubSPARQLHandler.result).encode(), "application/sparql-results+json"
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestSPARQLClient(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        with open(os.path.join(DATA_DIR, "test_data_events.json")) as f:
+            rows = json.load(f)["results"]
+        StubSPARQLHandler.result = to_sparql_json(rows)
+        StubSPARQLHandler.graph = rows_to_graph(rows)
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StubSPARQLHandler)
+        cls.endpoint = f"http://127.0.0.1:{cls.server.server_address[1]}/sparql"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self) -> None:
+        StubSPARQLHandler.failures = 0
+        StubSPARQLHandler.queries = []
+
+    def test_query_models(self):
+        async def run():
+            async with SPARQLClient(self.endpoint) as client:
+                return await client.query_models(TCPersonFull, "SELECT * WHERE {?s ?p ?o}")
+
+        res = asyncio.run(run())
+        self.assertEqual(len(res), 1)
+        self.assertEqual(len(res[0].events), 14)
+
+    def test_construct_models(self):
+        async def run():
+            async with SPARQLClient(self.endpoint) as client:
+                return await client.construct_models(TCGraphPerson, "CONSTRUCT {?s ?p ?o} WHERE {?s ?p ?o}", EX.Person)
+
+        res = asyncio.run(run())
+        self.assertEqual(len(res), 1)
+        self.assertEqual(len(res[0].events), 14)
+
+    def test_gather(self):
+        async def run():
+            async with SPARQLClient(self.endpoint, max_concurrency=1) as client:
+                return await client.gather("SELECT ?person", "SELECT ?event")
+
+        res = asyncio.run(run())
+        self.assertEqual(len(res), 2)
+        self.assertEqual(sorted(StubSPARQLHandler.queries), ["SELECT ?event", "SELECT ?person"])
+
+    def test_retry(self):
+        StubSPARQLHandler.failures = 2
+
+        async def run():
+            async with SPARQLClient(self.endpoint, retries=2, backoff=0.01) as client:
+                return await client.select("SELECT *")
+
+        self.assertEqual(len(asyncio.run(run())), len(StubSPARQLHandler.result["results"]["bindings"]))
+        StubSPARQLHandler.failures = 2
+
+        async def run_no_retry():
+            async with SPARQLClient(self.endpoint, retries=1, backoff=0.01) as client:
+                return await client.select("SELECT *")
+
+        with self.assertRaises(httpx.HTTPStatusError) as cm:
+            asyncio.run(run_no_retry())
+        self.assertEqual(cm.exception.response.status_code, 503)
+
+    def test_shared_clients_per_event_loop(self):
+        async def run():
+            client = get_sparql_client(self.endpoint)
+            self.assertIs(get_sparql_client(self.endpoint), client)
+            await client.select("SELECT *")
+            await close_sparql_clients()
+            return client
+
+        self.assertIsNot(asyncio.run(run()), asyncio.run(run()))
+
+    def test_query_models_keeps_unused_columns(self):
+        async def run():
+            async with SPARQLClient(self.endpoint) as client:
+                return await client.query_models(TCPersonEventKinds, "SELECT *")
+
+        self.assertEqual(len(asyncio.run(run())[0].events), 14)
+
+    def test_dependency(self):
+        app = FastAPI()
+
+        @app.get("/events")
+        async def events(client: SPARQLClient = Depends(sparql_client_dependency(self.endpoint))):
+            return await client.query_models(TCEventFull, "SELECT *")
+
+        with TestClient(app) as test_client:
+            res = test_client.get("/events")
+            test_client.portal.call(close_sparql_clients)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(res.json()), 14)
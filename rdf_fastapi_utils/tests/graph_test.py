@@ -0,0 +1,157 @@
+import datetime
+import json
+import os
+import unittest
+
+from pydantic import Field, ValidationError
+from rdflib import OWL, RDF, RDFS, XSD, Graph, Literal, Namespace, URIRef
+
+from rdf_fastapi_utils.graph import GraphIndex
+from rdf_fastapi_utils.models import FieldConfigurationRDF, RDFUtilsModelBaseClass
+from rdf_fastapi_utils.registry import check_model
+from rdf_fastapi_utils.tests.baseclass_test import DATA_DIR
+
+EX = Namespace("http://example.org/")
+
+
+class TCGraphPlace(RDFUtilsModelBaseClass):
+    id: str = Field(..., rdfconfig=FieldConfigurationRDF(anchor=True, path="evPlace"))
+    label: str | None = Field(None, rdfconfig=FieldConfigurationRDF(path="evPlaceLabel", predicate=RDFS.label))
+
+
+class TCGraphEvent(RDFUtilsModelBaseClass):
+    id: str = Field(..., rdfconfig=FieldConfigurationRDF(anchor=True, path="event"))
+    label: str = Field(..., rdfconfig=FieldConfigurationRDF(path="eventLabel", predicate=RDFS.label))
+    places: list[TCGraphPlace] = Field([], rdfconfig=FieldConfigurationRDF(predicate=EX.place))
+
+
+class TCGraphPerson(RDFUtilsModelBaseClass):
+    id: str = Field(..., rdfconfig=FieldConfigurationRDF(anchor=True, path="person"))
+    name: str = Field(..., rdfconfig=FieldConfigurationRDF(path="entityLabel", predicate=RDFS.label))
+    linked_ids: list[str] = Field([], rdfconfig=FieldConfigurationRDF(path="linkedIds", predicate=OWL.sameAs))
+    events: list[TCGraphEvent] = Field([], rdfconfig=FieldConfigurationRDF(predicate=EX.event))
+
+
+def upper(field, value, data):
+    return value.upper()
+
+
+class TCGraphTyped(RDFUtilsModelBaseClass):
+    id: str = Field(..., rdfconfig=FieldConfigurationRDF(anchor=True))
+    count: int = Field(None, rdfconfig=FieldConfigurationRDF(predicate=EX["count"]))
+    start: datetime.date = Field(None, rdfconfig=FieldConfigurationRDF(predicate=EX.start))
+    name: str = Field(None, rdfconfig=FieldConfigurationRDF(predicate=RDFS.label, callback_function=upper))
+    knows: list["TCGraphTyped"] = Field([], rdfconfig=FieldConfigurationRDF(predicate=EX.knows))
+
+
+TCGraphTyped.update_forward_refs()
+
+
+class TCGraphBirth(RDFUtilsModelBaseClass):
+    id: str = Field(..., rdfconfig=FieldConfigurationRDF(anchor=True))
+    label: str = Field(..., rdfconfig=FieldConfigurationRDF(predicate=RDFS.label))
+
+    class Config:
+        RDF_utils_rdf_type = EX.Birth
+
+
+class TCGraphDeath(TCGraphBirth):
+    place: TCGraphPlace | None = Field(None, rdfconfig=FieldConfigurationRDF(predicate=EX.place))
+
+    class Config:
+        RDF_utils_rdf_type = EX.Death
+
+
+class TCGraphLifeEvents(RDFUtilsModelBaseClass):
+    id: str = Field(..., rdfconfig=FieldConfigurationRDF(anchor=True))
+    events: list[TCGraphBirth | TCGraphDeath] = Field([], rdfconfig=FieldConfigurationRDF(predicate=EX.event))
+
+
+class TCGraphUntypedUnion(RDFUtilsModelBaseClass):
+    id: str = Field(..., rdfconfig=FieldConfigurationRDF(anchor=True))
+    events: list[TCGraphBirth | TCGraphEvent] = Field([], rdfconfig=FieldConfigurationRDF(predicate=EX.event))
+
+
+def rows_to_graph(rows: list) -> Graph:
+    graph = Graph()
+    for row in rows:
+        person, event = URIRef(row["person"]), URIRef(row["event"])
+        graph.add((person, RDF.type, EX.Person))
+        graph.add((person, RDFS.label, Literal(row["entityLabel"])))
+        graph.add((person, OWL.sameAs, Literal(row["linkedIds"])))
+        graph.add((person, EX.event, event))
+        graph.add((event, RDFS.label, Literal(row["eventLabel"])))
+        if "evPlace" in row:
+            graph.add((event, EX.place, URIRef(row["evPlace"])))
+        if "evPlaceLabel" in row:
+            graph.add((URIRef(row["evPlace"]), RDFS.label, Literal(row["evPlaceLabel"])))
+    return graph
+
+
+def normalized(person: TCGraphPerson) -> dict:
+    res = person.dict()
+    res["linked_ids"] = sorted(res["linked_ids"])
+    res["events"] = sorted(res["events"], key=lambda ev: ev["id"])
+    return res
+
+
+class TestGraphModels(unittest.TestCase):
+    def setUp(self) -> None:
+        with open(os.path.join(DATA_DIR, "test_data_events.json")) as f:
+            self.rows = json.load(f)["results"]
+        self.graph = rows_to_graph(self.rows)
+        return super().setUp()
+
+    def test_from_graph_matches_sparql_rows(self):
+        expected = TCGraphPerson.from_sparql_rows(self.rows)
+        res = TCGraphPerson.from_graph(self.graph, rdf_type=EX.Person)
+        self.assertEqual([normalized(p) for p in res], [normalized(p) for p in expected])
+        self.assertEqual(len(res[0].events), 14)
+        death = next(ev for ev in res[0].events if ev.id == self.rows[0]["event"])
+        self.assertEqual(death.places[0].label, "New York City")
+
+    def test_subjects(self):
+        index = GraphIndex(self.graph)
+        self.assertEqual([str(s) for s in index.subjects()], [self.rows[0]["person"]])
+        res = TCGraphEvent.from_graph(index, subjects=[self.rows[0]["event"]])
+        self.assertEqual([ev.id for ev in res], [self.rows[0]["event"]])
+        self.assertEqual(res[0].label, self.rows[0]["eventLabel"])
+
+    def test_literals_callbacks_and_cycles(self):
+        graph = Graph()
+        graph.add((EX.a, EX["count"], Literal(3)))
+        graph.add((EX.a, EX.start, Literal("1900-01-02", datatype=XSD.date)))
+        graph.add((EX.a, RDFS.label, Literal("a")))
+        graph.add((EX.a, EX.knows, EX.b))
+        graph.add((EX.b, EX.knows, EX.a))
+        res = TCGraphTyped.from_graph(graph, subjects=[EX.a])[0]
+        self.assertEqual((res.count, res.start, res.name), (3, datetime.date(1900, 1, 2), "A"))
+        self.assertEqual(res.knows[0].id, str(EX.b))
+        self.assertEqual(res.knows[0].knows, [])
+        with self.subTest("literals the field does not accept keep their lexical form"):
+            graph.add((EX.b, RDFS.label, Literal("1900-01-02", datatype=XSD.date)))
+            self.assertEqual(TCGraphTyped.from_graph(graph, subjects=[EX.b])[0].name, "1900-01-02")
+            graph.add((EX.b, EX["count"], Literal("many", datatype=XSD.integer)))
+            with self.assertRaises(ValidationError):
+                TCGraphTyped.from_graph(graph, subjects=[EX.b])
+
+    def test_union_members_by_rdf_type(self):
+        graph = Graph()
+        for event, rdf_type in ((EX.birth, EX.Birth), (EX.death, EX.Death), (EX.wedding, EX.Wedding)):
+            graph.add((EX.a, EX.event, event))
+            graph.add((event, RDF.type, rdf_type))
+            graph.add((event, RDFS.label, Literal(str(event))))
+        graph.add((EX.death, EX.place, EX.vienna))
+        res = TCGraphLifeEvents.from_graph(graph, subjects=[EX.a])[0]
+        self.assertEqual([type(ev) for ev in res.events], [TCGraphBirth, TCGraphDeath])
+        self.assertEqual(res.events[1].place.id, str(EX.vienna))
+        with self.subTest("members without rdf type are rejected"):
+            self.assertEqual(
+                check_model(TCGraphUntypedUnion),
+                [
+                    "field events: Union member TCGraphEvent has no RDF_utils_rdf_type, the field can not be built"
+                    " from a graph"
+                ],
+            )
+            with self.assertRaises(ValueError):
+                TCGraphUntypedUnion.from_graph(graph, subjects=[EX.a])
@@ -0,0 +1,93 @@
+import contextvars
+import json
+import os
+import threading
+import time
+import tracemalloc
+import unittest
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from rdf_fastapi_utils.instrumentation import STAGES, collect_timings, get_collector, stage
+from rdf_fastapi_utils.middleware import ServerTimingMiddleware
+from rdf_fastapi_utils.tests.baseclass_test import TCEventFull, TCPersonFull
+
+DATA_DIR = os.path.dirname(__file__)
+
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self) -> None:
+        with open(os.path.join(DATA_DIR, "test_data_events.json")) as f:
+            self.rows = json.load(f)["results"]
+        return super().setUp()
+
+    def test_disabled_by_default(self):
+        self.assertIsNone(get_collector())
+        TCPersonFull.from_sparql_rows(self.rows)
+
+    def test_collect_timings(self):
+        recorded = []
+        with collect_timings(on_stage=lambda *args: recorded.append(args)) as collector:
+            TCPersonFull.from_sparql_rows(self.rows)
+        self.assertIsNone(get_collector())
+        self.assertEqual(collector.stats[("TCEventFull", "validation")][0], 14)
+        self.assertEqual(collector.stats[("TCPersonFull", "map_fields_data")][0], 1)
+        self.assertEqual(set(collector.totals()), set(STAGES) - {"serialization"})
+        self.assertEqual(len(recorded), sum(count for count, _ in collector.stats.values()))
+        self.assertTrue(all(duration >= 0 for _, _, duration in recorded))
+        self.assertEqual({model for model, _ in collector.slowest_models()}, {"TCPersonFull", "TCEventFull"})
+
+    def test_shared_by_threads(self):
+        entered, done = threading.Event(), threading.Event()
+
+        def outer():
+            with stage(TCPersonFull, "map_fields_data"):
+                entered.set()
+                done.wait()
+
+        def inner():
+            entered.wait()
+            with stage(TCEventFull, "validation"):
+                time.sleep(0.02)
+            done.set()
+
+        with collect_timings() as collector:
+            ctx = contextvars.copy_context()
+            threads = [threading.Thread(target=ctx.copy().run, args=(target,)) for target in (outer, inner)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        # the stage of the other thread is no child of the outer stage
+        self.assertGreaterEqual(
+            collector.stats[("TCPersonFull", "map_fields_data")][1], collector.stats[("TCEventFull", "validation")][1]
+        )
+
+    def test_collect_memory(self):
+        self.assertFalse(tracemalloc.is_tracing())
+        with collect_timings(memory=True) as collector:
+            persons = TCPersonFull.from_sparql_rows(self.rows)
+        self.assertFalse(tracemalloc.is_tracing())
+        self.assertEqual(set(collector.memory_stats), set(collector.stats))
+        self.assertGreater(collector.memory_totals()["validation"], 0)
+        self.assertEqual(len(persons[0].events), 14)
+        with collect_timings() as collector:
+            TCPersonFull.from_sparql_rows(self.rows)
+        self.assertEqual(collector.memory_totals(), {})
+
+    def test_server_timing_middleware(self):
+        app = FastAPI()
+        app.add_middleware(ServerTimingMiddleware, log_slowest=2)
+
+        @app.get("/events")
+        def events():
+            return TCEventFull.from_sparql_rows(self.rows)
+
+        with self.assertLogs("rdf_fastapi_utils", level="INFO") as logs:
+            res = TestClient(app).get("/events")
+        self.assertEqual(len(res.json()), 14)
+        header = res.headers["server-timing"]
+        self.assertIn("validation;dur=", header)
+        self.assertIn("total;dur=", header)
+        self.assertIn("TCEventFull", logs.output[0])
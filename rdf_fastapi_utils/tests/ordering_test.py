@@ -0,0 +1,88 @@
+import datetime
+import json
+import os
+import unittest
+
+from pydantic import Field
+
+from rdf_fastapi_utils.models import FieldConfigurationRDF, RDFUtilsModelBaseClass, SortConfigurationRDF
+from rdf_fastapi_utils.ordering import reorder_by_first_seen, sort_values
+from rdf_fastapi_utils.serializer import jsonable, serialize_entity
+from rdf_fastapi_utils.tests.baseclass_test import DATA_DIR
+
+
+class TCSortedEvent(RDFUtilsModelBaseClass):
+    id: str = Field(..., rdfconfig=FieldConfigurationRDF(anchor=True, path="event"))
+    label: str = Field(..., rdfconfig=FieldConfigurationRDF(path="eventLabel"))
+    end: datetime.datetime | None = Field(None, rdfconfig=FieldConfigurationRDF(path="end"))
+
+
+class TCSortedPerson(RDFUtilsModelBaseClass):
+    id: str = Field(..., rdfconfig=FieldConfigurationRDF(anchor=True, path="person"))
+    linked_ids: list[str] = Field(
+        [], rdfconfig=FieldConfigurationRDF(path="linkedIds", sort=SortConfigurationRDF(descending=True))
+    )
+    events: list[TCSortedEvent] = Field(
+        [], rdfconfig=FieldConfigurationRDF(sort=SortConfigurationRDF(key="end", nulls_last=False))
+    )
+
+
+class TCSortedPersonById(RDFUtilsModelBaseClass):
+    id: str = Field(..., rdfconfig=FieldConfigurationRDF(anchor=True, path="person"))
+    events: list[TCSortedEvent] = Field(
+        [], rdfconfig=FieldConfigurationRDF(sort=SortConfigurationRDF(key="id", descending=True))
+    )
+
+
+class TestOrdering(unittest.TestCase):
+    def setUp(self) -> None:
+        with open(os.path.join(DATA_DIR, "test_data_events.json")) as f:
+            self.rows = json.load(f)["results"]
+        return super().setUp()
+
+    def test_sort_values(self):
+        values = [{"a": 2}, {"a": None}, {"a": 1}, {}, {"a": 2, "b": 1}]
+        self.assertEqual(sort_values(values, "a"), [{"a": 1}, {"a": 2}, {"a": 2, "b": 1}, {"a": None}, {}])
+        self.assertEqual(
+            sort_values(values, "a", descending=True, nulls_last=False),
+            [{"a": None}, {}, {"a": 2}, {"a": 2, "b": 1}, {"a": 1}],
+        )
+        self.assertEqual(sort_values(["b", "c", "a"]), ["a", "b", "c"])
+        nested = [{"place": {"label": "b"}}, {"place": None}, {"place": {"label": "a"}}]
+        self.assertEqual(sort_values(nested, "place.label"), [nested[2], nested[0], nested[1]])
+
+    def test_sort_mixed_types(self):
+        mixed = ["x", 2, 1.5, "b", datetime.date(2020, 1, 1), True]
+        self.assertEqual(sort_values(mixed), [True, 1.5, 2, datetime.date(2020, 1, 1), "b", "x"])
+        self.assertEqual(sort_values(mixed, descending=True), ["x", "b", datetime.date(2020, 1, 1), 2, 1.5, True])
+        incomparable = [{"a": {"x": 1}}, {"a": None}, {"a": {"y": 1}}]
+        self.assertEqual(sort_values(incomparable, "a"), [incomparable[0], incomparable[2], incomparable[1]])
+
+    def test_sorted_fields(self):
+        person = TCSortedPerson.from_sparql_rows(self.rows)[0]
+        self.assertEqual(person.linked_ids, sorted(person.linked_ids, reverse=True))
+        ends = [ev.end for ev in person.events]
+        nulls = ends.count(None)
+        self.assertEqual(ends[nulls:], sorted(ends[nulls:]))
+        self.assertEqual(len(person.events), 14)
+        by_id = TCSortedPersonById.from_sparql_rows(self.rows)[0]
+        ids = [ev.id for ev in by_id.events]
+        self.assertEqual(ids, sorted(ids, reverse=True))
+        with self.subTest("order of the rows does not matter"):
+            self.assertEqual(TCSortedPersonById.from_sparql_rows(self.rows[::-1])[0], by_id)
+
+    def test_direct_serialization(self):
+        data = {"_results": self.rows[::-1]}
+        self.assertEqual(serialize_entity(TCSortedPerson, data), jsonable(TCSortedPerson(**data)))
+
+    def test_reorder_by_first_seen(self):
+        items = [{"k": "b", "n": 1}, {"k": "a", "n": 2}, {"k": "c", "n": 3}, {"k": "b", "n": 4}]
+        self.assertEqual(
+            [item["n"] for item in reorder_by_first_seen(items, dict.fromkeys(["a", "b"]), "k")],
+            [2, 1, 4],
+        )
+        items = [{"k": ["b"], "n": 1}, {"k": ["a"], "n": 2}, {"k": ["b"], "n": 3}]
+        self.assertEqual(
+            [item["n"] for item in reorder_by_first_seen(items, [["a"], ["b"], ["a"]], "k")],
+            [2, 1, 3],
+        )
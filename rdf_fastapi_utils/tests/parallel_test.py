@@ -0,0 +1,138 @@
+import json
+import os
+import unittest
+import warnings
+
+from pydantic import Field, ValidationError
+
+from rdf_fastapi_utils.models import FieldConfigurationRDF, RDFUtilsModelBaseClass
+from rdf_fastapi_utils.parallel import (
+    ParallelFallbackWarning,
+    ParallelSettings,
+    build_parallel,
+    get_parallel_settings,
+    parallel_construction,
+    shutdown_pools,
+)
+from rdf_fastapi_utils.tests.baseclass_test import DATA_DIR, TCPersonFull
+
+
+class TCLevel3(RDFUtilsModelBaseClass):
+    id: str = Field(..., rdfconfig=FieldConfigurationRDF(anchor=True, path="l3"))
+    label: str = Field(..., rdfconfig=FieldConfigurationRDF(path="l3Label"))
+
+
+class TCLevel2(RDFUtilsModelBaseClass):
+    id: str = Field(..., rdfconfig=FieldConfigurationRDF(anchor=True, path="l2"))
+    label: str = Field(..., rdfconfig=FieldConfigurationRDF(path="l2Label"))
+    children: list[TCLevel3] = None
+
+
+class TCLevel1(RDFUtilsModelBaseClass):
+    id: str = Field(..., rdfconfig=FieldConfigurationRDF(anchor=True, path="l1"))
+    label: str = Field(..., rdfconfig=FieldConfigurationRDF(path="l1Label"))
+    children: list[TCLevel2] = None
+
+
+class TCLevel0(RDFUtilsModelBaseClass):
+    id: str = Field(..., rdfconfig=FieldConfigurationRDF(anchor=True, path="l0"))
+    label: str = Field(..., rdfconfig=FieldConfigurationRDF(path="l0Label"))
+    children: list[TCLevel1] = None
+
+
+def generate_rows(anchors: int, fan_out: int, depth: int, rows_per_leaf: int = 2) -> list[dict]:
+    """returns flat rows for the TCLevel models: `anchors` top level entities, `fan_out` children per entity down to
+    level `depth` and `rows_per_leaf` rows per leaf differing in an extra column"""
+    rows = []
+
+    def walk(level: int, prefix: dict, uri: str) -> None:
+        if level > depth:
+            rows.extend({**prefix, "extra": f"{uri}/extra/{variant}"} for variant in range(rows_per_leaf))
+            return
+        for idx in range(fan_out if level > 0 else anchors):
+            child = f"{uri}/l{level}/{idx}"
+            walk(level + 1, {**prefix, f"l{level}": child, f"l{level}Label": f"Label of {child}"}, child)
+
+    walk(0, {}, "http://example.org/entity")
+    return rows
+
+
+def level0_callback(field, data):
+    return [(TCLevel0, data)]
+
+
+class TCParallelPaginatedResponse(RDFUtilsModelBaseClass):
+    count: int = Field(..., rdfconfig=FieldConfigurationRDF(path="count"))
+    results: list[TCLevel0] = Field(
+        ..., rdfconfig=FieldConfigurationRDF(path="results", serialization_class_callback=level0_callback)
+    )
+
+    class Config:
+        RDF_utils_parallel = "thread"
+        RDF_utils_parallel_threshold = 1
+        RDF_utils_parallel_workers = 2
+
+
+class TestParallelConstruction(unittest.TestCase):
+    def setUp(self) -> None:
+        with open(os.path.join(DATA_DIR, "test_data.json")) as f:
+            self.test_data = json.load(f)
+        self.model = TCLevel0
+        self.rows = generate_rows(anchors=40, fan_out=3, depth=1)
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        shutdown_pools()
+        return super().tearDown()
+
+    def test_settings(self):
+        self.assertIsNone(get_parallel_settings(TCPersonFull).mode)
+        settings = get_parallel_settings(TCParallelPaginatedResponse)
+        self.assertEqual((settings.mode, settings.threshold, settings.workers), ("thread", 1, 2))
+        with parallel_construction("process", threshold=10):
+            self.assertEqual(get_parallel_settings(TCParallelPaginatedResponse).mode, "process")
+        with self.assertRaises(ValueError):
+            with parallel_construction("fork"):
+                pass
+
+    def test_below_threshold_is_serial(self):
+        settings = ParallelSettings(mode="thread", threshold=100)
+        self.assertIsNone(build_parallel(lambda model, ent: ent, dict, list(range(99)), settings))
+        self.assertEqual(build_parallel(lambda model, ent: ent, dict, list(range(100)), settings), list(range(100)))
+
+    def test_from_sparql_rows_keeps_order(self):
+        expected = self.model.from_sparql_rows(self.rows)
+        for mode in ("process", "thread"):
+            with parallel_construction(mode, threshold=2, workers=2), warnings.catch_warnings():
+                # the workers are started with forkserver/spawn, they have to find the generated models on their own
+                warnings.simplefilter("error", ParallelFallbackWarning)
+                self.assertEqual(self.model.from_sparql_rows(self.rows), expected)
+                self.assertEqual(self.model.from_sparql_rows(self.rows, trusted=True), expected)
+
+    def test_paginated_response(self):
+        data = {"count": len(self.rows), "results": self.rows}
+        with parallel_construction(None):
+            expected = TCParallelPaginatedResponse(**data)
+        self.assertEqual(len(expected.results), 40)
+        self.assertEqual(TCParallelPaginatedResponse(**data), expected)
+        with parallel_construction("process", threshold=2, workers=2):
+            self.assertEqual(TCParallelPaginatedResponse(**data), expected)
+
+    def test_errors_are_raised(self):
+        rows = [{**row, "l0Label": None} if idx == 5 else row for idx, row in enumerate(self.rows)]
+        with parallel_construction("process", threshold=2, workers=2):
+            with self.assertRaises(ValidationError):
+                self.model.from_sparql_rows(rows)
+
+    def test_unpicklable_model_falls_back_to_serial(self):
+        class TCLocalPerson(RDFUtilsModelBaseClass):
+            id: str = Field(..., rdfconfig=FieldConfigurationRDF(anchor=True, path="person"))
+
+        rows = self.test_data["results"]
+        expected = TCLocalPerson.from_sparql_rows(rows)
+        with parallel_construction("process", threshold=2, workers=2):
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter("always")
+                res = TCLocalPerson.from_sparql_rows(rows)
+        self.assertEqual(res, expected)
+        self.assertTrue(any(issubclass(w.category, ParallelFallbackWarning) for w in caught))
@@ -0,0 +1,80 @@
+import json
+import os
+import unittest
+import warnings
+
+from rdf_fastapi_utils.plan import get_model_tree_variables
+from rdf_fastapi_utils.query import (
+    UnusedVariablesWarning,
+    build_select_query,
+    clear_unused_variables_warnings,
+    find_unused_variables,
+    get_anchor_variables,
+    get_projection,
+)
+from rdf_fastapi_utils.tests.baseclass_test import DATA_DIR, TCPaginatedResponse, TCPersonFull
+from rdf_fastapi_utils.tests.graph_test import TCGraphTyped
+from rdf_fastapi_utils.tests.sparql_results_test import to_sparql_json
+
+
+class TCWarnedPerson(TCPersonFull):
+    class Config:
+        RDF_utils_warn_unused_variables = True
+
+
+class TestQuery(unittest.TestCase):
+    def setUp(self) -> None:
+        with open(os.path.join(DATA_DIR, "test_data_events.json")) as f:
+            self.rows = json.load(f)["results"]
+        clear_unused_variables_warnings()
+        return super().setUp()
+
+    def test_projection(self):
+        self.assertEqual(get_projection(TCPersonFull), ["person", "entityLabel", "event", "eventLabel"])
+        self.assertEqual(get_projection(TCPaginatedResponse), ["count", "person", "entityLabel", "event", "eventLabel"])
+        for model in (TCPersonFull, TCPaginatedResponse, TCGraphTyped):
+            self.assertEqual(get_model_tree_variables(model), frozenset(get_projection(model)))
+        self.assertEqual(get_anchor_variables(TCPersonFull), ["person", "event"])
+
+    def test_build_select_query(self):
+        query = build_select_query(
+            TCPersonFull,
+            "?person a crm:E21_Person .\n?person rdfs:label ?entityLabel .",
+            prefixes={"crm": "http://www.cidoc-crm.org/cidoc-crm/"},
+            limit=10,
+        )
+        self.assertEqual(
+            query.splitlines(),
+            [
+                "PREFIX crm: <http://www.cidoc-crm.org/cidoc-crm/>",
+                "SELECT DISTINCT ?person ?entityLabel ?event ?eventLabel",
+                "WHERE {",
+                "  ?person a crm:E21_Person .",
+                "  ?person rdfs:label ?entityLabel .",
+                "}",
+                "ORDER BY ?person ?event",
+                "LIMIT 10",
+            ],
+        )
+
+    def test_unused_variables(self):
+        self.assertIn("linkedIds", find_unused_variables(TCPersonFull, self.rows[0].keys()))
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            # opt-in
+            TCPersonFull.from_sparql_rows(self.rows)
+        with self.assertWarns(UnusedVariablesWarning):
+            TCWarnedPerson.from_sparql_rows(to_sparql_json(self.rows))
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            # warned only once per model
+            TCWarnedPerson.from_sparql_rows(self.rows)
+        clear_unused_variables_warnings()
+        with self.assertWarns(UnusedVariablesWarning):
+            TCWarnedPerson.from_sparql_rows(self.rows)
+        clear_unused_variables_warnings()
+        projected = [{k: v for k, v in row.items() if k in get_projection(TCPersonFull)} for row in self.rows]
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            persons = TCWarnedPerson.from_sparql_rows(projected)
+        self.assertEqual(persons, TCPersonFull.from_sparql_rows(self.rows))
@@ -0,0 +1,111 @@
+import unittest
+
+from pydantic import Field
+
+from rdf_fastapi_utils.models import FieldConfigurationRDF, RDFUtilsModelBaseClass, SortConfigurationRDF
+from rdf_fastapi_utils.plan import clear_model_plans, compile_model_plan, get_model_plan
+from rdf_fastapi_utils.registry import (
+    RDFConfigurationError,
+    check_model,
+    iter_models,
+    model_name,
+    resolve_forward_refs,
+    warm_up,
+)
+
+
+class TCRegistryPerson(RDFUtilsModelBaseClass):
+    id: str = Field(..., rdfconfig=FieldConfigurationRDF(anchor=True, path="person"))
+    name: str = Field(..., rdfconfig=FieldConfigurationRDF(path="entityLabel"))
+    events: list["TCRegistryEvent"] = Field([], rdfconfig=FieldConfigurationRDF(sort=SortConfigurationRDF(key="id")))
+
+
+class TCRegistryEvent(RDFUtilsModelBaseClass):
+    id: str = Field(..., rdfconfig=FieldConfigurationRDF(anchor=True, path="event"))
+    label: str = Field(..., rdfconfig=FieldConfigurationRDF(path="eventLabel"))
+
+
+class TCRegistryBirth(TCRegistryEvent):
+    pass
+
+
+MODELS = [TCRegistryPerson, TCRegistryEvent, TCRegistryBirth]
+
+
+class TestRegistry(unittest.TestCase):
+    def test_iter_models(self):
+        models = iter_models()
+        for model in MODELS:
+            self.assertIn(model, models)
+        self.assertLess(models.index(TCRegistryEvent), models.index(TCRegistryBirth))
+
+    def test_resolve_forward_refs(self):
+        class TCLocalPerson(RDFUtilsModelBaseClass):
+            id: str = Field(..., rdfconfig=FieldConfigurationRDF(anchor=True, path="person"))
+            events: list["TCLocalEvent"] = Field(
+                [], rdfconfig=FieldConfigurationRDF(sort=SortConfigurationRDF(key="id"))
+            )
+
+        class TCLocalEvent(RDFUtilsModelBaseClass):
+            id: str = Field(..., rdfconfig=FieldConfigurationRDF(anchor=True, path="event"))
+
+        self.assertEqual(check_model(TCLocalPerson), ["unresolved forward reference TCLocalEvent"])
+        resolve_forward_refs([TCLocalPerson, TCLocalEvent])
+        self.assertEqual(check_model(TCLocalPerson), [])
+        rows = [{"person": "p1", "event": f"e{idx}"} for idx in (2, 1)]
+        self.assertEqual([ev.id for ev in TCLocalPerson.from_sparql_rows(rows)[0].events], ["e1", "e2"])
+
+    def test_invalid_models(self):
+        class TCNoAnchor(RDFUtilsModelBaseClass):
+            label: str = Field(..., rdfconfig=FieldConfigurationRDF(path="eventLabel"))
+
+        class TCInvalid(RDFUtilsModelBaseClass):
+            id: str = Field(..., rdfconfig=FieldConfigurationRDF(anchor=True, path="person"))
+            other_id: str = Field(..., rdfconfig=FieldConfigurationRDF(anchor=True, path="person2"))
+            name: str = Field(..., rdfconfig=FieldConfigurationRDF(path="entityLabel", sort=SortConfigurationRDF()))
+            labels: list[TCNoAnchor] = []
+            events: list[TCRegistryEvent] = Field([], rdfconfig=FieldConfigurationRDF(path="event"))
+            births: list[TCRegistryBirth] = Field(
+                [], rdfconfig=FieldConfigurationRDF(sort=SortConfigurationRDF(key="x"))
+            )
+
+        self.assertEqual(
+            check_model(TCInvalid),
+            [
+                "several anchor fields: id, other_id",
+                "field name: sort needs a list field",
+                "field labels: nested model TCNoAnchor has no anchor field",
+                "field events: path event is a variable of the nested model TCRegistryEvent, nested models are grouped"
+                " from the remaining variables (remove the path)",
+                "field births: sort key x is no field of the nested model",
+            ],
+        )
+        with self.assertRaises(RDFConfigurationError) as cm:
+            warm_up([*MODELS, TCInvalid])
+        self.assertEqual(list(cm.exception.problems), [TCInvalid])
+        self.assertIn("TCInvalid: several anchor fields", str(cm.exception))
+
+    def test_ambiguous_forward_refs(self):
+        def define_event():
+            class TCLocalEvent(RDFUtilsModelBaseClass):
+                id: str = Field(..., rdfconfig=FieldConfigurationRDF(anchor=True, path="event"))
+
+            return TCLocalEvent
+
+        class TCLocalPerson(RDFUtilsModelBaseClass):
+            id: str = Field(..., rdfconfig=FieldConfigurationRDF(anchor=True, path="person"))
+            events: list["TCLocalEvent"] = []
+
+        other, TCLocalEvent = define_event(), define_event()
+        with self.assertRaises(RDFConfigurationError) as cm:
+            resolve_forward_refs([TCLocalPerson, other, TCLocalEvent])
+        self.assertEqual(list(cm.exception.problems), [TCLocalPerson])
+        self.assertIn("TCLocalEvent is the name of several models", str(cm.exception))
+        resolve_forward_refs([TCLocalPerson, other, TCLocalEvent], TCLocalEvent=TCLocalEvent)
+        self.assertIs(TCLocalPerson.__fields__["events"].type_, TCLocalEvent)
+
+    def test_warm_up(self):
+        clear_model_plans()
+        timings = warm_up(MODELS)
+        self.assertEqual(list(timings), [model_name(model) for model in MODELS])
+        self.assertEqual({model: get_model_plan(model) for model in MODELS}, {m: compile_model_plan(m) for m in MODELS})
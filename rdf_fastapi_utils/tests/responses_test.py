@@ -0,0 +1,48 @@
+import json
+import os
+import unittest
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from rdf_fastapi_utils.responses import streaming_model_response
+from rdf_fastapi_utils.tests.baseclass_test import TCEventFull
+
+DATA_DIR = os.path.dirname(__file__)
+
+
+class TestStreaming(unittest.TestCase):
+    def setUp(self) -> None:
+        with open(os.path.join(DATA_DIR, "test_data_events.json")) as f:
+            self.rows = json.load(f)["results"]
+        return super().setUp()
+
+    def test_stream_sparql_rows_is_incremental(self):
+        consumed = []
+
+        def rows():
+            for row in self.rows:
+                consumed.append(row)
+                yield row
+
+        stream = TCEventFull.stream_sparql_rows(rows())
+        first = next(stream)
+        self.assertEqual(first.id, self.rows[0]["event"])
+        self.assertLess(len(consumed), len(self.rows))
+        self.assertEqual([first] + list(stream), TCEventFull.from_sparql_rows(self.rows))
+
+    def test_streaming_response(self):
+        app = FastAPI()
+
+        @app.get("/events")
+        def events(format: str = "ndjson"):
+            return streaming_model_response(TCEventFull.stream_sparql_rows(iter(self.rows)), format=format)
+
+        client = TestClient(app)
+        res = client.get("/events")
+        self.assertEqual(res.headers["content-type"], "application/x-ndjson")
+        lines = res.text.splitlines()
+        self.assertEqual(len(lines), 14)
+        self.assertEqual(json.loads(lines[0])["id"], self.rows[0]["event"])
+        res = client.get("/events", params={"format": "json"})
+        self.assertEqual(len(res.json()), 14)
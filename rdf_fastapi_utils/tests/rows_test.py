@@ -0,0 +1,108 @@
+import json
+import os
+import unittest
+
+from rdf_fastapi_utils.models import RDFUtilsModelBaseClass
+from rdf_fastapi_utils.rows import InternedRow, InternedRows, intern_rows
+from rdf_fastapi_utils.tests.baseclass_test import DATA_DIR, TCPaginatedResponse, TCPersonFull
+from rdf_fastapi_utils.tests.sparql_results_test import to_sparql_json
+
+
+class TCInternedPerson(TCPersonFull):
+    class Config:
+        RDF_utils_intern_rows = True
+
+
+def plain(res: list) -> list:
+    return [{k: [dict(row) for row in v] if k == "_additional_values" else v for k, v in ent.items()} for ent in res]
+
+
+class TestInternedRows(unittest.TestCase):
+    def setUp(self) -> None:
+        with open(os.path.join(DATA_DIR, "test_data_events.json")) as f:
+            self.test_data_events = json.load(f)
+        self.rows = self.test_data_events["results"]
+        return super().setUp()
+
+    def test_intern_rows(self):
+        interned = intern_rows(self.rows)
+        self.assertEqual(len(interned), len(self.rows))
+        self.assertEqual(interned.decode(), self.rows)
+        self.assertIsInstance(interned[0], InternedRow)
+        self.assertLess(len(interned.values), sum(len(row) for row in self.rows))
+        self.assertTrue(all(len(ids) == len(interned.columns) for ids in interned.rows))
+
+    def test_intern_rows_keeps_types_apart(self):
+        interned = intern_rows([{"a": 1, "b": True, "c": 1.0}, {"a": 1, "c": "1"}])
+        self.assertEqual(interned.decode(), [{"a": 1, "b": True, "c": 1.0}, {"a": 1, "c": "1"}])
+        self.assertIs(type(interned[0]["b"]), bool)
+        self.assertNotIn("b", interned[1])
+        self.assertEqual(len(interned.values), 4)
+        self.assertTrue(interned.has_equal_values)
+        self.assertFalse(intern_rows(self.rows).has_equal_values)
+
+    def test_intern_sparql_json(self):
+        interned = intern_rows(to_sparql_json(self.rows), variables={"person", "event"})
+        self.assertEqual(interned.columns, ("person", "event"))
+        self.assertEqual(interned.decode(), [{"person": r["person"], "event": r["event"]} for r in self.rows])
+
+    def test_filter_sparql_matches_plain_rows(self):
+        interned = intern_rows(self.rows)
+        cases = [
+            (["person", "entityLabel"], "person"),
+            (["event", "eventLabel", "start"], "event"),
+            (["evPlace", "evPlaceLabel"], "evPlace"),
+            (None, "person"),
+        ]
+        for list_of_keys, anchor in cases:
+            res = RDFUtilsModelBaseClass().filter_sparql(interned, anchor=anchor, list_of_keys=list_of_keys)
+            expected = RDFUtilsModelBaseClass().filter_sparql(self.rows, anchor=anchor, list_of_keys=list_of_keys)
+            self.assertEqual(plain(res), plain(expected))
+
+    def test_filter_sparql_edge_cases(self):
+        with self.subTest("empty rows"):
+            self.assertEqual(RDFUtilsModelBaseClass().filter_sparql(intern_rows([]), anchor="a"), [])
+            self.assertEqual(RDFUtilsModelBaseClass().filter_sparql([], anchor="a"), [])
+        with self.subTest("equal values of different types"):
+            rows = [
+                {"a": 1, "b": True, "c": "x"},
+                {"a": True, "b": 1.0, "c": "y"},
+                {"a": 1.0, "b": 1, "c": "x"},
+                {"a": 2, "b": 1, "c": "x"},
+            ]
+            res = RDFUtilsModelBaseClass().filter_sparql(intern_rows(rows), anchor="a", list_of_keys=["a", "b"])
+            self.assertEqual(
+                plain(res), RDFUtilsModelBaseClass().filter_sparql(rows, anchor="a", list_of_keys=["a", "b"])
+            )
+            self.assertEqual(len(res), 2)
+            self.assertIs(type(res[0]["b"]), bool)
+
+    def test_additional_values_share_the_tables(self):
+        interned = intern_rows(self.rows)
+        res = RDFUtilsModelBaseClass().filter_sparql(interned, anchor="person", list_of_keys=["person", "entityLabel"])
+        add_vals = res[0]["_additional_values"]
+        self.assertIsInstance(add_vals, InternedRows)
+        self.assertIs(add_vals.values, interned.values)
+        self.assertNotIn("entityLabel", add_vals[0])
+        res2 = RDFUtilsModelBaseClass().filter_sparql(add_vals, anchor="event", list_of_keys=["event", "eventLabel"])
+        self.assertEqual(len(res2), 14)
+        self.assertNotIn("eventLabel", res2[0]["_additional_values"][0])
+
+    def test_unhashable_values(self):
+        rows = [{"a": "x", "b": ["1", "2"]}, {"a": "x", "b": ["3"]}]
+        interned = intern_rows(rows)
+        self.assertTrue(interned.has_unhashable)
+        self.assertEqual(
+            RDFUtilsModelBaseClass().filter_sparql(interned, anchor="a", list_of_keys=["a", "b"]),
+            RDFUtilsModelBaseClass().filter_sparql(rows, anchor="a", list_of_keys=["a", "b"]),
+        )
+
+    def test_models_from_interned_rows(self):
+        expected = TCPersonFull.from_sparql_rows(self.rows)
+        self.assertEqual(TCPersonFull.from_sparql_rows(intern_rows(self.rows)), expected)
+        self.assertEqual(TCInternedPerson.from_sparql_rows(to_sparql_json(self.rows)), expected)
+        self.assertEqual(TCInternedPerson(_results=to_sparql_json(self.rows)), expected[0])
+        self.assertEqual(
+            TCPaginatedResponse(**{**self.test_data_events, "results": intern_rows(self.rows)}),
+            TCPaginatedResponse(**self.test_data_events),
+        )
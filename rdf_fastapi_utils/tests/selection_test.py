@@ -0,0 +1,115 @@
+import json
+import os
+import unittest
+from copy import deepcopy
+
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from pydantic import Field, root_validator
+
+from rdf_fastapi_utils.dependencies import field_selection_dependency
+from rdf_fastapi_utils.instrumentation import collect_timings
+from rdf_fastapi_utils.models import FieldConfigurationRDF, RDFUtilsModelBaseClass
+from rdf_fastapi_utils.responses import direct_model_response
+from rdf_fastapi_utils.selection import parse_field_selection, resolve_field_selection
+from rdf_fastapi_utils.serializer import serialize_sparql_rows
+from rdf_fastapi_utils.tests.baseclass_test import (
+    DATA_DIR,
+    TCEventFull,
+    TCPaginatedResponse,
+    TCPersonFull,
+    TCPersonWithErrorField,
+)
+from rdf_fastapi_utils.tests.trusted_test import TCTrustedPerson
+
+
+class TCRootValidatedPerson(RDFUtilsModelBaseClass):
+    id: str = Field(..., rdfconfig=FieldConfigurationRDF(anchor=True, path="person"))
+    name: str = Field(..., rdfconfig=FieldConfigurationRDF(path="entityLabel"))
+    events: list[TCEventFull] = []
+
+    @root_validator(skip_on_failure=True)
+    def upper_name(cls, values):
+        if values["name"] is not None:
+            values["name"] = values["name"].upper()
+        return values
+
+
+class TestFieldSelection(unittest.TestCase):
+    def setUp(self) -> None:
+        with open(os.path.join(DATA_DIR, "test_data_events.json")) as f:
+            self.test_data_events = json.load(f)
+        self.rows = self.test_data_events["results"]
+        return super().setUp()
+
+    def test_parse(self):
+        self.assertEqual(
+            parse_field_selection(" id,name,events.label,events.id"),
+            {"id": None, "name": None, "events": {"label": None, "id": None}},
+        )
+        self.assertEqual(parse_field_selection("events,events.label"), {"events": None})
+        self.assertEqual(parse_field_selection("events.label,events"), {"events": None})
+        self.assertIsNone(parse_field_selection(""))
+        self.assertEqual(
+            resolve_field_selection(TCPaginatedResponse, parse_field_selection("results.events.label")),
+            {"results": {"events": {"label": None}}},
+        )
+        with self.assertRaises(ValueError):
+            resolve_field_selection(TCPersonFull, parse_field_selection("id,unknown"))
+        with self.assertRaises(ValueError):
+            resolve_field_selection(TCPersonFull, parse_field_selection("name.label"))
+
+    def test_sparse_instances(self):
+        persons = TCPersonFull.from_sparql_rows(self.rows, fields="id,events.label")
+        full = TCPersonFull.from_sparql_rows(self.rows)
+        self.assertEqual(
+            persons[0].dict(), {"id": full[0].id, "events": [{"label": ev.label} for ev in full[0].events]}
+        )
+        self.assertIsNone(persons[0].name)
+        self.assertEqual(persons[0].events[0].id, None)
+        with self.assertRaises(AttributeError):
+            persons[0].unknown
+        page = TCPaginatedResponse(**self.test_data_events, _fields="count,results.name")
+        self.assertEqual(json.loads(page.json()), {"count": 1, "results": [{"name": full[0].name}]})
+
+    def test_sparse_construction_paths(self):
+        with self.subTest("root validators"):
+            person = TCRootValidatedPerson.from_sparql_rows(self.rows, fields="id,name")[0]
+            self.assertEqual(person.name, self.rows[0]["entityLabel"].upper())
+            self.assertEqual(TCRootValidatedPerson.from_sparql_rows(self.rows, fields="id")[0].events, [])
+        with self.subTest("catch errors"):
+            rows = deepcopy(self.rows)
+            event = rows[0]["event"]
+            for row in rows:
+                if row["event"] == event:
+                    del row["eventLabel"]
+            person = TCPersonWithErrorField.from_sparql_rows(rows, fields="id,events.label")[0]
+            self.assertEqual(len(person.events), 13)
+            self.assertEqual(len(person.error), 1)
+            self.assertIsNone(person.name)
+        with self.subTest("trusted"):
+            typed_rows = [{"person": "p1", "entityLabel": "P", "event": "e1", "eventLabel": "E", "count": "3"}]
+            person = TCTrustedPerson.from_sparql_rows(typed_rows, fields="id,events.count")[0]
+            self.assertEqual(person.dict(), {"id": "p1", "events": [{"count": 3}]})
+
+    def test_unselected_fields_are_not_built(self):
+        with collect_timings() as collector:
+            TCPersonFull.from_sparql_rows(self.rows, fields="id,name")
+        self.assertNotIn("TCEventFull", collector.model_totals())
+
+    def test_direct_serialization(self):
+        content = serialize_sparql_rows(TCPersonFull, self.rows, check=True, fields="name,events.id")
+        self.assertEqual(list(content[0]), ["name", "events"])
+        self.assertEqual(list(content[0]["events"][0]), ["id"])
+
+    def test_dependency(self):
+        app = FastAPI()
+
+        @app.get("/persons")
+        def persons(fields: dict | None = Depends(field_selection_dependency(TCPersonFull))):
+            return direct_model_response(TCPersonFull, self.rows, fields=fields)
+
+        client = TestClient(app)
+        self.assertEqual(client.get("/persons", params={"fields": "id"}).json(), [{"id": self.rows[0]["person"]}])
+        self.assertEqual(len(client.get("/persons").json()[0]["events"]), 14)
+        self.assertEqual(client.get("/persons", params={"fields": "id,foo"}).status_code, 400)
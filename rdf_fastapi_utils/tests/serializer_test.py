@@ -0,0 +1,135 @@
+import datetime
+import json
+import os
+import unittest
+
+from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+from pydantic import Field
+
+from rdf_fastapi_utils import serializer
+from rdf_fastapi_utils.models import FieldConfigurationRDF, RDFUtilsModelBaseClass
+from rdf_fastapi_utils.responses import RDFJSONResponse, direct_model_response
+from rdf_fastapi_utils.serializer import (
+    EncodedEntity,
+    SerializationMismatchError,
+    check_equivalence,
+    render_json,
+    serialize_entity,
+    serialize_sparql_rows,
+)
+from rdf_fastapi_utils.tests.baseclass_test import DATA_DIR, TCPaginatedResponse, TCPersonFull
+from rdf_fastapi_utils.tests.parallel_test import TCLevel0, generate_rows
+from rdf_fastapi_utils.tests.trusted_test import TCTrustedPerson
+
+
+class TCEncodedEvent(RDFUtilsModelBaseClass):
+    id: str = Field(..., rdfconfig=FieldConfigurationRDF(anchor=True, path="event"))
+    start: datetime.datetime = Field(None, rdfconfig=FieldConfigurationRDF(path="start"))
+
+    class Config:
+        json_encoders = {datetime.datetime: lambda v: v.strftime("%Y")}
+
+
+class TCEncodedPerson(RDFUtilsModelBaseClass):
+    id: str = Field(..., rdfconfig=FieldConfigurationRDF(anchor=True, path="person"))
+    events: list[TCEncodedEvent] = None
+
+    class Config:
+        json_encoders = {datetime.datetime: lambda v: v.date().isoformat()}
+
+
+class TCPlainPerson(RDFUtilsModelBaseClass):
+    id: str = Field(..., rdfconfig=FieldConfigurationRDF(anchor=True, path="person"))
+    events: list[TCEncodedEvent] = None
+
+
+class TestDirectSerialization(unittest.TestCase):
+    def setUp(self) -> None:
+        with open(os.path.join(DATA_DIR, "test_data_events.json")) as f:
+            self.test_data_events = json.load(f)
+        # compare with the json module, orjson formats some floats differently than JSONResponse
+        self.orjson = serializer.orjson
+        serializer.orjson = None
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        serializer.orjson = self.orjson
+        return super().tearDown()
+
+    def assertSameAsJSONResponse(self, content, models):
+        self.assertEqual(render_json(content), JSONResponse(jsonable_encoder(models)).body)
+
+    def test_entity(self):
+        for data in (self.test_data_events, {"_results": self.test_data_events}):
+            content = serialize_entity(TCPaginatedResponse, data, check=True)
+            self.assertIsInstance(content, EncodedEntity)
+            self.assertSameAsJSONResponse(content, TCPaginatedResponse(**data))
+
+    def test_sparql_rows(self):
+        rows = self.test_data_events["results"]
+        self.assertSameAsJSONResponse(
+            serialize_sparql_rows(TCPersonFull, rows, check=True), TCPersonFull.from_sparql_rows(rows)
+        )
+        typed_rows = [
+            {"person": "p1", "entityLabel": "P", "event": "https://example.org/e1", "eventLabel": "E", "count": "3"},
+            {"person": "p1", "entityLabel": "P", "event": "https://example.org/e2", "eventLabel": "F"},
+        ]
+        typed_rows[1]["start"] = "2020-01-02T03:04:05"
+        self.assertSameAsJSONResponse(
+            serialize_sparql_rows(TCTrustedPerson, typed_rows, check=True), TCTrustedPerson.from_sparql_rows(typed_rows)
+        )
+
+    def test_json_encoders(self):
+        rows = [
+            {"person": "p1", "event": "e1", "start": "2020-01-02T03:04:05"},
+            {"person": "p1", "event": "e2", "start": "2021-02-03T04:05:06"},
+        ]
+        for model in (TCEncodedPerson, TCPlainPerson, TCEncodedEvent):
+            with self.subTest(model=model.__name__):
+                self.assertSameAsJSONResponse(
+                    serialize_sparql_rows(model, rows, check=True), model.from_sparql_rows(rows)
+                )
+        self.assertEqual(serialize_sparql_rows(TCEncodedPerson, rows)[0]["events"][0]["start"], "2020-01-02")
+        self.assertEqual(serialize_sparql_rows(TCPlainPerson, rows)[0]["events"][0]["start"], "2020-01-02T03:04:05")
+        self.assertEqual(serialize_sparql_rows(TCEncodedEvent, rows)[0]["start"], "2020")
+
+    def test_synthetic_nested(self):
+        rows = generate_rows(anchors=3, fan_out=3, depth=3)
+        self.assertSameAsJSONResponse(
+            serialize_sparql_rows(TCLevel0, rows, check=True), TCLevel0.from_sparql_rows(rows)
+        )
+
+    def test_check_mode(self):
+        rows = self.test_data_events["results"]
+        content = serialize_sparql_rows(TCPersonFull, rows)
+        content[0]["name"] = "changed"
+        with self.assertRaises(SerializationMismatchError):
+            check_equivalence(content, TCPersonFull.from_sparql_rows(rows))
+
+    def test_render_json_fallback(self):
+        serializer.orjson = self.orjson
+        if serializer.orjson is None:
+            self.skipTest("orjson is not installed")
+        for content in ({"count": 2**70, "ids": [1, 2]}, {1: "a"}):
+            self.assertEqual(render_json(content), JSONResponse(content).body)
+
+    def test_response(self):
+        app = FastAPI()
+        rows = self.test_data_events["results"]
+
+        @app.get("/persons")
+        def persons():
+            return direct_model_response(TCPersonFull, rows, check=True)
+
+        @app.get("/page", response_class=RDFJSONResponse)
+        def page():
+            return TCPaginatedResponse(**self.test_data_events)
+
+        client = TestClient(app)
+        res = client.get("/persons")
+        self.assertEqual(res.headers["content-type"], "application/json")
+        self.assertEqual(res.content, JSONResponse(jsonable_encoder(TCPersonFull.from_sparql_rows(rows))).body)
+        self.assertEqual(client.get("/page").json(), json.loads(TCPaginatedResponse(**self.test_data_events).json()))
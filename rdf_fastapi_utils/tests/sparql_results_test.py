@@ -0,0 +1,124 @@
+import datetime
+import json
+import os
+import unittest
+from typing import Union
+
+from pydantic import Field
+
+from rdf_fastapi_utils.models import FieldConfigurationRDF, RDFUtilsModelBaseClass
+from rdf_fastapi_utils.plan import get_model_literal_types
+from rdf_fastapi_utils.sparql_results import XSD, convert_term, flatten_sparql_json, is_sparql_json
+from rdf_fastapi_utils.tests.baseclass_test import TCPersonFull
+
+DATA_DIR = os.path.dirname(__file__)
+
+
+def to_sparql_json(rows: list) -> dict:
+    """converts flat test rows to the SPARQL JSON results format"""
+    variables = list(dict.fromkeys(key for row in rows for key in row))
+    bindings = []
+    for row in rows:
+        binding = {}
+        for key, value in row.items():
+            if key == "count":
+                binding[key] = {"type": "literal", "value": str(value), "datatype": f"{XSD}integer"}
+            elif key in ("start", "end"):
+                binding[key] = {"type": "literal", "value": value, "datatype": f"{XSD}dateTime"}
+            elif value.startswith("http"):
+                binding[key] = {"type": "uri", "value": value}
+            else:
+                binding[key] = {"type": "literal", "value": value, "xml:lang": "en"}
+        bindings.append(binding)
+    return {"head": {"vars": variables}, "results": {"bindings": bindings}}
+
+
+class TCLifeEvent(RDFUtilsModelBaseClass):
+    id: str = Field(..., rdfconfig=FieldConfigurationRDF(anchor=True, path="event"))
+    label: str = Field(..., rdfconfig=FieldConfigurationRDF(path="eventLabel"))
+
+
+class TCRoleEvent(RDFUtilsModelBaseClass):
+    id: str = Field(..., rdfconfig=FieldConfigurationRDF(anchor=True, path="event"))
+    label: str = Field(..., rdfconfig=FieldConfigurationRDF(path="eventLabel"))
+
+
+def event_kind_callback(field, data):
+    # `role` is used by none of the models, it is only read here
+    role_events = [row for row in data if "/eventrole/" in row["role"]]
+    return [(TCLifeEvent, [row for row in data if row not in role_events]), (TCRoleEvent, role_events)]
+
+
+class TCPersonEventKinds(RDFUtilsModelBaseClass):
+    id: str = Field(..., rdfconfig=FieldConfigurationRDF(anchor=True, path="person"))
+    events: list[Union[TCLifeEvent, TCRoleEvent]] = Field(
+        [],
+        rdfconfig=FieldConfigurationRDF(path="_additional_values", serialization_class_callback=event_kind_callback),
+    )
+
+
+class TCDatedEvent(RDFUtilsModelBaseClass):
+    id: str = Field(..., rdfconfig=FieldConfigurationRDF(anchor=True, path="event"))
+    start: str | None = Field(None, rdfconfig=FieldConfigurationRDF(path="start"))
+    end: datetime.datetime | None = Field(None, rdfconfig=FieldConfigurationRDF(path="end"))
+
+
+class TestSparqlResults(unittest.TestCase):
+    def setUp(self) -> None:
+        with open(os.path.join(DATA_DIR, "test_data_events.json")) as f:
+            self.test_data_events = json.load(f)
+        self.sparql_json = to_sparql_json(self.test_data_events["results"])
+        return super().setUp()
+
+    def test_is_sparql_json(self):
+        self.assertTrue(is_sparql_json(self.sparql_json))
+        self.assertFalse(is_sparql_json(self.test_data_events))
+
+    def test_flatten_converts_typed_literals_once(self):
+        rows = flatten_sparql_json(self.sparql_json)
+        self.assertEqual(len(rows), len(self.test_data_events["results"]))
+        self.assertEqual(rows[0]["count"], 1)
+        self.assertIsInstance(rows[0]["end"], datetime.datetime)
+        same_end = [row["end"] for row in rows if row.get("end") == rows[0]["end"]]
+        self.assertGreater(len(same_end), 1)
+        self.assertTrue(all(end is rows[0]["end"] for end in same_end))
+        self.assertEqual(rows[0]["person"], self.test_data_events["results"][0]["person"])
+
+    def test_flatten_only_selected_variables(self):
+        rows = flatten_sparql_json(self.sparql_json, variables={"person", "event"})
+        self.assertEqual(set(rows[0].keys()), {"person", "event"})
+
+    def test_flatten_decode_selected_variables(self):
+        rows = flatten_sparql_json(self.sparql_json, decode={"end"})
+        self.assertEqual(set(rows[0].keys()), set(self.test_data_events["results"][0].keys()))
+        self.assertIsInstance(rows[0]["end"], datetime.datetime)
+        self.assertEqual(rows[0]["count"], "1")
+
+    def test_model_from_sparql_json(self):
+        expected = TCPersonFull.from_sparql_rows(self.test_data_events["results"])
+        res = TCPersonFull.from_sparql_rows(self.sparql_json)
+        self.assertEqual(res, expected)
+        self.assertEqual(TCPersonFull(_results=self.sparql_json), expected[0])
+
+    def test_class_callback_reads_unused_column(self):
+        expected = TCPersonEventKinds.from_sparql_rows(self.test_data_events["results"])
+        res = TCPersonEventKinds.from_sparql_rows(self.sparql_json)
+        self.assertEqual(res, expected)
+        kinds = [type(ev) for ev in res[0].events]
+        self.assertEqual((kinds.count(TCLifeEvent), kinds.count(TCRoleEvent)), (2, 12))
+
+    def test_literals_follow_the_field_types(self):
+        rows = self.test_data_events["results"]
+        self.assertEqual(get_model_literal_types(TCDatedEvent), {"end": (datetime.datetime,)})
+        expected = TCDatedEvent.from_sparql_rows(rows)
+        res = TCDatedEvent.from_sparql_rows(self.sparql_json)
+        self.assertEqual(res, expected)
+        dated = next(ev for ev in res if ev.start is not None)
+        self.assertIsInstance(dated.start, str)
+        rows = flatten_sparql_json(self.sparql_json, decode={"start": (str,), "end": (datetime.datetime,)})
+        self.assertIsInstance(next(row["start"] for row in rows if "start" in row), str)
+        self.assertIsInstance(next(row["end"] for row in rows if "end" in row), datetime.datetime)
+
+    def test_unknown_boolean_lexical(self):
+        for lexical, value in (("true", True), ("0", False), ("yes", "yes")):
+            self.assertEqual(convert_term({"value": lexical, "datatype": f"{XSD}boolean"}), value)
@@ -0,0 +1,104 @@
+import datetime
+import json
+import os
+import unittest
+from unittest import mock
+
+from pydantic import Field, HttpUrl, ValidationError, validator
+
+from rdf_fastapi_utils.models import FieldConfigurationRDF, RDFUtilsModelBaseClass
+from rdf_fastapi_utils.tests.baseclass_test import DATA_DIR, TCPaginatedResponse, TCPersonFull
+from rdf_fastapi_utils.trusted import get_entity_coercers, is_trusted, trusted_construction
+
+
+class TCTypedEvent(RDFUtilsModelBaseClass):
+    id: HttpUrl = Field(..., rdfconfig=FieldConfigurationRDF(anchor=True, path="event"))
+    label: str = Field(..., rdfconfig=FieldConfigurationRDF(path="eventLabel"))
+    count: int = Field(None, rdfconfig=FieldConfigurationRDF(path="count"))
+    start: datetime.datetime = Field(None, rdfconfig=FieldConfigurationRDF(path="start"))
+
+
+class TCTrustedPerson(RDFUtilsModelBaseClass):
+    id: str = Field(..., rdfconfig=FieldConfigurationRDF(anchor=True, path="person"))
+    name: str = Field(..., rdfconfig=FieldConfigurationRDF(path="entityLabel"))
+    events: list[TCTypedEvent] = None
+
+    class Config:
+        RDF_utils_trusted = True
+
+
+class TCValidatedPerson(RDFUtilsModelBaseClass):
+    id: str = Field(..., rdfconfig=FieldConfigurationRDF(anchor=True, path="person"))
+    name: str = Field(..., rdfconfig=FieldConfigurationRDF(path="entityLabel"))
+
+    @validator("name")
+    def upper_name(cls, v):
+        return v.upper()
+
+
+class TestTrustedConstruction(unittest.TestCase):
+    def setUp(self) -> None:
+        with open(os.path.join(DATA_DIR, "test_data_events.json")) as f:
+            self.test_data_events = json.load(f)
+        return super().setUp()
+
+    def test_same_output_as_validation(self):
+        validated = TCPaginatedResponse(**self.test_data_events)
+        with trusted_construction():
+            trusted = TCPaginatedResponse(**self.test_data_events)
+        self.assertEqual(validated.json(), trusted.json())
+        self.assertEqual(validated.dict(), trusted.dict())
+        persons = TCPersonFull.from_sparql_rows(self.test_data_events["results"], trusted=True)
+        self.assertEqual(
+            [p.json() for p in persons],
+            [p.json() for p in TCPersonFull.from_sparql_rows(self.test_data_events["results"])],
+        )
+
+    def test_coercion(self):
+        rows = [
+            {"person": "p1", "entityLabel": "P", "event": "https://example.org/e1", "eventLabel": "E", "count": "3"},
+            {"person": "p1", "entityLabel": "P", "event": "https://example.org/e2", "eventLabel": "F"},
+        ]
+        rows[1]["start"] = "2020-01-02T03:04:05"
+        person = TCTrustedPerson.from_sparql_rows(rows)[0]
+        self.assertIsInstance(person.events[0].id, HttpUrl)
+        self.assertEqual(person.events[0].id.host, "example.org")
+        self.assertEqual(person.events[0].count, 3)
+        self.assertEqual(person.events[1].start, datetime.datetime(2020, 1, 2, 3, 4, 5))
+        self.assertEqual(person.dict(), TCTrustedPerson.from_sparql_rows(rows, trusted=False)[0].dict())
+
+    def test_nested_instances_are_built_once(self):
+        rows = [
+            {"person": "p1", "entityLabel": "P", "event": "https://example.org/e1", "eventLabel": "E", "count": "3"},
+            {"person": "p1", "entityLabel": "P", "event": "https://example.org/e2", "eventLabel": "F"},
+        ]
+        self.assertIsNotNone(get_entity_coercers(TCTypedEvent))
+        self.assertIsNone(get_entity_coercers(TCTrustedPerson))
+        expected = TCTrustedPerson.from_sparql_rows(rows, trusted=False)
+        with mock.patch.object(TCTypedEvent, "__init__", side_effect=AssertionError("rebuilt")):
+            with mock.patch.object(TCTrustedPerson, "__init__", side_effect=AssertionError("rebuilt")):
+                persons = TCTrustedPerson.from_sparql_rows(rows)
+        self.assertEqual(persons, expected)
+        self.assertIsNone(persons[0].events[1].count)
+        self.assertEqual(persons[0].__fields_set__, expected[0].__fields_set__)
+        self.assertEqual(persons[0].events[1].__fields_set__, expected[0].events[1].__fields_set__)
+
+    def test_invalid_data_is_still_rejected(self):
+        rows = [{"person": "p1", "entityLabel": "P", "event": "not a url", "eventLabel": "E"}]
+        with self.assertRaises(ValidationError):
+            TCTrustedPerson.from_sparql_rows(rows)
+        with self.assertRaises(ValidationError):
+            TCTrustedPerson.from_sparql_rows([{"person": "p1"}])
+
+    def test_validators_are_applied(self):
+        with trusted_construction():
+            person = TCValidatedPerson.from_sparql_rows([{"person": "p1", "entityLabel": "name"}])[0]
+        self.assertEqual(person.name, "NAME")
+
+    def test_scope(self):
+        self.assertFalse(is_trusted())
+        with trusted_construction():
+            self.assertTrue(is_trusted())
+            with trusted_construction(False):
+                self.assertFalse(is_trusted())
+        self.assertFalse(is_trusted())
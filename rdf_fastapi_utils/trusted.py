@@ -0,0 +1,316 @@
+"""Trusted construction: coercion-only field assignment for data from known sources
+
+In trusted mode the mapped data of a model is not passed through the full pydantic validation. Every field gets a
+cheap coercer for the types used in RDF models (str, int, float, bool, datetime/date, URLs, nested models and lists
+of them). Values the coercer can't handle are validated by pydantic as usual, fields with custom validators are always
+validated. Already built nested instances are reused instead of being copied.
+
+The grouped entities of nested models are built into instances while the parent is mapped (without the scopes of
+`__init__`), so the parent assigns them as they are instead of coercing dicts level by level. Models with plain value
+fields only (`get_entity_coercers`, usually the leaves of the tree) skip the mapping stages and are assigned straight
+from the grouped entity. The grouping of the rows (`filter_sparql`) is the same as in the regular path.
+
+Trusted mode is enabled per model in its Config (applies to the model and all models built while constructing it):
+
+    class Config:
+        RDF_utils_trusted = True
+
+or per call:
+
+    with trusted_construction():
+        persons = Person.from_sparql_rows(rows)
+"""
+import contextlib
+import contextvars
+import datetime
+import typing
+from collections.abc import Mapping
+from typing import Any, Callable, ForwardRef
+
+from pydantic import AnyUrl, Extra
+from pydantic.datetime_parse import parse_date, parse_datetime
+from pydantic.fields import SHAPE_LIST, SHAPE_SINGLETON, ModelField
+
+from rdf_fastapi_utils.plan import BRANCH_VALUE, get_field_models, get_model_plan
+
+_TRUSTED: contextvars.ContextVar[bool | None] = contextvars.ContextVar("rdf_utils_trusted", default=None)
+_COERCERS: dict[type, tuple | None] = {}
+_ENTITY_COERCERS: dict[type, tuple | None] = {}
+FALLBACK = object()
+_URL_CACHE_SIZE = 10000
+
+
+@contextlib.contextmanager
+def trusted_construction(enabled: bool = True) -> typing.Iterator[None]:
+    """enables (or explicitly disables) trusted construction for all models built in the current context"""
+    token = _TRUSTED.set(enabled)
+    try:
+        yield
+    finally:
+        _TRUSTED.reset(token)
+
+
+def trusted_scope(model: Any) -> typing.ContextManager:
+    """returns a context manager enabling trusted mode if the Config of model asks for it and no mode is set yet"""
+    if _TRUSTED.get() is None and getattr(model.__config__, "RDF_utils_trusted", False):
+        return trusted_construction()
+    return _NULL_SCOPE
+
+
+_NULL_SCOPE = contextlib.nullcontext()
+
+
+def is_trusted() -> bool:
+    """returns True if trusted construction is enabled in the current context"""
+    return bool(_TRUSTED.get())
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+def _exact(type_: type) -> Callable[[Any], Any]:
+    def coerce(value: Any) -> Any:
+        return value if type(value) is type_ else FALLBACK
+
+    return coerce
+
+
+def _number(type_: type) -> Callable[[Any], Any]:
+    def coerce(value: Any) -> Any:
+        if type(value) is type_:
+            return value
+        if type(value) in (str, int, float):
+            try:
+                return type_(value)
+            except ValueError:
+                pass
+        return FALLBACK
+
+    return coerce
+
+
+def _temporal(type_: type, parse: Callable[[Any], Any]) -> Callable[[Any], Any]:
+    def coerce(value: Any) -> Any:
+        if type(value) is type_:
+            return value
+        if isinstance(value, (str, int, float)):
+            try:
+                return parse(value)
+            except (ValueError, TypeError):
+                pass
+        return FALLBACK
+
+    return coerce
+
+
+def _url(field: ModelField) -> Callable[[Any], Any]:
+    type_ = field.type_
+    config = field.model_config
+    cache: dict[str, Any] = {}
+
+    def coerce(value: Any) -> Any:
+        if type(value) is type_:
+            return value
+        if type(value) is not str:
+            return FALLBACK
+        url = cache.get(value)
+        if url is None:
+            try:
+                url = type_.validate(value, field, config)
+            except (ValueError, TypeError):
+                return FALLBACK
+            if len(cache) >= _URL_CACHE_SIZE:
+                cache.clear()
+            cache[value] = url
+        return url
+
+    return coerce
+
+
+def _model(types: tuple) -> Callable[[Any], Any]:
+    def coerce(value: Any) -> Any:
+        if isinstance(value, types):
+            return value
+        if len(types) == 1 and isinstance(value, Mapping):
+            return types[0](**value)
+        return FALLBACK
+
+    return coerce
+
+
+def _compile_singleton(field: ModelField) -> Callable[[Any], Any] | None:
+    type_ = field.type_
+    config = field.model_config
+    if type_ is Any:
+        return _identity
+    if type_ is str:
+        if (
+            getattr(config, "anystr_strip_whitespace", False)
+            or getattr(config, "anystr_lower", False)
+            or getattr(config, "anystr_upper", False)
+            or getattr(config, "min_anystr_length", 0)
+            or getattr(config, "max_anystr_length", None) is not None
+        ):
+            return None
+        return _exact(str)
+    if type_ is bool:
+        return _exact(bool)
+    if type_ in (int, float):
+        return _number(type_)
+    if type_ is datetime.datetime:
+        return _temporal(type_, parse_datetime)
+    if type_ is datetime.date:
+        return _temporal(type_, parse_date)
+    if isinstance(type_, type) and issubclass(type_, AnyUrl):
+        return _url(field)
+    if isinstance(type_, type) and hasattr(type_, "__fields__"):
+        return _model((type_,))
+    if typing.get_origin(type_) is typing.Union:
+        members = get_field_models(field)
+        if members and len(members) == len(field.sub_fields or ()):
+            return _model(tuple(members))
+    return None
+
+
+def compile_coercer(field: ModelField) -> Callable[[Any], Any] | None:
+    """returns the coercer of a field, None if the field always needs full validation"""
+    if field.class_validators or field.pre_validators or field.post_validators:
+        return None
+    allow_none = field.allow_none
+    if field.shape == SHAPE_SINGLETON:
+        single = _compile_singleton(field)
+        if single is None:
+            return None
+
+        def coerce(value: Any) -> Any:
+            if value is None:
+                return None if allow_none else FALLBACK
+            return single(value)
+
+        return coerce
+    if field.shape == SHAPE_LIST and field.sub_fields:
+        item = compile_coercer(field.sub_fields[0])
+        if item is None:
+            return None
+
+        def coerce_list(value: Any) -> Any:
+            if value is None:
+                return None if allow_none else FALLBACK
+            if type(value) is not list:
+                return FALLBACK
+            res = []
+            for v in value:
+                v = item(v)
+                if v is FALLBACK:
+                    return FALLBACK
+                res.append(v)
+            return res
+
+        return coerce_list
+    return None
+
+
+def get_coercers(model: type) -> tuple | None:
+    """returns (name, alias, field, coercer) for every field of model, None if the model needs full validation"""
+    if model in _COERCERS:
+        return _COERCERS[model]
+    if (
+        getattr(model, "__pre_root_validators__", None)
+        or getattr(model, "__post_root_validators__", None)
+        or model.__config__.extra != Extra.ignore
+    ):
+        coercers = None
+    else:
+        coercers = tuple(
+            (field.name, field.alias, field, compile_coercer(field)) for field in model.__fields__.values()
+        )
+    if not any(isinstance(field.type_, ForwardRef) for field in model.__fields__.values()):
+        _COERCERS[model] = coercers
+    return coercers
+
+
+def clear_coercers() -> None:
+    """drops the compiled coercers, e.g. after forward references have been updated"""
+    _COERCERS.clear()
+    _ENTITY_COERCERS.clear()
+
+
+def get_entity_coercers(model: type) -> tuple | None:
+    """returns (name, path, field, coercer) for every field of a model whose instances can be assigned straight from
+    a grouped entity, None for models that need the mapping stages
+
+    These are models with plain value fields only (no nested models, hooks, `default_dict_key`, sorting or caching),
+    typically the leaves of a model tree and most of its instances.
+    """
+    if model in _ENTITY_COERCERS:
+        return _ENTITY_COERCERS[model]
+    coercers = get_coercers(model)
+    plan = get_model_plan(model)
+    config = model.__config__
+    if (
+        coercers is None
+        or plan.callback_fields
+        or plan.encode_fields
+        or plan.batch_fields
+        or plan.sort_fields
+        or hasattr(config, "sort_key")
+        or getattr(config, "RDF_utils_cache_size", 0)
+        or any(f.branch != BRANCH_VALUE or f.default_dict_key is not None or f.variables for f in plan.fields)
+    ):
+        res = None
+    else:
+        res = tuple((f.name, f.path, c[2], c[3]) for f, c in zip(plan.fields, coercers))
+    if not any(isinstance(field.type_, ForwardRef) for field in model.__fields__.values()):
+        _ENTITY_COERCERS[model] = res
+    return res
+
+
+def construct_trusted_entity(model: type, coercers: tuple, ent: Mapping) -> typing.Tuple[dict, set] | None:
+    """returns the field values and the set fields of a model built straight from a grouped entity (see
+    `get_entity_coercers`), variables missing in the entity are None like in the mapped data
+
+    Returns None if the data needs full validation.
+    """
+    values = {}
+    fields_set = set()
+    for name, path, field, coerce in coercers:
+        value = ent.get(path)
+        if coerce is not None:
+            value = coerce(value)
+        if coerce is None or value is FALLBACK:
+            value, errors = field.validate(ent.get(path), values, loc=field.alias, cls=model)
+            if errors:
+                return None
+        values[name] = value
+        fields_set.add(name)
+    return values, fields_set
+
+
+def construct_trusted(model: type, data: Mapping) -> typing.Tuple[dict, set] | None:
+    """returns the field values and the set fields of a model built from mapped data without full validation
+
+    Returns None if the data needs full validation (missing required fields, values pydantic rejects, models with
+    root validators). Errors of nested models are raised as ValidationError.
+    """
+    coercers = get_coercers(model)
+    if coercers is None:
+        return None
+    values = {}
+    fields_set = set()
+    for name, alias, field, coerce in coercers:
+        if alias in data:
+            value = data[alias]
+            if coerce is not None:
+                value = coerce(value)
+            if coerce is None or value is FALLBACK:
+                value, errors = field.validate(data[alias], values, loc=alias, cls=model)
+                if errors:
+                    return None
+            values[name] = value
+            fields_set.add(name)
+        elif field.required:
+            return None
+        else:
+            values[name] = field.get_default()
+    return values, fields_set